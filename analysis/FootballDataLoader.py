@@ -1,15 +1,62 @@
 # analysis/data_loader.py
 
-from typing import Optional, Dict, Any
-from statsbombpy import sb
+from typing import Optional, Dict, Any, Iterable, Iterator, Tuple
 import pandas as pd
+import json
 import os
 
+from analysis.atomic import write_atomic
+from analysis.fetching import fetch_concurrently
+from analysis.matches_index import apply_schema, read_matches_index, write_matches_index
+
 
 class FootballDataLoader:
-    def __init__(self):
-        """Initialize the FootballDataLoader with competitions data."""
-        self.competitions = sb.competitions()
+    # endpoint name -> keyword arguments of the matching `sb` function for one request key
+    ENDPOINTS = {
+        'matches': lambda key: {'competition_id': key[0], 'season_id': key[1]},
+        'events': lambda key: {'match_id': key},
+        'lineups': lambda key: {'match_id': key},
+        'frames': lambda key: {'match_id': key},
+    }
+
+    def __init__(self, client=None):
+        """
+        Initialize the FootballDataLoader.
+        
+        Nothing is fetched here: the competitions list is loaded on first access of
+        `competitions`, and statsbombpy is only imported when the default client is used.
+
+        Args:
+            client: Module or object exposing the statsbombpy `sb` functions
+                (defaults to `statsbombpy.sb`; pass a fake for offline use)
+        """
+        self._client = client
+        self._competitions = None
+
+    @property
+    def client(self):
+        """Client used for every request (statsbombpy's `sb` unless one was given)."""
+        if self._client is None:
+            from statsbombpy import sb
+            self._client = sb
+        return self._client
+
+    @property
+    def competitions(self) -> pd.DataFrame:
+        """Competitions dataframe, fetched on first access and kept for the lifetime of the loader."""
+        if self._competitions is None:
+            self._competitions = self.client.competitions()
+        return self._competitions
+
+    def refresh_competitions(self) -> pd.DataFrame:
+        """
+        Drop the in-memory competitions list and fetch it again.
+        
+        Returns:
+            pd.DataFrame: Fresh competitions dataframe
+        """
+        self._competitions = None
+        return self.competitions
 
     def get_matches_data(self, competition_name: str, season: str) -> Optional[pd.DataFrame]:
         """
@@ -35,7 +82,7 @@ class FootballDataLoader:
                 return None
             
             row = filtered.iloc[0]
-            matches = sb.matches(competition_id=row['competition_id'], season_id=row['season_id'])
+            matches = self.client.matches(competition_id=row['competition_id'], season_id=row['season_id'])
             
             return matches if not matches.empty else None
         
@@ -54,7 +101,7 @@ class FootballDataLoader:
             Optional[pd.DataFrame]: Events dataframe or None if not found
         """
         try:
-            events = sb.events(match_id=match_id)
+            events = self.client.events(match_id=match_id)
             return events if not events.empty else None
         
         except Exception as e:
@@ -72,7 +119,7 @@ class FootballDataLoader:
             Optional[pd.DataFrame]: Lineups dataframe or None if not found
         """
         try:
-            lineups = sb.lineups(match_id=match_id)
+            lineups = self.client.lineups(match_id=match_id)
             return lineups if not lineups.empty else None
         
         except Exception as e:
@@ -90,13 +137,58 @@ class FootballDataLoader:
             Optional[pd.DataFrame]: 360 data or None if not available
         """
         try:
-            data_360 = sb.frames(match_id=match_id)
+            data_360 = self.client.frames(match_id=match_id)
             return data_360 if not data_360.empty else None
         
         except Exception as e:
             print(f"Error getting 360 data for match {match_id}: {e}")
             return None
 
+    def get_freeze_frames(self, match_id: int):
+        """
+        Get the 360 data of a match in the ragged array layout of `analysis.freeze_frames`.
+
+        Args:
+            match_id (int): Match ID
+
+        Returns:
+            Optional[FreezeFrames]: Frames or None if not available
+        """
+        data_360 = self.get_360_data(match_id)
+        if data_360 is None:
+            return None
+        from analysis.freeze_frames import FreezeFrames
+        return FreezeFrames.from_frames(data_360, match_id)
+
+    def fetch_many(self, endpoint: str, keys: Iterable[Any], max_concurrency: int = 8, retries: int = 2,
+                   backoff: float = 0.5, timeout: Optional[float] = 60.0) -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+        """
+        Fetch many competitions or matches concurrently, streaming results as they finish.
+
+        Args:
+            endpoint (str): One of 'matches', 'events', 'lineups' or 'frames'
+            keys (Iterable[Any]): (competition_id, season_id) tuples for 'matches', match_ids otherwise
+            max_concurrency (int): Maximum number of requests in flight
+            retries (int): Extra attempts per request after a failure
+            backoff (float): Base retry delay in seconds (doubled per attempt)
+            timeout (Optional[float]): Per-attempt timeout in seconds
+
+        Yields:
+            Tuple[Any, Any, Optional[Exception]]: (key, data, None) or (key, None, error), in completion order
+        """
+        if endpoint not in self.ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{endpoint}', expected one of {sorted(self.ENDPOINTS)}")
+        fetch_function = getattr(self.client, endpoint)
+        to_kwargs = self.ENDPOINTS[endpoint]
+        return fetch_concurrently(
+            lambda key: fetch_function(**to_kwargs(key)),
+            keys,
+            max_concurrency=max_concurrency,
+            retries=retries,
+            backoff=backoff,
+            timeout=timeout
+        )
+
     def get_matches_summary_stats(self) -> Dict[str, Any]:
         """
         Get summary statistics about available data.
@@ -117,12 +209,27 @@ class FootballDataLoader:
             print(f"Error getting summary stats: {e}")
             return {}
 
-    def generate_matches_index_csv(self, output_path: str = "data/matches_index.csv") -> bool:
+    def generate_matches_index_csv(self, output_path: str = "data/matches_index.csv", max_concurrency: int = 8,
+                                   retries: int = 2, timeout: Optional[float] = 60.0, incremental: bool = False,
+                                   manifest_path: Optional[str] = None) -> bool:
         """
         Generate CSV file with all matches from all competitions and seasons.
         
+        A typed Parquet copy is written next to it (`<output_path without .csv>.parquet`, see
+        `analysis.matches_index`), which `read_matches_index` prefers over the CSV.
+        
+        In incremental mode only the competition-seasons that are missing from the manifest, or whose
+        `match_updated` (or `last_updated`) changed since they were indexed, are fetched; their rows
+        replace the old ones in the existing index. The index and the manifest are written atomically.
+        
         Args:
             output_path (str): Output file path
+            max_concurrency (int): Number of competition-seasons fetched in parallel
+            retries (int): Extra attempts per competition-season after a failure
+            timeout (Optional[float]): Per-request timeout in seconds
+            incremental (bool): Update the existing index instead of rebuilding it
+            manifest_path (Optional[str]): Manifest of indexed competition-seasons
+                (defaults to `<output_path without .csv>.manifest.json`)
             
         Returns:
             bool: True if successful, False otherwise
@@ -133,63 +240,164 @@ class FootballDataLoader:
             # Create output directory
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
             
-            all_matches = []
-            total_rows = len(self.competitions)
+            manifest_path = manifest_path or self._manifest_path(output_path)
+            names = {
+                (row['competition_id'], row['season_id']): (row['competition_name'], row['season_name'])
+                for _, row in self.competitions.iterrows()
+            }
+            versions = {
+                (row['competition_id'], row['season_id']): self._competition_version(row)
+                for _, row in self.competitions.iterrows()
+            }
             
-            # Process each competition-season combination
-            for idx, row in self.competitions.iterrows():
-                comp_name = row['competition_name']
-                season_name = row['season_name']
+            # An incremental run needs both the previous index and its manifest, otherwise rebuild everything
+            manifest = {}
+            existing = None
+            if incremental and os.path.exists(output_path) and os.path.exists(manifest_path):
+                manifest = self._load_manifest(manifest_path)
+                existing = read_matches_index(output_path)
+            
+            to_fetch = [
+                key for key in names
+                if self._manifest_key(key) not in manifest
+                or (versions[key] is not None and manifest[self._manifest_key(key)].get('version') != versions[key])
+            ]
+            if existing is not None:
+                print(f"{len(to_fetch)} of {len(names)} competition-seasons are new or updated")
+            
+            fetched = {}
+            total_rows = len(to_fetch)
+            
+            # Fetch every competition-season combination concurrently
+            results = self.fetch_many('matches', to_fetch, max_concurrency=max_concurrency,
+                                      retries=retries, timeout=timeout)
+            for done, (key, matches, error) in enumerate(results, start=1):
+                comp_name, season_name = names[key]
                 
-                print(f"Processing ({idx+1}/{total_rows}): {comp_name} - {season_name}")
+                print(f"Processing ({done}/{total_rows}): {comp_name} - {season_name}")
                 
-                try:
-                    matches = sb.matches(
-                        competition_id=row['competition_id'], 
-                        season_id=row['season_id']
-                    )
-                    
-                    if not matches.empty:
-                        for _, match in matches.iterrows():
-                            all_matches.append({
-                                'match_id': match['match_id'],
-                                'competition': comp_name,
-                                'season': season_name,
-                                'team1': match['home_team'],
-                                'team2': match['away_team'],
-                                'match_date': match.get('match_date', ''),
-                                'home_score': match.get('home_score', ''),
-                                'away_score': match.get('away_score', ''),
-                                'competition_stage': match.get('competition_stage', ''),
-                                'match_week': match.get('match_week', '')
-                            })
-                        
-                        print(f"  Added {len(matches)} matches")
-                    
-                except Exception as e:
-                    print(f"  Error: {e}")
+                if error is not None:
+                    print(f"  Error: {error}")
                     continue
+                
+                fetched[key] = self._index_rows(matches, comp_name, season_name) if not matches.empty else []
+                if not matches.empty:
+                    print(f"  Added {len(matches)} matches")
             
-            # Save to CSV
-            if all_matches:
+            # Keep the competitions order so the output does not depend on completion order
+            all_matches = [match for key in names for match in fetched.get(key, [])]
+            
+            if existing is not None:
+                if not to_fetch:
+                    print("✅ Matches index is already up to date")
+                    return True
+                if not fetched:
+                    print("❌ No competition-season could be refreshed")
+                    return False
+                df = self._merge_index(existing, pd.DataFrame(all_matches), [names[key] for key in fetched])
+            elif all_matches:
                 df = pd.DataFrame(all_matches)
                 df = df.sort_values(['competition', 'season', 'match_date']).reset_index(drop=True)
-                df.to_csv(output_path, index=False)
-                
-                print(f"\n✅ CSV generated successfully!")
-                print(f"📁 Saved to: {output_path}")
-                print(f"📊 Total matches: {len(df)}")
-                print(f"🏆 Competitions: {df['competition'].nunique()}")
-                
-                return True
             else:
                 print("❌ No matches found")
                 return False
+            
+            # Save to CSV and the Parquet sidecar
+            write_matches_index(df, output_path)
+            for key, rows in fetched.items():
+                manifest[self._manifest_key(key)] = {
+                    'competition': names[key][0],
+                    'season': names[key][1],
+                    'version': versions[key],
+                    'matches': len(rows)
+                }
+            write_atomic(manifest_path, lambda path: self._dump_manifest(manifest, path))
+            
+            print(f"\n✅ CSV generated successfully!")
+            print(f"📁 Saved to: {output_path}")
+            print(f"📊 Total matches: {len(df)}")
+            print(f"🏆 Competitions: {df['competition'].nunique()}")
+            
+            return True
         
         except Exception as e:
             print(f"❌ Error generating CSV: {e}")
             return False
 
+    @staticmethod
+    def _manifest_path(output_path: str) -> str:
+        return os.path.splitext(output_path)[0] + ".manifest.json"
+
+    @staticmethod
+    def _manifest_key(key: Tuple[Any, Any]) -> str:
+        return f"{int(key[0])}:{int(key[1])}"
+
+    @staticmethod
+    def _competition_version(row: pd.Series) -> Optional[str]:
+        """Get the last-update stamp of a competition-season, or None if StatsBomb does not provide one."""
+        for column in ('match_updated', 'last_updated'):
+            value = row.get(column)
+            if value is not None and not pd.isna(value):
+                return str(value)
+        return None
+
+    @staticmethod
+    def _load_manifest(path: str) -> Dict[str, Any]:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f).get('competition_seasons', {})
+
+    @staticmethod
+    def _dump_manifest(manifest: Dict[str, Any], path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'competition_seasons': manifest}, f, indent=2, sort_keys=True)
+
+    @staticmethod
+    def _merge_index(existing: pd.DataFrame, new_rows: pd.DataFrame, refreshed: list) -> pd.DataFrame:
+        """
+        Replace the rows of the refreshed competition-seasons in an existing index.
+        
+        Args:
+            existing (pd.DataFrame): Current matches index
+            new_rows (pd.DataFrame): Freshly fetched rows
+            refreshed (list): (competition, season) pairs that were refetched
+            
+        Returns:
+            pd.DataFrame: Merged index sorted like a full rebuild
+        """
+        stale = pd.MultiIndex.from_frame(existing[['competition', 'season']].astype(str)).isin(refreshed)
+        df = pd.concat([apply_schema(existing[~stale]), apply_schema(new_rows)], ignore_index=True)
+        # categoricals with different categories concatenate to plain objects, so type the result again
+        df = apply_schema(df)
+        return df.sort_values(['competition', 'season', 'match_date'], kind='stable').reset_index(drop=True)
+
+    def _index_rows(self, matches: pd.DataFrame, comp_name: str, season_name: str) -> list:
+        """
+        Convert a `sb.matches` dataframe into rows of the matches index.
+        
+        Args:
+            matches (pd.DataFrame): Matches of one competition-season
+            comp_name (str): Competition name
+            season_name (str): Season name
+            
+        Returns:
+            list: One dict per match with the matches index columns
+        """
+        return [
+            {
+                'match_id': match['match_id'],
+                'competition': comp_name,
+                'season': season_name,
+                'team1': match['home_team'],
+                'team2': match['away_team'],
+                'match_date': match.get('match_date', ''),
+                'home_score': match.get('home_score', ''),
+                'away_score': match.get('away_score', ''),
+                'competition_stage': match.get('competition_stage', ''),
+                'match_week': match.get('match_week', '')
+            }
+            for _, match in matches.iterrows()
+        ]
+
     def generate_matches_index_csv_first_competition_for_test(self, output_path: str = "data/matches_index.csv") -> bool:
         """
         Generate a CSV file with all matches from the FIRST competition only.
@@ -206,7 +414,7 @@ class FootballDataLoader:
             
             try:
                 # Get all matches for the first competition
-                matches = sb.matches(
+                matches = self.client.matches(
                     competition_id=row['competition_id'], 
                     season_id=row['season_id']
                 )
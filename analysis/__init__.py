@@ -1 +1,6 @@
-from .FootballDataLoader import FootballDataLoader
\ No newline at end of file
+def __getattr__(name):
+    # FootballDataLoader pulls in pandas and statsbombpy, so it is only imported when asked for
+    if name == 'FootballDataLoader':
+        from .FootballDataLoader import FootballDataLoader
+        return FootballDataLoader
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
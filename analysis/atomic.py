@@ -0,0 +1,31 @@
+# analysis/atomic.py
+
+import os
+import tempfile
+from typing import Callable
+
+
+def write_atomic(path: str, write: Callable[[str], None]) -> None:
+    """
+    Write a file through a temporary file in the same directory and rename it into place,
+    so readers (the Streamlit app, other workers) never see a truncated file.
+
+    Args:
+        path (str): Destination path
+        write (Callable[[str], None]): Writes the content to the temporary path it is given
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        # mkstemp creates the file as 0600; give it the permissions a plain open() would
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,204 @@
+# analysis/batch.py
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from analysis.matches_index import read_matches_index
+from analysis.row_writer import ParquetRowWriter
+from analysis.worldcup_to_csv import RefactoredWorldCupExtractor
+
+
+class MatchSelection:
+    """
+    Which matches of the matches index to extract.
+
+    Every criterion is optional and they combine with AND; a criterion given as a list
+    matches any of its values. Dates are inclusive and compared with `match_date`.
+    """
+
+    def __init__(self, competitions: Optional[Iterable[str]] = None, seasons: Optional[Iterable[str]] = None,
+                 stages: Optional[Iterable[str]] = None, date_from: Optional[str] = None,
+                 date_to: Optional[str] = None, match_ids: Optional[Iterable[int]] = None):
+        """
+        Args:
+            competitions (Optional[Iterable[str]]): Competition names, e.g. ['1. Bundesliga', 'Premier League']
+            seasons (Optional[Iterable[str]]): Season names, e.g. ['2015/2016']
+            stages (Optional[Iterable[str]]): Competition stages, e.g. ['Group Stage']
+            date_from (Optional[str]): First match date (YYYY-MM-DD)
+            date_to (Optional[str]): Last match date (YYYY-MM-DD)
+            match_ids (Optional[Iterable[int]]): Explicit match ids
+        """
+        self.competitions = list(competitions) if competitions else None
+        self.seasons = list(seasons) if seasons else None
+        self.stages = list(stages) if stages else None
+        self.date_from = pd.Timestamp(date_from) if date_from else None
+        self.date_to = pd.Timestamp(date_to) if date_to else None
+        self.match_ids = list(match_ids) if match_ids else None
+
+    @classmethod
+    def from_dict(cls, config: Dict[str, Any]) -> "MatchSelection":
+        """Build a selection from a dict (e.g. a JSON config) with the constructor's keyword names."""
+        return cls(**config)
+
+    def apply(self, index: pd.DataFrame) -> pd.DataFrame:
+        """
+        Filter the matches index.
+
+        Args:
+            index (pd.DataFrame): Typed matches index (see `analysis.matches_index.read_matches_index`)
+
+        Returns:
+            pd.DataFrame: Selected matches
+        """
+        mask = pd.Series(True, index=index.index)
+        for column, values in (('competition', self.competitions), ('season', self.seasons),
+                                ('competition_stage', self.stages), ('match_id', self.match_ids)):
+            if values is not None:
+                mask &= index[column].isin(values)
+        if self.date_from is not None:
+            mask &= index['match_date'] >= self.date_from
+        if self.date_to is not None:
+            mask &= index['match_date'] <= self.date_to
+        return index[mask]
+
+
+def competition_ids(client) -> Dict[Tuple[str, str], Tuple[int, int]]:
+    """
+    Map (competition name, season name) to (competition_id, season_id).
+
+    Args:
+        client: `sb` or a CachedStatsBombClient
+
+    Returns:
+        Dict[Tuple[str, str], Tuple[int, int]]: Ids of every competition-season
+    """
+    competitions = client.competitions()
+    return {
+        (row.competition_name, row.season_name): (int(row.competition_id), int(row.season_id))
+        for row in competitions.itertuples()
+    }
+
+
+def partition_path(output_dir: str, competition_id: int, season_id: int) -> str:
+    """Directory of one competition-season in the output dataset (hive partitioning)."""
+    return os.path.join(output_dir, f"competition_id={int(competition_id)}", f"season_id={int(season_id)}")
+
+
+def run_batch(selection: MatchSelection, output_dir: str = "data/match_metrics",
+              index_path: str = "data/matches_index.csv", client=None, workers: Optional[int] = None,
+              event_store=None, instrumentation=None, resume: bool = True) -> Dict[Tuple[int, int], int]:
+    """
+    Extract the flattened per-team rows of every selected match into a partitioned Parquet dataset.
+
+    Matches are grouped by competition-season, each with its own `RefactoredWorldCupExtractor`,
+    and streamed to `<output_dir>/competition_id=<id>/season_id=<id>/part-*.parquet`. With
+    `workers`, the matches of every group are queued on one shared process pool up front, so
+    many small seasons neither start a pool each nor leave workers idle at their tail. Matches
+    already in the output are skipped unless `resume` is False. Read the result with
+    `pd.read_parquet(output_dir)`, optionally with filters such as [('competition_id', '==', 9)].
+
+    Args:
+        selection (MatchSelection): Matches to extract
+        output_dir (str): Root of the output dataset
+        index_path (str): matches_index.csv to select from
+        client: `sb` replacement, e.g. `CachedStatsBombClient()` (statsbombpy's `sb` if None)
+        workers (Optional[int]): Worker processes shared by all groups (0 = one per CPU, None or 1 = serial)
+        event_store (Optional[EventStore]): Also store the cleaned events of every match
+        instrumentation (Optional[Instrumentation]): Stage timers and counters
+        resume (bool): Skip matches already written to the output
+
+    Returns:
+        Dict[Tuple[int, int], int]: Rows written per (competition_id, season_id)
+    """
+    if client is None:
+        from statsbombpy import sb
+        client = sb
+    selected = selection.apply(read_matches_index(index_path))
+    print(f"Selected {len(selected)} matches in {selected.groupby(['competition', 'season'], observed=True).ngroups} "
+          f"competition-seasons")
+    ids = competition_ids(client)
+    groups = []
+    for (competition, season), matches in selected.groupby(['competition', 'season'], observed=True, sort=True):
+        if (competition, season) not in ids:
+            print(f"Skipping {competition} {season}: not in the competitions list")
+            continue
+        competition_id, season_id = ids[(competition, season)]
+        extractor = RefactoredWorldCupExtractor(competition_id=competition_id, season_id=season_id, client=client,
+                                                event_store=event_store, instrumentation=instrumentation,
+                                                verbose=False)
+        match_rows = [
+            {
+                'match_id': int(match.match_id),
+                'match_date': match.match_date.strftime('%Y-%m-%d') if pd.notna(match.match_date) else None,
+                'home_team': match.team1,
+                'away_team': match.team2
+            }
+            for match in matches.sort_values(['match_date', 'match_id']).itertuples()
+        ]
+        writer = ParquetRowWriter(partition_path(output_dir, competition_id, season_id), extractor.output_schema())
+        done = writer.open(resume=resume)
+        pending = [match_row for match_row in match_rows if match_row['match_id'] not in done]
+        print(f"{competition} {season}: {len(pending)} of {len(match_rows)} matches to extract")
+        groups.append(((competition_id, season_id), extractor, writer, pending))
+
+    written = {}
+    executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count()) if workers not in (None, 1) else None
+    try:
+        futures = [extractor.submit_match_rows(executor, pending) if executor is not None else None
+                   for _, extractor, _, pending in groups]
+        for (key, extractor, writer, pending), group_futures in zip(groups, futures):
+            results = extractor.collect_match_rows(group_futures) if executor is not None \
+                else extractor.iter_match_rows(pending)
+            n_rows = 0
+            try:
+                for _, rows, _ in results:
+                    writer.write_match(rows)
+                    n_rows += len(rows)
+            finally:
+                writer.close()
+            written[key] = n_rows
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    print(f"Saved {sum(written.values())} rows to {output_dir}")
+    return written
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Extract match metrics for a selection of the matches index')
+    parser.add_argument('--config', type=str, default=None, help='JSON file with the selection (MatchSelection keywords)')
+    parser.add_argument('--competitions', type=str, nargs='+', default=None, help='Competition names')
+    parser.add_argument('--seasons', type=str, nargs='+', default=None, help='Season names, e.g. 2015/2016')
+    parser.add_argument('--stages', type=str, nargs='+', default=None, help='Competition stages')
+    parser.add_argument('--from', dest='date_from', type=str, default=None, help='First match date (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='date_to', type=str, default=None, help='Last match date (YYYY-MM-DD)')
+    parser.add_argument('--index', type=str, default='data/matches_index.csv', help='matches_index.csv to select from')
+    parser.add_argument('--output', type=str, default='data/match_metrics', help='Output dataset directory')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (0 = one per CPU, default serial)')
+    parser.add_argument('--cache-dir', type=str, default='data/cache', help='Cache raw StatsBomb responses in this directory')
+    parser.add_argument('--offline', action='store_true', help='Only read from the cache')
+    parser.add_argument('--event-store', type=str, default=None, help='Also write cleaned events to this event store')
+    parser.add_argument('--no-resume', action='store_true', help='Re-extract matches already in the output')
+    args = parser.parse_args()
+
+    config = {}
+    if args.config:
+        with open(args.config, encoding='utf-8') as f:
+            config = json.load(f)
+    for key in ('competitions', 'seasons', 'stages', 'date_from', 'date_to'):
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+
+    from analysis.cache import CachedStatsBombClient, RawDataCache
+    client = CachedStatsBombClient(RawDataCache(args.cache_dir), offline=args.offline)
+    event_store = None
+    if args.event_store:
+        from analysis.event_store import EventStore
+        event_store = EventStore(args.event_store)
+    run_batch(MatchSelection.from_dict(config), args.output, args.index, client=client, workers=args.workers,
+              event_store=event_store, resume=not args.no_resume)
@@ -0,0 +1,228 @@
+# analysis/cache.py
+
+import hashlib
+import os
+import pickle
+import time
+from typing import Any, Callable, Optional
+
+import pandas as pd
+
+from analysis.atomic import write_atomic
+
+
+class CacheMiss(LookupError):
+    """Raised when offline mode is on and the requested resource is not cached."""
+
+
+class RawDataCache:
+    """
+    On-disk cache of StatsBomb responses, one pickle file per (endpoint, key).
+
+    Files are named after a hash of the endpoint and key and written atomically, so several
+    threads or processes can share one cache directory. The modification time of a file is
+    its last use and drives the LRU eviction once the directory grows past `max_bytes`.
+    """
+
+    def __init__(self, directory: str = "data/cache", max_bytes: Optional[int] = 2 * 1024 ** 3):
+        """
+        Args:
+            directory (str): Cache directory (created on first write)
+            max_bytes (Optional[int]): Size limit of the cache directory, None for unbounded
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path_for(self, endpoint: str, key: Any) -> str:
+        """
+        Get the file path of a cached resource.
+
+        Args:
+            endpoint (str): Endpoint name (e.g. 'events')
+            key (Any): Resource key (e.g. a match_id or (competition_id, season_id))
+
+        Returns:
+            str: Path of the cache file
+        """
+        digest = hashlib.sha1(f"{endpoint}:{key!r}".encode()).hexdigest()
+        return os.path.join(self.directory, endpoint, f"{digest}.pkl")
+
+    def get(self, endpoint: str, key: Any, ttl: Optional[float] = None) -> Optional[dict]:
+        """
+        Read a cached resource.
+
+        Args:
+            endpoint (str): Endpoint name
+            key (Any): Resource key
+            ttl (Optional[float]): Maximum age in seconds, None for entries that never expire
+
+        Returns:
+            Optional[dict]: {'data': ..., 'created': timestamp, 'expired': bool} or None on a miss
+        """
+        path = self.path_for(endpoint, key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        entry['expired'] = ttl is not None and time.time() - entry['created'] > ttl
+        return entry
+
+    def put(self, endpoint: str, key: Any, data: Any) -> None:
+        """
+        Store a resource, then evict least recently used files if the cache is over its size limit.
+
+        Args:
+            endpoint (str): Endpoint name
+            key (Any): Resource key
+            data (Any): Picklable response (dataframe or dict of dataframes)
+        """
+        entry = {'data': data, 'created': time.time()}
+
+        def write(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        write_atomic(self.path_for(endpoint, key), write)
+        if self.max_bytes is not None:
+            self.evict(self.max_bytes)
+
+    def evict(self, max_bytes: int) -> int:
+        """
+        Delete least recently used files until the cache fits in `max_bytes`.
+
+        Args:
+            max_bytes (int): Target size of the cache directory
+
+        Returns:
+            int: Number of files removed
+        """
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.pkl'):
+                    try:
+                        stat = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+class CachedStatsBombClient:
+    """
+    Drop-in replacement for `statsbombpy.sb` that serves responses from a RawDataCache.
+
+    Cached entries never expire on their own, except the competitions list which is refreshed
+    once it is older than `competitions_ttl`. Instead the matches of a competition-season are
+    keyed by its `match_updated` (or `last_updated`) stamp in that list, and the events, lineups
+    and frames of a match by its `last_updated` stamp in the latest `matches` response, so they
+    are refetched once StatsBomb reports a correction. In offline mode the network is never
+    used: misses raise CacheMiss and expired entries are served as is.
+    """
+
+    def __init__(self, cache: Optional[RawDataCache] = None, client=None, competitions_ttl: float = 24 * 3600,
+                 offline: bool = False):
+        """
+        Args:
+            cache (Optional[RawDataCache]): Cache to use (defaults to RawDataCache())
+            client: Module or object with the `sb` functions used on a miss (defaults to statsbombpy's sb)
+            competitions_ttl (float): Seconds before the cached competitions list is refetched
+            offline (bool): Never touch the network
+        """
+        self.cache = cache if cache is not None else RawDataCache()
+        self.client = client
+        self.competitions_ttl = competitions_ttl
+        self.offline = offline
+        # match_id -> `last_updated` of the match, learned from every `matches` response
+        self.match_stamps = {}
+
+    def _fetch(self, endpoint: str, key: Any, fetch: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        entry = self.cache.get(endpoint, key, ttl=ttl)
+        if entry is not None and (not entry['expired'] or self.offline):
+            return entry['data']
+        if self.offline:
+            raise CacheMiss(f"{endpoint} {key!r} is not cached and offline mode is on")
+        data = fetch()
+        self.cache.put(endpoint, key, data)
+        return data
+
+    @staticmethod
+    def _key(base: Any, kwargs: dict) -> Any:
+        # extra statsbombpy options (fmt, split, ...) change the response, so they are part of the key
+        return (base, tuple(sorted(kwargs.items()))) if kwargs else base
+
+    def _source(self):
+        # resolved lazily so the client stays picklable and statsbombpy is only imported on a miss
+        if self.client is not None:
+            return self.client
+        from statsbombpy import sb
+        return sb
+
+    def competitions(self, **kwargs):
+        return self._fetch('competitions', self._key(None, kwargs), lambda: self._source().competitions(**kwargs),
+                           ttl=self.competitions_ttl)
+
+    def matches_version(self, competition_id: int, season_id: int) -> Optional[str]:
+        """
+        Get the last-update stamp of a competition-season from the (cached) competitions list.
+
+        Args:
+            competition_id (int): Competition id
+            season_id (int): Season id
+
+        Returns:
+            Optional[str]: `match_updated` (or `last_updated`) of the competition-season, None if unknown
+        """
+        try:
+            competitions = self.competitions()
+        except CacheMiss:
+            return None
+        rows = competitions[(competitions['competition_id'] == int(competition_id)) &
+                            (competitions['season_id'] == int(season_id))]
+        for column in ('match_updated', 'last_updated'):
+            if column in rows.columns and len(rows) and not pd.isna(rows[column].iloc[0]):
+                return str(rows[column].iloc[0])
+        return None
+
+    def matches(self, competition_id: int, season_id: int, **kwargs):
+        key = (int(competition_id), int(season_id))
+        version = self.matches_version(competition_id, season_id)
+        if version is not None:
+            key += (version,)
+        matches = self._fetch('matches', self._key(key, kwargs),
+                              lambda: self._source().matches(competition_id=competition_id, season_id=season_id, **kwargs))
+        if isinstance(matches, pd.DataFrame) and {'match_id', 'last_updated'} <= set(matches.columns):
+            for match_id, stamp in zip(matches['match_id'], matches['last_updated']):
+                if not pd.isna(stamp):
+                    self.match_stamps[int(match_id)] = str(stamp)
+        return matches
+
+    def _match_key(self, match_id: int) -> Any:
+        # a corrected match gets a new stamp, hence a new key; matches never listed keep the bare id
+        stamp = self.match_stamps.get(int(match_id))
+        return int(match_id) if stamp is None else (int(match_id), stamp)
+
+    def events(self, match_id: int, **kwargs):
+        return self._fetch('events', self._key(self._match_key(match_id), kwargs),
+                           lambda: self._source().events(match_id=match_id, **kwargs))
+
+    def lineups(self, match_id: int, **kwargs):
+        return self._fetch('lineups', self._key(self._match_key(match_id), kwargs),
+                           lambda: self._source().lineups(match_id=match_id, **kwargs))
+
+    def frames(self, match_id: int, **kwargs):
+        return self._fetch('frames', self._key(self._match_key(match_id), kwargs),
+                           lambda: self._source().frames(match_id=match_id, **kwargs))
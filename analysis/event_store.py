@@ -0,0 +1,206 @@
+# analysis/event_store.py
+
+import glob
+import json
+import os
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from analysis.atomic import write_atomic
+
+
+class EventStore:
+    """
+    Columnar store of cleaned match events, one Parquet file per match.
+
+    Files live under `<root>/competition_id=<id>/season_id=<id>/match_id=<id>/events.parquet`
+    (hive partitioning), so the partition keys are columns of every read and filters on them
+    skip whole directories. Repeated strings (type, team, player, ...) are dictionary encoded,
+    coordinates are stored as the float32 `*_x/*_y/*_z` columns of `unpack_coordinates`, and
+    the remaining nested values (tactics, related_events, freeze frames) as JSON strings.
+    """
+
+    PARTITION_KEYS = ['competition_id', 'season_id', 'match_id']
+    DICTIONARY_COLUMNS = ['type', 'team', 'player', 'possession_team', 'play_pattern', 'position']
+    FILE_NAME = 'events.parquet'
+
+    def __init__(self, root: str = "data/events"):
+        """
+        Args:
+            root (str): Root directory of the store
+        """
+        self.root = root
+        # schema of every match file seen so far, and the dataset schema of the last file list
+        self._file_schemas = {}
+        self._dataset_schema = None
+
+    def match_path(self, competition_id: int, season_id: int, match_id: int) -> str:
+        """
+        Get the Parquet file path of one match.
+
+        Args:
+            competition_id (int): Competition ID
+            season_id (int): Season ID
+            match_id (int): Match ID
+
+        Returns:
+            str: Path of the match file
+        """
+        return os.path.join(
+            self.root,
+            f"competition_id={int(competition_id)}",
+            f"season_id={int(season_id)}",
+            f"match_id={int(match_id)}",
+            self.FILE_NAME
+        )
+
+    def has_match(self, competition_id: int, season_id: int, match_id: int) -> bool:
+        """Check whether a match is already stored."""
+        return os.path.exists(self.match_path(competition_id, season_id, match_id))
+
+    def matches(self) -> List[tuple]:
+        """Sorted (competition_id, season_id, match_id) of every stored match, read from the directory names."""
+        keys = []
+        for path in glob.glob(os.path.join(self.root, '*', '*', '*', self.FILE_NAME)):
+            parts = os.path.relpath(path, self.root).split(os.sep)[:3]
+            keys.append(tuple(int(part.split('=', 1)[1]) for part in parts))
+        return sorted(keys)
+
+    def to_table(self, events: pd.DataFrame) -> pa.Table:
+        """
+        Convert a cleaned events dataframe into the Arrow table written to disk.
+
+        Args:
+            events (pd.DataFrame): Events with unpacked coordinate columns
+
+        Returns:
+            pa.Table: Table with dictionary-encoded string columns and JSON-encoded nested values
+        """
+        frame = events.drop(columns=[c for c in self.PARTITION_KEYS if c in events.columns])
+        # raw coordinate lists are replaced by their unpacked *_x/*_y/*_z columns
+        frame = frame.drop(columns=[
+            c for c in frame.columns
+            if f"{c}_x" in frame.columns and frame[c].dtype == object
+        ])
+        columns = {}
+        for column in frame.columns:
+            values = frame[column]
+            if values.dtype == object and values.map(lambda v: isinstance(v, (list, tuple, dict))).any():
+                values = values.map(lambda v: json.dumps(v) if isinstance(v, (list, tuple, dict)) else None)
+            if column in self.DICTIONARY_COLUMNS:
+                values = values.astype('category')
+            columns[column] = values
+        return pa.Table.from_pandas(pd.DataFrame(columns, index=frame.index), preserve_index=False)
+
+    def write_match(self, events: pd.DataFrame, competition_id: int, season_id: int, match_id: int) -> str:
+        """
+        Write (or replace) the cleaned events of one match.
+
+        Args:
+            events (pd.DataFrame): Cleaned events of the match (see `clean_events`)
+            competition_id (int): Competition ID
+            season_id (int): Season ID
+            match_id (int): Match ID
+
+        Returns:
+            str: Path of the written file
+        """
+        path = self.match_path(competition_id, season_id, match_id)
+        table = self.to_table(events)
+        write_atomic(path, lambda tmp_path: pq.write_table(table, tmp_path, compression='zstd'))
+        # a replaced match may change the union schema
+        self._file_schemas[path] = pq.read_schema(path)
+        self._dataset_schema = None
+        return path
+
+    def _schema(self, files: List[str]) -> pa.Schema:
+        """Union of the match schemas plus the partition keys, rebuilt only when the file list changes."""
+        if self._dataset_schema is None or self._dataset_schema[0] != files:
+            self._file_schemas = {f: self._file_schemas.get(f) or pq.read_schema(f) for f in files}
+            # matches do not all have the same columns, so read against the union of their schemas
+            schema = pa.unify_schemas(list(self._file_schemas.values()), promote_options='permissive')
+            for key in self.PARTITION_KEYS:
+                schema = schema.append(pa.field(key, pa.int64()))
+            self._dataset_schema = (files, schema)
+        return self._dataset_schema[1]
+
+    def _dataset(self) -> Optional[ds.Dataset]:
+        files = sorted(glob.glob(os.path.join(self.root, '*', '*', '*', self.FILE_NAME)))
+        if not files:
+            return None
+        partition_schema = pa.schema([(key, pa.int64()) for key in self.PARTITION_KEYS])
+        return ds.dataset(
+            files,
+            schema=self._schema(files),
+            format='parquet',
+            partitioning=ds.partitioning(partition_schema, flavor='hive'),
+            partition_base_dir=self.root
+        )
+
+    def columns(self) -> List[str]:
+        """Columns of the stored events (the union over all matches, partition keys included)."""
+        dataset = self._dataset()
+        return dataset.schema.names if dataset is not None else []
+
+    @staticmethod
+    def _to_pandas(table: pa.Table, categorical: bool) -> pd.DataFrame:
+        if not categorical:
+            for i, field in enumerate(table.schema):
+                if pa.types.is_dictionary(field.type):
+                    table = table.set_column(i, field.name, table.column(i).cast(field.type.value_type))
+        return table.to_pandas()
+
+    def read(self, columns: Optional[Sequence[str]] = None, filters: Optional[List[Any]] = None,
+             categorical: bool = True) -> pd.DataFrame:
+        """
+        Read events from the store, pushing the column projection and filters down to the Parquet scan.
+
+        Args:
+            columns (Optional[Sequence[str]]): Columns to read (None reads every column)
+            filters (Optional[List[Any]]): pyarrow-style filters, e.g.
+                [('type', '==', 'Shot'), ('team', 'in', ['Argentina', 'France'])]
+                or [('competition_id', '==', 43), ('season_id', '==', 106)]
+            categorical (bool): Keep dictionary-encoded columns as pandas categoricals
+
+        Returns:
+            pd.DataFrame: Matching events (empty if the store is empty)
+        """
+        dataset = self._dataset()
+        if dataset is None:
+            return pd.DataFrame(columns=list(columns) if columns else None)
+        expression = pq.filters_to_expression(filters) if filters else None
+        columns = list(columns) if columns is not None else None
+        return self._to_pandas(dataset.to_table(columns=columns, filter=expression), categorical)
+
+    def read_match(self, competition_id: int, season_id: int, match_id: int,
+                   columns: Optional[Sequence[str]] = None, categorical: bool = False) -> Optional[pd.DataFrame]:
+        """
+        Read the events of one match without touching the rest of the store.
+
+        Args:
+            competition_id (int): Competition ID
+            season_id (int): Season ID
+            match_id (int): Match ID
+            columns (Optional[Sequence[str]]): Columns to read (None reads every column); columns
+                this match does not have are left out, as they would be from `sb.events`
+            categorical (bool): Keep dictionary-encoded columns as pandas categoricals; the default
+                plain strings match `sb.events`, so the extractor gives the same results on them
+
+        Returns:
+            Optional[pd.DataFrame]: Events of the match, or None if it is not stored
+        """
+        path = self.match_path(competition_id, season_id, match_id)
+        if not os.path.exists(path):
+            return None
+        if columns is not None:
+            available = set(pq.read_schema(path).names)
+            columns = [column for column in columns if column in available]
+        table = pq.read_table(path, columns=columns)
+        events = self._to_pandas(table, categorical)
+        events['match_id'] = np.int64(match_id)
+        return events
@@ -0,0 +1,121 @@
+# analysis/fetching.py
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+
+def call_with_timeout(func: Callable[[], Any], timeout: Optional[float],
+                      slots: Optional[threading.Semaphore] = None) -> Any:
+    """
+    Run `func` and return its result, raising TimeoutError if it takes longer than `timeout` seconds.
+
+    statsbombpy does not expose a request timeout, so the call runs in a daemon thread
+    that is abandoned (not killed) when it overruns.
+
+    Args:
+        func (Callable[[], Any]): Zero-argument callable
+        timeout (Optional[float]): Seconds to wait, or None to wait forever
+        slots (Optional[threading.Semaphore]): Bound on the calls in flight; a slot is taken before
+            the call starts and only given back when it returns, even if it was abandoned
+
+    Returns:
+        Any: Whatever `func` returns
+    """
+    if slots is not None:
+        slots.acquire()
+    if timeout is None:
+        try:
+            return func()
+        finally:
+            if slots is not None:
+                slots.release()
+
+    outcome = {}
+
+    def target():
+        try:
+            outcome['result'] = func()
+        except BaseException as e:
+            outcome['error'] = e
+        finally:
+            if slots is not None:
+                slots.release()
+
+    worker = threading.Thread(target=target, daemon=True)
+    worker.start()
+    worker.join(timeout)
+    if worker.is_alive():
+        raise TimeoutError(f"Request did not finish within {timeout}s")
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+
+def fetch_with_retry(fetch: Callable[[Any], Any], key: Any, retries: int = 2, backoff: float = 0.5,
+                     timeout: Optional[float] = 60.0,
+                     on_retry: Optional[Callable[[Any, int, Exception], None]] = None,
+                     slots: Optional[threading.Semaphore] = None) -> Any:
+    """
+    Call `fetch(key)`, retrying failed or timed-out attempts with exponential backoff.
+
+    Args:
+        fetch (Callable[[Any], Any]): Function fetching one resource
+        key (Any): Argument passed to `fetch` (e.g. a match_id)
+        retries (int): Extra attempts after the first failure
+        backoff (float): Base delay in seconds, doubled after every failed attempt (with jitter)
+        timeout (Optional[float]): Per-attempt timeout in seconds
+        on_retry (Optional[Callable[[Any, int, Exception], None]]): Called with (key, attempt, error)
+            before every retry
+        slots (Optional[threading.Semaphore]): See `call_with_timeout`
+
+    Returns:
+        Any: The result of the first successful attempt (the last error is raised otherwise)
+    """
+    for attempt in range(retries + 1):
+        try:
+            return call_with_timeout(lambda: fetch(key), timeout, slots)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            if on_retry is not None:
+                on_retry(key, attempt, e)
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random() * 0.1))
+
+
+def fetch_concurrently(fetch: Callable[[Any], Any], keys: Iterable[Any], max_concurrency: int = 8,
+                       retries: int = 2, backoff: float = 0.5,
+                       timeout: Optional[float] = 60.0,
+                       on_retry: Optional[Callable[[Any, int, Exception], None]] = None) -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+    """
+    Fetch many resources on a bounded thread pool and stream them back as they finish.
+
+    Args:
+        fetch (Callable[[Any], Any]): Function fetching one resource, e.g. `lambda mid: sb.events(match_id=mid)`
+        keys (Iterable[Any]): One key per request
+        max_concurrency (int): Maximum number of requests in flight, counting timed-out requests
+            that have not returned yet
+        retries (int): Extra attempts per request after a failure
+        backoff (float): Base retry delay in seconds
+        timeout (Optional[float]): Per-attempt timeout in seconds
+        on_retry (Optional[Callable[[Any, int, Exception], None]]): See `fetch_with_retry`
+
+    Yields:
+        Tuple[Any, Any, Optional[Exception]]: (key, result, None) on success or (key, None, error)
+        once all attempts failed, in completion order
+    """
+    # abandoned calls keep their slot, so a retry waits for a free one instead of adding a request
+    slots = threading.BoundedSemaphore(max(1, max_concurrency))
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        futures = {
+            executor.submit(fetch_with_retry, fetch, key, retries, backoff, timeout, on_retry, slots): key
+            for key in keys
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                yield key, future.result(), None
+            except Exception as e:
+                yield key, None, e
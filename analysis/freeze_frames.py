@@ -0,0 +1,366 @@
+# analysis/freeze_frames.py
+
+import glob
+import os
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analysis.atomic import write_atomic
+
+# EventStore columns needed to place the ball and the goal of every frame
+EVENT_COLUMNS = ['id', 'type', 'team', 'location_x', 'location_y', 'pass_end_location_x', 'pass_end_location_y']
+
+
+class FreezeFrames:
+    """
+    The 360 freeze frames of one match in a ragged array layout.
+
+    Frame `i` (the frame of event `event_ids[i]`) holds the players `offsets[i]:offsets[i + 1]`
+    of the flat float32 `x`/`y` arrays and the boolean `teammate` (of the actor), `actor` and
+    `keeper` flags. The visible area polygons are stored the same way (`area_offsets` into the
+    float32 `area` array of (x, y) points). Compared to `sb.frames` (one object row per player,
+    with list-valued locations and the polygon repeated on every row) this is a handful of
+    contiguous arrays per match.
+    """
+
+    def __init__(self, event_ids: np.ndarray, offsets: np.ndarray, x: np.ndarray, y: np.ndarray,
+                 teammate: np.ndarray, actor: np.ndarray, keeper: np.ndarray,
+                 area_offsets: Optional[np.ndarray] = None, area: Optional[np.ndarray] = None,
+                 match_id: Optional[int] = None):
+        """
+        Args:
+            event_ids (np.ndarray): Event id of every frame
+            offsets (np.ndarray): Start of every frame in the player arrays, plus the total at the end
+            x (np.ndarray): float32 player x
+            y (np.ndarray): float32 player y
+            teammate (np.ndarray): Player is a teammate of the actor
+            actor (np.ndarray): Player is the actor of the event
+            keeper (np.ndarray): Player is a goalkeeper
+            area_offsets (Optional[np.ndarray]): Start of every frame's polygon in `area`, plus the total
+            area (Optional[np.ndarray]): float32 (n_points, 2) visible area vertices
+            match_id (Optional[int]): Match ID
+        """
+        self.event_ids = event_ids
+        self.offsets = offsets
+        self.x = x
+        self.y = y
+        self.teammate = teammate
+        self.actor = actor
+        self.keeper = keeper
+        self.area_offsets = area_offsets if area_offsets is not None else np.zeros(len(event_ids) + 1, dtype=np.int64)
+        self.area = area if area is not None else np.zeros((0, 2), dtype=np.float32)
+        self.match_id = match_id
+
+    @classmethod
+    def from_frames(cls, frames: pd.DataFrame, match_id: Optional[int] = None) -> "FreezeFrames":
+        """
+        Convert the output of `sb.frames` (one row per visible player).
+
+        Args:
+            frames (pd.DataFrame): id, location, teammate, actor, keeper and visible_area columns
+            match_id (Optional[int]): Match ID (taken from the frames if None)
+
+        Returns:
+            FreezeFrames: The frames in event order of first appearance
+        """
+        if match_id is None and 'match_id' in frames.columns and len(frames):
+            match_id = int(frames['match_id'].iloc[0])
+        codes, event_ids = pd.factorize(frames['id'], sort=False)
+        # rows of one event are contiguous in sb.frames; a stable sort makes sure of it
+        order = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes, minlength=len(event_ids))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        locations = frames['location'].to_numpy()[order]
+        xy = np.full((len(frames), 2), np.nan, dtype=np.float32)
+        valid = np.fromiter((isinstance(v, (list, tuple, np.ndarray)) and len(v) >= 2 for v in locations),
+                            dtype=bool, count=len(locations))
+        if valid.any():
+            xy[valid] = np.array([v[:2] for v in locations[valid]], dtype=np.float32)
+
+        area_offsets = np.zeros(len(event_ids) + 1, dtype=np.int64)
+        area = np.zeros((0, 2), dtype=np.float32)
+        if 'visible_area' in frames.columns:
+            # the polygon is repeated on every row of a frame: keep the first
+            first = frames['visible_area'].to_numpy()[order][offsets[:-1]]
+            polygons = [np.asarray(p, dtype=np.float32).reshape(-1, 2) if isinstance(p, (list, tuple, np.ndarray))
+                        else np.zeros((0, 2), dtype=np.float32) for p in first]
+            area_offsets[1:] = np.cumsum([len(p) for p in polygons])
+            if polygons:
+                area = np.concatenate(polygons)
+
+        def flag(column):
+            if column not in frames.columns:
+                return np.zeros(len(frames), dtype=bool)
+            return np.array(frames[column].to_numpy()[order] == True, dtype=bool)
+
+        return cls(np.asarray(event_ids, dtype=object), offsets, xy[:, 0].copy(), xy[:, 1].copy(),
+                   flag('teammate'), flag('actor'), flag('keeper'), area_offsets, area, match_id)
+
+    def __len__(self) -> int:
+        return len(self.event_ids)
+
+    @property
+    def n_players(self) -> int:
+        return len(self.x)
+
+    def counts(self) -> np.ndarray:
+        """Visible players per frame."""
+        return np.diff(self.offsets)
+
+    def frame_of_player(self) -> np.ndarray:
+        """Frame index of every entry of the player arrays."""
+        return np.repeat(np.arange(len(self)), self.counts())
+
+    def frame(self, i: int) -> pd.DataFrame:
+        """Players of frame `i` as a small dataframe."""
+        rows = slice(self.offsets[i], self.offsets[i + 1])
+        return pd.DataFrame({'x': self.x[rows], 'y': self.y[rows], 'teammate': self.teammate[rows],
+                             'actor': self.actor[rows], 'keeper': self.keeper[rows]})
+
+    def visible_area(self, i: int) -> np.ndarray:
+        """(n, 2) vertices of the visible area polygon of frame `i`."""
+        return self.area[self.area_offsets[i]:self.area_offsets[i + 1]]
+
+    def save(self, path: str) -> None:
+        """Write the arrays to one compressed .npz file (atomically)."""
+        arrays = {
+            'event_ids': self.event_ids.astype(str),
+            'offsets': self.offsets,
+            'x': self.x,
+            'y': self.y,
+            'teammate': self.teammate,
+            'actor': self.actor,
+            'keeper': self.keeper,
+            'area_offsets': self.area_offsets,
+            'area': self.area,
+            'match_id': np.array(-1 if self.match_id is None else self.match_id, dtype=np.int64),
+        }
+
+        def write(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                np.savez_compressed(f, **arrays)
+
+        write_atomic(path, write)
+
+    @classmethod
+    def load(cls, path: str) -> "FreezeFrames":
+        """Read frames written by `save`."""
+        with np.load(path, allow_pickle=False) as data:
+            match_id = int(data['match_id'])
+            return cls(data['event_ids'].astype(object), data['offsets'], data['x'], data['y'], data['teammate'],
+                       data['actor'], data['keeper'], data['area_offsets'], data['area'],
+                       None if match_id < 0 else match_id)
+
+
+def _segment_reduce(ufunc, values: np.ndarray, offsets: np.ndarray, empty: float) -> np.ndarray:
+    # ufunc.reduceat over the ragged segments; reduceat misreads empty segments, so they are patched
+    n = len(offsets) - 1
+    result = np.full(n, empty, dtype=np.float64)
+    non_empty = np.flatnonzero(offsets[1:] > offsets[:-1])
+    if len(non_empty) and len(values):
+        result[non_empty] = ufunc.reduceat(values, offsets[:-1][non_empty])
+    return result
+
+
+def frame_features(frames: FreezeFrames, events: pd.DataFrame, extractor=None, goal_width: float = 8.0,
+                   pressure_radius: float = 5.0) -> pd.DataFrame:
+    """
+    Per-event features of the freeze frames, computed on the flat player arrays.
+
+    Frames are joined to the events by event id. The ball is at the event location (or at the
+    actor when the event has none) and the goal is the one the event's team attacks according
+    to `infer_team_direction`. Opponents are the players who are not teammates of the actor.
+
+    - n_teammates / n_opponents: visible players besides the actor
+    - opponents_goal_side: opponents closer to the goal line than the ball
+    - defenders_between: opponents inside the triangle ball - goal posts (goalkeeper included)
+    - nearest_opponent / nearest_teammate: distance from the ball (NaN when nobody is visible)
+    - opponents_within: opponents within `pressure_radius` of the ball
+
+    Args:
+        frames (FreezeFrames): Frames of one match
+        events (pd.DataFrame): Cleaned events of the match (id, type, team and coordinates)
+        extractor (Optional[RefactoredWorldCupExtractor]): Supplies the pitch size and team directions
+        goal_width (float): Distance between the posts
+        pressure_radius (float): Radius of `opponents_within`
+
+    Returns:
+        pd.DataFrame: One row per frame with event_id, type, team, ball_x, ball_y and the features
+    """
+    if extractor is None:
+        from analysis.worldcup_to_csv import RefactoredWorldCupExtractor
+        extractor = RefactoredWorldCupExtractor(verbose=False)
+    events = extractor.ensure_coordinates(events)
+    row = pd.Index(events['id']).get_indexer(frames.event_ids)
+    joined = row >= 0
+    team = np.where(joined, events['team'].to_numpy(dtype=object)[row], None)
+    event_type = np.where(joined, events['type'].to_numpy(dtype=object)[row], None)
+    ball_x = np.where(joined, events['location_x'].to_numpy(dtype=np.float64)[row], np.nan)
+    ball_y = np.where(joined, events['location_y'].to_numpy(dtype=np.float64)[row], np.nan)
+
+    frame_of = frames.frame_of_player()
+    x = frames.x.astype(np.float64)
+    y = frames.y.astype(np.float64)
+    offsets = frames.offsets
+    # events without a location: the ball is with the actor
+    actor_x = _segment_reduce(np.fmax, np.where(frames.actor, x, np.nan), offsets, np.nan)
+    actor_y = _segment_reduce(np.fmax, np.where(frames.actor, y, np.nan), offsets, np.nan)
+    ball_x = np.where(np.isnan(ball_x), actor_x, ball_x)
+    ball_y = np.where(np.isnan(ball_y), actor_y, ball_y)
+
+    directions = extractor.match_context(events).directions
+    direction = np.array([directions.get(name, 1) for name in team], dtype=np.float64)
+    goal_x = np.where(direction == -1, 0.0, extractor.pitch_length)
+    goal_y = extractor.pitch_width / 2
+
+    opponent = ~frames.teammate & ~frames.actor
+    teammate = frames.teammate & ~frames.actor
+    px = x - ball_x[frame_of]
+    py = y - ball_y[frame_of]
+    distance = np.hypot(px, py)
+
+    goal_side = opponent & ((x - ball_x[frame_of]) * direction[frame_of] > 0)
+    # inside the triangle ball - near post - far post: same side of all three edges
+    post_x = goal_x[frame_of]
+    corners = [(ball_x[frame_of], ball_y[frame_of]), (post_x, goal_y - goal_width / 2), (post_x, goal_y + goal_width / 2)]
+    sides = []
+    for (ax, ay), (bx, by) in zip(corners, corners[1:] + corners[:1]):
+        sides.append((bx - ax) * (y - ay) - (by - ay) * (x - ax))
+    sides = np.stack(sides)
+    between = opponent & ((sides >= 0).all(axis=0) | (sides <= 0).all(axis=0))
+
+    features = pd.DataFrame({
+        'match_id': np.int64(-1 if frames.match_id is None else frames.match_id),
+        'event_id': frames.event_ids,
+        'type': event_type,
+        'team': team,
+        'ball_x': ball_x.astype(np.float32),
+        'ball_y': ball_y.astype(np.float32),
+        'n_teammates': _segment_reduce(np.add, teammate.astype(np.int64), offsets, 0).astype(np.int16),
+        'n_opponents': _segment_reduce(np.add, opponent.astype(np.int64), offsets, 0).astype(np.int16),
+        'opponents_goal_side': _segment_reduce(np.add, goal_side.astype(np.int64), offsets, 0).astype(np.int16),
+        'defenders_between': _segment_reduce(np.add, between.astype(np.int64), offsets, 0).astype(np.int16),
+        'nearest_opponent': _segment_reduce(np.fmin, np.where(opponent, distance, np.nan), offsets, np.nan).astype(np.float32),
+        'nearest_teammate': _segment_reduce(np.fmin, np.where(teammate, distance, np.nan), offsets, np.nan).astype(np.float32),
+        'opponents_within': _segment_reduce(
+            np.add, (opponent & (distance <= pressure_radius)).astype(np.int64), offsets, 0).astype(np.int16),
+    })
+    return features
+
+
+def iter_freeze_frames(match_ids: Iterable[int], client, events_for=None, extractor=None
+                       ) -> Iterator[Tuple[int, Optional[FreezeFrames], Optional[pd.DataFrame]]]:
+    """
+    Stream matches one at a time: fetch the 360 frames, convert them to the ragged layout and
+    compute their features, so memory holds a single match whatever the number of matches.
+
+    Args:
+        match_ids (Iterable[int]): Matches to process
+        client: `sb` or a CachedStatsBombClient (frames, and events when `events_for` is None)
+        events_for (Optional[Callable[[int], pd.DataFrame]]): Returns the cleaned events of a match
+            (e.g. from an EventStore); defaults to fetching and cleaning them with the client
+        extractor (Optional[RefactoredWorldCupExtractor]): Used for cleaning and by `frame_features`
+
+    Yields:
+        Tuple[int, Optional[FreezeFrames], Optional[pd.DataFrame]]: match_id, frames and features
+        (both None when the match has no 360 data)
+    """
+    if extractor is None:
+        from analysis.worldcup_to_csv import RefactoredWorldCupExtractor
+        extractor = RefactoredWorldCupExtractor(client=client, verbose=False)
+    for match_id in match_ids:
+        try:
+            raw = client.frames(match_id=match_id)
+        except Exception as e:
+            print(f"No 360 data for match {match_id}: {e}")
+            yield match_id, None, None
+            continue
+        if raw is None or raw.empty:
+            yield match_id, None, None
+            continue
+        frames = FreezeFrames.from_frames(raw, match_id)
+        del raw
+        if events_for is not None:
+            events = events_for(match_id)
+        else:
+            events = extractor.clean_events(client.events(match_id=match_id))
+        yield match_id, frames, frame_features(frames, events, extractor)
+
+
+def process_360_matches(match_ids: Iterable[int], client, output_dir: str = "data/freeze_frames",
+                        event_store=None, extractor=None, incremental: bool = True) -> Dict[int, int]:
+    """
+    Write the ragged frames and features of every 360 match under `<output_dir>/match_id=<id>/`
+    (`frames.npz` and `features.parquet`), one match at a time.
+
+    Args:
+        match_ids (Iterable[int]): Matches to process (matches without 360 data are skipped)
+        client: `sb` or a CachedStatsBombClient
+        output_dir (str): Root of the output
+        event_store (Optional[EventStore]): Read the cleaned events from this store instead of the client
+        extractor (Optional[RefactoredWorldCupExtractor]): See `iter_freeze_frames`
+        incremental (bool): Skip matches already written
+
+    Returns:
+        Dict[int, int]: Frames written per match
+    """
+    def match_dir(match_id):
+        return os.path.join(output_dir, f"match_id={int(match_id)}")
+
+    match_ids = [m for m in match_ids
+                 if not (incremental and os.path.exists(os.path.join(match_dir(m), 'features.parquet')))]
+    events_for = None
+    if event_store is not None:
+        stored = {key[2]: key for key in event_store.matches()}
+        available = set(event_store.columns())
+        columns = [c for c in EVENT_COLUMNS if c in available]
+
+        def events_for(match_id):
+            return event_store.read_match(*stored[match_id], columns=columns)
+
+        match_ids = [m for m in match_ids if m in stored]
+    written = {}
+    for match_id, frames, features in iter_freeze_frames(match_ids, client, events_for, extractor):
+        if frames is None:
+            continue
+        frames.save(os.path.join(match_dir(match_id), 'frames.npz'))
+        # features last: their presence marks the match as done
+        write_atomic(os.path.join(match_dir(match_id), 'features.parquet'),
+                     lambda tmp_path: features.to_parquet(tmp_path, index=False))
+        written[match_id] = len(frames)
+        print(f"Match {match_id}: {len(frames)} frames, {frames.n_players} player positions")
+    print(f"Saved 360 data of {len(written)} matches to {output_dir}")
+    return written
+
+
+def read_frame_features(output_dir: str = "data/freeze_frames") -> pd.DataFrame:
+    """Features of every processed match (see `process_360_matches`)."""
+    files = sorted(glob.glob(os.path.join(output_dir, 'match_id=*', 'features.parquet')))
+    if not files:
+        return pd.DataFrame()
+    return pd.concat([pd.read_parquet(f) for f in files], ignore_index=True)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Convert 360 freeze frames to ragged arrays and per-event features')
+    parser.add_argument('match_ids', type=int, nargs='*', help='Matches to process (default: every match of the event store)')
+    parser.add_argument('--event-store', type=str, default=None, help='Read cleaned events from this EventStore')
+    parser.add_argument('--save', type=str, default='data/freeze_frames', help='Output directory')
+    parser.add_argument('--cache-dir', type=str, default='data/cache', help='Cache raw StatsBomb responses in this directory')
+    parser.add_argument('--offline', action='store_true', help='Only read from the cache')
+    parser.add_argument('--rebuild', action='store_true', help='Reprocess matches already written')
+    args = parser.parse_args()
+
+    from analysis.cache import CachedStatsBombClient, RawDataCache
+    client = CachedStatsBombClient(RawDataCache(args.cache_dir), offline=args.offline)
+    event_store = None
+    if args.event_store:
+        from analysis.event_store import EventStore
+        event_store = EventStore(args.event_store)
+    match_ids = args.match_ids or ([key[2] for key in event_store.matches()] if event_store else [])
+    if not match_ids:
+        parser.error('give match ids or an --event-store to take them from')
+    process_360_matches(match_ids, client, args.save, event_store, incremental=not args.rebuild)
@@ -0,0 +1,318 @@
+# analysis/heatmaps.py
+
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analysis.atomic import write_atomic
+
+# heatmap name -> event type binned at its start location
+HEATMAP_TYPES: Dict[str, str] = {
+    'passes': 'Pass',
+    'pressures': 'Pressure',
+    'shots': 'Shot',
+    'carries': 'Carry',
+}
+
+
+class PitchGrid:
+    """Fixed grid of `bins_x` x `bins_y` equal cells over a pitch of `pitch_length` x `pitch_width`."""
+
+    def __init__(self, bins_x: int = 12, bins_y: int = 8, pitch_length: float = 120.0, pitch_width: float = 80.0):
+        """
+        Args:
+            bins_x (int): Cells along the length (attacking direction)
+            bins_y (int): Cells along the width
+            pitch_length (float): Pitch length in data units
+            pitch_width (float): Pitch width in data units
+        """
+        self.bins_x = int(bins_x)
+        self.bins_y = int(bins_y)
+        self.pitch_length = float(pitch_length)
+        self.pitch_width = float(pitch_width)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.bins_x, self.bins_y
+
+    @property
+    def n_cells(self) -> int:
+        return self.bins_x * self.bins_y
+
+    def edges(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Cell edges along x and y."""
+        return (np.linspace(0, self.pitch_length, self.bins_x + 1),
+                np.linspace(0, self.pitch_width, self.bins_y + 1))
+
+    def cells(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """
+        Flat cell index (x cell * bins_y + y cell) of every point; -1 for missing or off-pitch points.
+
+        Points on the far touchline/goal line fall in the last cell, as in `np.histogram2d`.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            inside = (x >= 0) & (x <= self.pitch_length) & (y >= 0) & (y <= self.pitch_width)
+        ix = np.minimum((np.where(inside, x, 0) / self.pitch_length * self.bins_x).astype(np.int64), self.bins_x - 1)
+        iy = np.minimum((np.where(inside, y, 0) / self.pitch_width * self.bins_y).astype(np.int64), self.bins_y - 1)
+        return np.where(inside, ix * self.bins_y + iy, -1)
+
+    def histogram(self, x: np.ndarray, y: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+        """Counts (or summed weights) per cell of one set of points, shape (bins_x, bins_y)."""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        valid = ~(np.isnan(x) | np.isnan(y))
+        x_edges, y_edges = self.edges()
+        counts, _, _ = np.histogram2d(x[valid], y[valid], bins=[x_edges, y_edges],
+                                      weights=None if weights is None else np.asarray(weights)[valid])
+        return counts
+
+    def to_dict(self) -> Dict[str, float]:
+        return {'bins_x': self.bins_x, 'bins_y': self.bins_y,
+                'pitch_length': self.pitch_length, 'pitch_width': self.pitch_width}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, PitchGrid) and self.to_dict() == other.to_dict()
+
+
+class Heatmaps:
+    """
+    Event count grids per (match, team, player), stored as one compact array.
+
+    `grids[i, t]` is the `PitchGrid` of HEATMAP_TYPES entry `t` for key row `i` of `keys`
+    (match_id, team, player_id). Every match has a team row (player_id TEAM) and one row per
+    player. Coordinates are oriented so that every team attacks towards increasing x, hence
+    grids of different matches line up and a tournament heatmap is the sum of match grids.
+    """
+
+    KEY_COLUMNS = ['match_id', 'team', 'player_id']
+    TEAM = -1  # player_id of the team rows
+    DTYPE = np.uint16  # per-match counts of one cell stay far below 65535
+
+    def __init__(self, keys: Optional[pd.DataFrame] = None, grids: Optional[np.ndarray] = None,
+                 grid: Optional[PitchGrid] = None, types: Optional[List[str]] = None):
+        """
+        Args:
+            keys (Optional[pd.DataFrame]): match_id, team, player_id of every grid
+            grids (Optional[np.ndarray]): Counts of shape (len(keys), len(types), bins_x, bins_y)
+            grid (Optional[PitchGrid]): Grid the counts were binned on
+            types (Optional[List[str]]): Heatmap names (HEATMAP_TYPES keys) along the second axis
+        """
+        self.grid = grid or PitchGrid()
+        self.types = list(types or HEATMAP_TYPES)
+        if keys is None:
+            keys = pd.DataFrame({'match_id': np.empty(0, np.int64), 'team': np.empty(0, object),
+                                 'player_id': np.empty(0, np.int64)})
+            grids = np.zeros((0, len(self.types)) + self.grid.shape, dtype=self.DTYPE)
+        self.keys = keys.reset_index(drop=True)
+        self.grids = grids
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def matches(self) -> List[int]:
+        """Sorted match ids with grids."""
+        return sorted(self.keys['match_id'].unique().tolist())
+
+    def teams(self) -> List[str]:
+        return sorted(self.keys['team'].unique().tolist())
+
+    # ----------------- Updates -----------------
+    def update(self, other: "Heatmaps") -> int:
+        """
+        Append the grids of matches not present yet.
+
+        Args:
+            other (Heatmaps): Grids of new matches (same grid and types)
+
+        Returns:
+            int: Number of matches added
+        """
+        if other.grid != self.grid or other.types != self.types:
+            raise ValueError("Heatmaps were binned on a different grid or with other event types")
+        new = ~other.keys['match_id'].isin(self.keys['match_id']).to_numpy()
+        if not new.any():
+            return 0
+        self.keys = pd.concat([self.keys, other.keys[new]], ignore_index=True)
+        self.grids = np.concatenate([self.grids, other.grids[new]])
+        return int(other.keys.loc[new, 'match_id'].nunique())
+
+    # ----------------- Queries -----------------
+    def select(self, team: Optional[str] = None, player_id: Optional[int] = None,
+               match_ids: Optional[Iterable[int]] = None) -> np.ndarray:
+        """Row mask of a team's rows (player_id None) or of one player, optionally in some matches only."""
+        keys = self.keys
+        mask = np.array(keys['player_id'] == (self.TEAM if player_id is None else int(player_id)), dtype=bool)
+        if team is not None:
+            mask &= (keys['team'] == team).to_numpy()
+        if match_ids is not None:
+            mask &= keys['match_id'].isin(list(match_ids)).to_numpy()
+        return mask
+
+    def sum(self, heatmap: str, team: Optional[str] = None, player_id: Optional[int] = None,
+            match_ids: Optional[Iterable[int]] = None) -> np.ndarray:
+        """
+        Add up the precomputed grids of a team or player.
+
+        Args:
+            heatmap (str): One of `types`, e.g. 'pressures'
+            team (Optional[str]): Team (every team if None)
+            player_id (Optional[int]): Player (the team rows if None)
+            match_ids (Optional[Iterable[int]]): Only these matches (all if None)
+
+        Returns:
+            np.ndarray: Counts of shape (bins_x, bins_y), attacking towards increasing x
+        """
+        rows = self.select(team, player_id, match_ids)
+        return self.grids[rows, self.types.index(heatmap)].sum(axis=0, dtype=np.int64)
+
+    # ----------------- Storage -----------------
+    def save(self, path: str = "data/heatmaps.npz") -> None:
+        """Write the keys, grids and grid definition to one compressed .npz file (atomically)."""
+        arrays = {
+            'grids': self.grids,
+            'match_id': self.keys['match_id'].to_numpy(dtype=np.int64),
+            'team': self.keys['team'].to_numpy(dtype=str),
+            'player_id': self.keys['player_id'].to_numpy(dtype=np.int64),
+            'types': np.array(self.types, dtype=str),
+            'grid': np.array([self.grid.bins_x, self.grid.bins_y, self.grid.pitch_length, self.grid.pitch_width]),
+        }
+
+        def write(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                np.savez_compressed(f, **arrays)
+
+        write_atomic(path, write)
+
+    @classmethod
+    def load(cls, path: str = "data/heatmaps.npz") -> "Heatmaps":
+        """Read grids written by `save`; a missing file gives an empty set."""
+        if not os.path.exists(path):
+            return cls()
+        with np.load(path, allow_pickle=False) as data:
+            bins_x, bins_y, pitch_length, pitch_width = data['grid'].tolist()
+            keys = pd.DataFrame({'match_id': data['match_id'], 'team': data['team'].astype(object),
+                                 'player_id': data['player_id']})
+            return cls(keys, data['grids'], PitchGrid(int(bins_x), int(bins_y), pitch_length, pitch_width),
+                       data['types'].tolist())
+
+
+def match_heatmaps(events: pd.DataFrame, grid: Optional[PitchGrid] = None, extractor=None,
+                   match_id: Optional[int] = None) -> Heatmaps:
+    """
+    Bin the passes, pressures, shots and carries of one match per team and per player.
+
+    Teams inferred to attack towards decreasing x (see `infer_team_direction`) are mirrored,
+    then every event gets one code (row, heatmap, cell) and a single `np.bincount` fills all
+    the grids of the match.
+
+    Args:
+        events (pd.DataFrame): Cleaned events of the match
+        grid (Optional[PitchGrid]): Grid to bin on (the extractor's pitch with 12 x 8 cells if None)
+        extractor (Optional[RefactoredWorldCupExtractor]): Supplies the pitch size and team directions
+        match_id (Optional[int]): Match ID (taken from the events if None)
+
+    Returns:
+        Heatmaps: Team rows then player rows of the match
+    """
+    if extractor is None:
+        from analysis.worldcup_to_csv import RefactoredWorldCupExtractor
+        extractor = RefactoredWorldCupExtractor(verbose=False)
+    if grid is None:
+        grid = PitchGrid(pitch_length=extractor.pitch_length, pitch_width=extractor.pitch_width)
+    if match_id is None and 'match_id' in events.columns and len(events):
+        match_id = int(events['match_id'].iloc[0])
+    events = extractor.ensure_coordinates(events)
+    types = list(HEATMAP_TYPES)
+
+    team = events['team'].to_numpy(dtype=object)
+    mirrored = events['team'].map(extractor.match_context(events).directions).to_numpy() == -1
+    x = events['location_x'].to_numpy(dtype=np.float64)
+    y = events['location_y'].to_numpy(dtype=np.float64)
+    x = np.where(mirrored, grid.pitch_length - x, x)
+    y = np.where(mirrored, grid.pitch_width - y, y)
+    cell = grid.cells(x, y)
+    type_code = events['type'].map({event_type: i for i, event_type in enumerate(HEATMAP_TYPES.values())})
+    type_code = type_code.fillna(-1).to_numpy(dtype=np.int64)
+    valid = (cell >= 0) & (type_code >= 0) & pd.notna(team)
+
+    team_names, team_code = np.unique(team[valid].astype(str), return_inverse=True)
+    player_id = events['player_id'].fillna(Heatmaps.TEAM).to_numpy(dtype=np.int64)[valid]
+    # players are keyed by (team, player_id)
+    has_player = player_id != Heatmaps.TEAM
+    pairs, player_code = np.unique(np.stack([team_code[has_player], player_id[has_player]], axis=1),
+                                   axis=0, return_inverse=True)
+    player_code = player_code.reshape(-1)
+
+    n_teams = len(team_names)
+    n_rows = n_teams + len(pairs)
+    # every event counts once in its team row and once in its player row
+    rows = np.concatenate([team_code, n_teams + player_code])
+    event_type = np.concatenate([type_code[valid], type_code[valid][has_player]])
+    event_cell = np.concatenate([cell[valid], cell[valid][has_player]])
+    codes = (rows * len(types) + event_type) * grid.n_cells + event_cell
+    counts = np.bincount(codes, minlength=n_rows * len(types) * grid.n_cells)
+    grids = counts.reshape((n_rows, len(types)) + grid.shape).astype(Heatmaps.DTYPE)
+
+    keys = pd.DataFrame({
+        'match_id': np.full(n_rows, match_id if match_id is not None else -1, dtype=np.int64),
+        'team': np.concatenate([team_names, team_names[pairs[:, 0]] if len(pairs) else []]).astype(object),
+        'player_id': np.concatenate([np.full(n_teams, Heatmaps.TEAM), pairs[:, 1] if len(pairs) else []]).astype(np.int64),
+    })
+    return Heatmaps(keys, grids, grid, types)
+
+
+# EventStore columns needed to bin a match
+EVENT_COLUMNS = ['match_id', 'type', 'team', 'player_id', 'location_x', 'location_y',
+                 'pass_end_location_x', 'pass_end_location_y']
+
+
+def build_heatmaps(event_store, output_path: str = "data/heatmaps.npz", grid: Optional[PitchGrid] = None,
+                   filters: Optional[List[Any]] = None, incremental: bool = True, extractor=None) -> Heatmaps:
+    """
+    Bin the matches of an EventStore, reading only the columns the grids need.
+
+    Args:
+        event_store (EventStore): Store written by the extractor (`--event-store`)
+        output_path (str): .npz file of the heatmaps
+        grid (Optional[PitchGrid]): Grid to bin on (must match the saved one when incremental)
+        filters (Optional[List[Any]]): Extra EventStore filters, e.g. [('competition_id', '==', 43)]
+        incremental (bool): Only add matches that are not in the file yet
+        extractor (Optional[RefactoredWorldCupExtractor]): See `match_heatmaps`
+
+    Returns:
+        Heatmaps: The updated heatmaps
+    """
+    heatmaps = Heatmaps.load(output_path) if incremental else Heatmaps(grid=grid)
+    if grid is None:
+        grid = heatmaps.grid
+    elif incremental and len(heatmaps) and grid != heatmaps.grid:
+        raise ValueError(f"{output_path} uses a {heatmaps.grid.shape} grid; rebuild it to change the grid")
+    heatmaps.grid = grid
+    filters = [('type', 'in', list(HEATMAP_TYPES.values()))] + list(filters or [])
+    if incremental and heatmaps.matches():
+        filters.append(('match_id', 'not in', heatmaps.matches()))
+    events = event_store.read(columns=EVENT_COLUMNS, filters=filters, categorical=False)
+    added = 0
+    for match_id, match_events in events.groupby('match_id', sort=True):
+        added += heatmaps.update(match_heatmaps(match_events.reset_index(drop=True), grid, extractor, match_id))
+    heatmaps.save(output_path)
+    print(f"Added {added} matches ({len(heatmaps.matches())} in total) to {output_path}")
+    return heatmaps
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Precompute pass, pressure, shot and carry heatmaps')
+    parser.add_argument('--event-store', type=str, default='data/events', help='EventStore root with the cleaned events')
+    parser.add_argument('--save', type=str, default='data/heatmaps.npz', help='Heatmaps file')
+    parser.add_argument('--bins', type=int, nargs=2, default=None, metavar=('X', 'Y'), help='Cells along the length and width (default 12 8)')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild instead of adding new matches')
+    args = parser.parse_args()
+
+    from analysis.event_store import EventStore
+    grid = PitchGrid(*args.bins) if args.bins else None
+    build_heatmaps(EventStore(args.event_store), args.save, grid, incremental=not args.rebuild)
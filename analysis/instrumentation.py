@@ -0,0 +1,187 @@
+# analysis/instrumentation.py
+
+import json
+import logging
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Optional
+
+from analysis.atomic import write_atomic
+
+StageCallback = Callable[[str, Dict[str, Any]], None]
+StageEndCallback = Callable[[str, Dict[str, Any], float], None]
+
+_NULL_STAGE = nullcontext()
+
+
+def _json_default(value: Any) -> Any:
+    # numpy scalars (match_id from a pandas row) -> Python numbers, anything else -> str
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+class NullInstrumentation:
+    """
+    Instrumentation that records nothing, used when tracing is off.
+
+    `stage` hands back one shared no-op context manager and `increment` returns at once,
+    so the hooks left in the extraction hot path cost a method call each.
+    """
+
+    enabled = False
+
+    def stage(self, name: str, **labels: Any):
+        return _NULL_STAGE
+
+    def increment(self, name: str, value: float = 1) -> None:
+        pass
+
+    def drain(self) -> Optional[dict]:
+        return None
+
+    def merge(self, snapshot: Optional[dict]) -> None:
+        pass
+
+
+NULL_INSTRUMENTATION = NullInstrumentation()
+
+
+class Instrumentation(NullInstrumentation):
+    """
+    Stage timers and counters of the extraction pipeline.
+
+    Stages nest (`match` > `fetch`, `clean`, `metrics.passing`, ...) and inherit the labels of
+    the stages around them, so every finished stage can be reported with its match_id. Totals
+    per stage name and counters are kept for `snapshot`, `to_prometheus` and `log_summary`.
+
+    Everything given to the constructor must be picklable when the extractor runs in a
+    process pool: workers record into their copy and the parent `merge`s what they `drain`.
+    """
+
+    enabled = True
+
+    def __init__(self, on_stage_start: Optional[StageCallback] = None, on_stage_end: Optional[StageEndCallback] = None,
+                 logger: Optional[logging.Logger] = None, namespace: str = "football_eda"):
+        """
+        Args:
+            on_stage_start (Optional[StageCallback]): Called with (stage, labels) when a stage starts
+            on_stage_end (Optional[StageEndCallback]): Called with (stage, labels, seconds) when it ends
+            logger (Optional[logging.Logger]): Logs one JSON record per finished stage at INFO level
+            namespace (str): Prefix of the Prometheus metric names
+        """
+        self.on_stage_start = on_stage_start
+        self.on_stage_end = on_stage_end
+        self.logger = logger
+        self.namespace = namespace
+        self._labels = [{}]
+        self._reset()
+
+    def _reset(self) -> None:
+        self.timers = defaultdict(lambda: [0, 0.0])
+        self.counters = defaultdict(float)
+
+    def __getstate__(self):
+        # a pickled copy (a pool task) starts from empty totals: the parent merges back only
+        # what the copy recorded, so its own totals are not counted again once per task
+        state = self.__dict__.copy()
+        del state['timers'], state['counters']
+        state['_labels'] = [{}]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    @contextmanager
+    def stage(self, name: str, **labels: Any):
+        """
+        Time the enclosed block as stage `name`.
+
+        Args:
+            name (str): Stage name, e.g. 'fetch' or 'metrics.passing'
+            **labels (Any): Labels of this stage and of the stages nested in it, e.g. match_id
+        """
+        labels = {**self._labels[-1], **labels}
+        self._labels.append(labels)
+        if self.on_stage_start is not None:
+            self.on_stage_start(name, labels)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._labels.pop()
+            timer = self.timers[name]
+            timer[0] += 1
+            timer[1] += seconds
+            if self.on_stage_end is not None:
+                self.on_stage_end(name, labels, seconds)
+            if self.logger is not None:
+                self.logger.info(json.dumps({'event': 'stage', 'stage': name, 'seconds': round(seconds, 6), **labels},
+                                            default=_json_default))
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Add `value` to counter `name` (e.g. 'events_processed', 'matches_skipped', 'fetch_retries')."""
+        self.counters[name] += value
+
+    def snapshot(self) -> dict:
+        """
+        Get the totals recorded so far.
+
+        Returns:
+            dict: {'stages': {stage: {'count': int, 'seconds': float}}, 'counters': {counter: value}}
+        """
+        return {
+            'stages': {name: {'count': count, 'seconds': seconds} for name, (count, seconds) in self.timers.items()},
+            'counters': dict(self.counters)
+        }
+
+    def drain(self) -> dict:
+        """Return the snapshot and start over (used to ship a worker's totals to the parent process)."""
+        snapshot = self.snapshot()
+        self._reset()
+        return snapshot
+
+    def merge(self, snapshot: Optional[dict]) -> None:
+        """Add the totals of another snapshot (e.g. from a worker process)."""
+        if not snapshot:
+            return
+        for name, stats in snapshot['stages'].items():
+            timer = self.timers[name]
+            timer[0] += stats['count']
+            timer[1] += stats['seconds']
+        for name, value in snapshot['counters'].items():
+            self.counters[name] += value
+
+    def to_prometheus(self) -> str:
+        """
+        Render the totals in the Prometheus text exposition format.
+
+        Returns:
+            str: `<namespace>_stage_seconds` as a summary labelled by stage, one `_total` counter per counter
+        """
+        metric = f"{self.namespace}_stage_seconds"
+        lines = [f"# HELP {metric} Wall time spent in each extraction stage.", f"# TYPE {metric} summary"]
+        for name, (count, seconds) in sorted(self.timers.items()):
+            lines.append(f'{metric}_sum{{stage="{name}"}} {seconds:.6f}')
+            lines.append(f'{metric}_count{{stage="{name}"}} {count}')
+        for name, value in sorted(self.counters.items()):
+            counter = f"{self.namespace}_{name}_total"
+            lines.append(f"# TYPE {counter} counter")
+            lines.append(f"{counter} {value:g}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str) -> None:
+        """Write `to_prometheus()` atomically to `path` (e.g. for the node_exporter textfile collector)."""
+        text = self.to_prometheus()
+
+        def write(tmp_path):
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+
+        write_atomic(path, write)
+
+    def log_summary(self, logger: Optional[logging.Logger] = None) -> None:
+        """Log the snapshot as one JSON record at INFO level."""
+        logger = logger or self.logger or logging.getLogger(__name__)
+        logger.info(json.dumps({'event': 'summary', **self.snapshot()}))
@@ -0,0 +1,12 @@
+# analysis/match_clock.py
+
+import pandas as pd
+
+
+def match_end_minute(events: pd.DataFrame) -> float:
+    """Match clock (in minutes) of the last event, i.e. when players on the pitch at the final whistle went off."""
+    if events.empty or 'minute' not in events.columns:
+        return 90.0
+    clock = events['minute'].astype(float) + events['second'].astype(float).fillna(0) / 60 \
+        if 'second' in events.columns else events['minute'].astype(float)
+    return float(clock.max())
@@ -0,0 +1,77 @@
+# analysis/match_context.py
+
+import numpy as np
+import pandas as pd
+
+
+class MatchContext:
+    """
+    The derived slices of one match's cleaned events, computed on first use and cached, so the
+    metric methods of `RefactoredWorldCupExtractor` (and the per-match builders of the other
+    analysis modules) share them instead of each rebuilding the same frames.
+
+    Created once per match after `clean_events`, through `extractor.match_context(events)`.
+    Every slice is computed by the extractor's own methods, so the cached values are exactly the
+    ones the methods would compute on their own. The events must not be modified afterwards.
+
+    Args:
+        extractor (RefactoredWorldCupExtractor): Extractor whose pitch size and methods define the slices
+        events (pd.DataFrame): Cleaned events of a single match
+    """
+
+    def __init__(self, extractor, events: pd.DataFrame):
+        self.extractor = extractor
+        self.events = extractor.ensure_coordinates(events)
+        self._cache = {}
+
+    def _cached(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    @property
+    def teams(self) -> list:
+        """Teams of the match, in order of first appearance."""
+        if 'team' not in self.events.columns:
+            return []
+        return self._cached('teams', lambda: list(pd.unique(self.events['team'].dropna())))
+
+    def _passes(self) -> pd.DataFrame:
+        # only the passes are scanned by infer_team_direction, so each team's lookup filters this subset
+        if 'type' not in self.events.columns:
+            return self.events.iloc[:0]
+        return self._cached('passes', lambda: self.events[(self.events['type'] == 'Pass').to_numpy()])
+
+    def direction(self, team: str) -> int:
+        """Forward direction of `team` along x (1 or -1), see `infer_team_direction`."""
+        return self._cached(('direction', team), lambda: self.extractor.infer_team_direction(self._passes(), team))
+
+    @property
+    def directions(self) -> dict:
+        """{team: forward direction} for every team of the match."""
+        return {team: self.direction(team) for team in self.teams}
+
+    @property
+    def kept_shots(self) -> np.ndarray:
+        """Mask of the shots counted in the attacking stats, see `kept_shots`."""
+        return self._cached('kept_shots', lambda: self.extractor.kept_shots(self.events))
+
+    @property
+    def summary(self) -> pd.DataFrame:
+        """Grouped (team, type, outcome) summary, see `summarize_events`."""
+        return self._cached('summary', lambda: self.extractor.summarize_events(self.events, context=self))
+
+    @property
+    def possession_owners(self) -> pd.DataFrame:
+        """Owner and size of every possession, see `possession_owners`."""
+        return self._cached('possession_owners', lambda: self.extractor.possession_owners(self.events))
+
+    @property
+    def possession_segments(self) -> pd.DataFrame:
+        """One row per possession, see `possession_segments`."""
+        return self._cached('possession_segments', lambda: self.extractor.possession_segments(self.events))
+
+    @property
+    def possession_team_actions(self) -> pd.DataFrame:
+        """Actions of every team in every possession, see `possession_team_actions`."""
+        return self._cached('possession_team_actions', lambda: self.extractor.possession_team_actions(self.events))
@@ -0,0 +1,88 @@
+# analysis/matches_index.py
+
+import os
+from typing import Dict
+
+import pandas as pd
+
+from analysis.atomic import write_atomic
+
+# column -> pandas dtype of the matches index
+SCHEMA: Dict[str, str] = {
+    'match_id': 'Int64',
+    'competition': 'category',
+    'season': 'category',
+    'team1': 'category',
+    'team2': 'category',
+    'match_date': 'datetime64[ns]',
+    'home_score': 'Int16',
+    'away_score': 'Int16',
+    'competition_stage': 'category',
+    'match_week': 'Int16',
+}
+
+
+def sidecar_path(csv_path: str) -> str:
+    """Path of the Parquet copy written next to a matches index CSV."""
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast the matches index columns to the types of SCHEMA (other columns are left as they are).
+
+    Args:
+        df (pd.DataFrame): Matches index with any dtypes (e.g. freshly built rows or a plain CSV read)
+
+    Returns:
+        pd.DataFrame: Typed copy
+    """
+    df = df.copy(deep=False)
+    for column, dtype in SCHEMA.items():
+        if column not in df.columns or str(df[column].dtype) == dtype:
+            continue
+        if dtype == 'datetime64[ns]':
+            if pd.api.types.is_datetime64_any_dtype(df[column]):
+                continue
+            df[column] = pd.to_datetime(df[column], errors='coerce')
+        elif dtype.startswith('Int'):
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype(dtype)
+        else:
+            # empty strings become missing values, as they do in a CSV round trip
+            df[column] = df[column].where(df[column] != '').astype(dtype)
+    return df
+
+
+def write_matches_index(df: pd.DataFrame, path: str = "data/matches_index.csv") -> None:
+    """
+    Write the matches index as CSV and, next to it, as a typed Parquet sidecar; both atomically.
+
+    Args:
+        df (pd.DataFrame): Matches index
+        path (str): CSV path (the sidecar is the same path with a .parquet extension)
+    """
+    df = apply_schema(df)
+    write_atomic(path, lambda tmp_path: df.to_csv(tmp_path, index=False, date_format='%Y-%m-%d'))
+    write_atomic(sidecar_path(path), lambda tmp_path: df.to_parquet(tmp_path, index=False))
+
+
+def read_matches_index(path: str = "data/matches_index.csv", prefer_sidecar: bool = True) -> pd.DataFrame:
+    """
+    Load the matches index with the types of SCHEMA.
+
+    The Parquet sidecar is read when it exists and is not older than the CSV (i.e. the CSV was
+    not edited or regenerated without it); otherwise the CSV is parsed with the schema.
+
+    Args:
+        path (str): CSV path
+        prefer_sidecar (bool): Use the Parquet sidecar when it is up to date
+
+    Returns:
+        pd.DataFrame: Typed matches index
+    """
+    sidecar = sidecar_path(path)
+    if prefer_sidecar and os.path.exists(sidecar) and (
+            not os.path.exists(path) or os.path.getmtime(sidecar) >= os.path.getmtime(path)):
+        return apply_schema(pd.read_parquet(sidecar))
+    dtypes = {column: dtype for column, dtype in SCHEMA.items() if dtype == 'category'}
+    return apply_schema(pd.read_csv(path, dtype=dtypes))
@@ -0,0 +1,400 @@
+# analysis/pass_network.py
+
+import os
+from typing import Any, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from analysis.atomic import write_atomic
+
+# EventStore columns needed to build the networks of a match
+EVENT_COLUMNS = ['match_id', 'type', 'team', 'player_id', 'player', 'pass_recipient', 'pass_recipient_id',
+                 'pass_outcome', 'location_x', 'location_y', 'pass_end_location_x', 'pass_end_location_y']
+EDGE_COLUMNS = ['match_id', 'team', 'passer_id', 'recipient_id', 'passes']
+POSITION_COLUMNS = ['match_id', 'team', 'player_id', 'player_name', 'x_sum', 'y_sum', 'touches']
+
+
+def match_pass_tables(events: pd.DataFrame, extractor=None, match_id: Optional[int] = None):
+    """
+    Edge list and player positions of both teams' pass networks in one match.
+
+    Edges are completed passes counted per (passer, recipient). Positions are the sums of the
+    locations where a player passed or received the ball (with `touches` the number of them),
+    mirrored like the heatmaps so every team attacks towards increasing x; sums rather than
+    means, so tables of several matches add up. Every passer and recipient has a position row,
+    with zero touches if none of their passes has coordinates.
+
+    Args:
+        events (pd.DataFrame): Cleaned events of the match
+        extractor (Optional[RefactoredWorldCupExtractor]): Supplies the pitch size and team directions
+        match_id (Optional[int]): Match ID (taken from the events if None)
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: EDGE_COLUMNS table and POSITION_COLUMNS table
+    """
+    if extractor is None:
+        from analysis.worldcup_to_csv import RefactoredWorldCupExtractor
+        extractor = RefactoredWorldCupExtractor(verbose=False)
+    if match_id is None and 'match_id' in events.columns and len(events):
+        match_id = int(events['match_id'].iloc[0])
+    events = extractor.ensure_coordinates(events)
+    completed = (events['type'] == 'Pass') & events['player_id'].notna() & events['pass_recipient_id'].notna()
+    if 'pass_outcome' in events.columns:
+        completed &= events['pass_outcome'].isna()
+    passes = events[completed.to_numpy()]
+    mirrored = (passes['team'].map(extractor.match_context(events).directions) == -1).to_numpy()
+
+    passer = passes['player_id'].to_numpy(dtype=np.int64)
+    recipient = passes['pass_recipient_id'].to_numpy(dtype=np.int64)
+    edges = pd.DataFrame({'team': passes['team'].to_numpy(), 'passer_id': passer, 'recipient_id': recipient})
+    edges = edges.groupby(['team', 'passer_id', 'recipient_id']).size().rename('passes').reset_index()
+    edges.insert(0, 'match_id', np.int64(match_id))
+
+    def oriented(x_column, y_column):
+        x = passes[x_column].to_numpy(dtype=np.float64)
+        y = passes[y_column].to_numpy(dtype=np.float64)
+        return (np.where(mirrored, extractor.pitch_length - x, x),
+                np.where(mirrored, extractor.pitch_width - y, y))
+
+    start_x, start_y = oriented('location_x', 'location_y')
+    end_x, end_y = oriented('pass_end_location_x', 'pass_end_location_y')
+    x = np.concatenate([start_x, end_x])
+    y = np.concatenate([start_y, end_y])
+    # touches without both coordinates keep the player in the table but add nothing to the position
+    located = ~np.isnan(x) & ~np.isnan(y)
+    touches = pd.DataFrame({
+        'team': np.concatenate([passes['team'].to_numpy(), passes['team'].to_numpy()]),
+        'player_id': np.concatenate([passer, recipient]),
+        'player_name': np.concatenate([passes['player'].to_numpy(), passes['pass_recipient'].to_numpy()]),
+        'x': np.where(located, x, 0.0),
+        'y': np.where(located, y, 0.0),
+        'located': located.astype(np.int64),
+    })
+    positions = touches.groupby(['team', 'player_id']).agg(
+        player_name=('player_name', 'first'), x_sum=('x', 'sum'), y_sum=('y', 'sum'), touches=('located', 'sum')
+    ).reset_index()
+    positions.insert(0, 'match_id', np.int64(match_id))
+    return edges[EDGE_COLUMNS], positions[POSITION_COLUMNS]
+
+
+class PassNetwork:
+    """Passer -> recipient pass counts of one team over one or more matches, with average positions."""
+
+    def __init__(self, team: str, player_ids: np.ndarray, player_names: Sequence[str], matrix: np.ndarray,
+                 x: np.ndarray, y: np.ndarray, touches: np.ndarray, match_ids: Sequence[int]):
+        """
+        Args:
+            team (str): Team name
+            player_ids (np.ndarray): Player of every row/column of the matrix (sorted)
+            player_names (Sequence[str]): Names in the same order
+            matrix (np.ndarray): matrix[i, j] = completed passes from player i to player j
+            x (np.ndarray): Average x of every player's passes and receptions
+            y (np.ndarray): Average y of every player's passes and receptions
+            touches (np.ndarray): Number of passes and receptions behind the averages
+            match_ids (Sequence[int]): Matches included
+        """
+        self.team = team
+        self.player_ids = player_ids
+        self.player_names = list(player_names)
+        self.matrix = matrix
+        self.x = x
+        self.y = y
+        self.touches = touches
+        self.match_ids = list(match_ids)
+
+    @classmethod
+    def from_tables(cls, edges: pd.DataFrame, positions: pd.DataFrame, team: str) -> "PassNetwork":
+        """
+        Sum the edge and position tables of any number of matches into one network.
+
+        Args:
+            edges (pd.DataFrame): EDGE_COLUMNS rows (other teams are ignored)
+            positions (pd.DataFrame): POSITION_COLUMNS rows
+            team (str): Team of the network
+
+        Returns:
+            PassNetwork: The summed network
+        """
+        edges = edges[edges['team'] == team]
+        positions = positions[positions['team'] == team]
+        players = positions.groupby('player_id').agg(
+            player_name=('player_name', 'last'), x_sum=('x_sum', 'sum'), y_sum=('y_sum', 'sum'), touches=('touches', 'sum'))
+        passer = edges['passer_id'].to_numpy(dtype=np.int64)
+        recipient = edges['recipient_id'].to_numpy(dtype=np.int64)
+        # tables written before every passer and recipient got a position row may miss some of them
+        player_ids = np.union1d(players.index.to_numpy(dtype=np.int64), np.union1d(passer, recipient))
+        players = players.reindex(player_ids)
+        players[['x_sum', 'y_sum', 'touches']] = players[['x_sum', 'y_sum', 'touches']].fillna(0)
+        n = len(player_ids)
+        rows = np.searchsorted(player_ids, passer)
+        columns = np.searchsorted(player_ids, recipient)
+        matrix = np.bincount(rows * n + columns, weights=edges['passes'].to_numpy(dtype=np.float64),
+                             minlength=n * n).reshape(n, n)
+        touches = players['touches'].to_numpy(dtype=np.float64)
+        # players without a located touch have no average position
+        with np.errstate(invalid='ignore', divide='ignore'):
+            x = players['x_sum'].to_numpy(dtype=np.float64) / touches
+            y = players['y_sum'].to_numpy(dtype=np.float64) / touches
+        return cls(team, player_ids, players['player_name'].tolist(), matrix, x, y,
+                   touches.astype(np.int64), sorted(positions['match_id'].unique().tolist()))
+
+    def __len__(self) -> int:
+        return len(self.player_ids)
+
+    def edges(self, min_passes: int = 1) -> pd.DataFrame:
+        """Edge list (passer, recipient, passes) with at least `min_passes` passes, most frequent first."""
+        rows, columns = np.nonzero(self.matrix >= max(min_passes, 1))
+        names = np.array(self.player_names, dtype=object)
+        return pd.DataFrame({
+            'passer_id': self.player_ids[rows],
+            'passer': names[rows],
+            'recipient_id': self.player_ids[columns],
+            'recipient': names[columns],
+            'passes': self.matrix[rows, columns].astype(np.int64),
+        }).sort_values('passes', ascending=False, ignore_index=True)
+
+    def nodes(self) -> pd.DataFrame:
+        """Players with their average position and number of touches."""
+        return pd.DataFrame({'player_id': self.player_ids, 'player_name': self.player_names,
+                             'x': self.x, 'y': self.y, 'touches': self.touches})
+
+    def centrality(self) -> pd.DataFrame:
+        """Centrality metrics of this network's players (see `network_centrality`)."""
+        return network_centrality([self])
+
+
+def network_centrality(networks: List[PassNetwork], damping: float = 0.85, iterations: int = 100) -> pd.DataFrame:
+    """
+    Centrality metrics of every player of many networks, computed on one padded stack of matrices.
+
+    - passes_made / passes_received: out- and in-degree (weighted)
+    - involvement: share of the team's passes the player made or received
+    - eigenvector: eigenvector centrality of the symmetrised pass counts
+    - pagerank: PageRank of the pass flow (who the ball ends up with)
+    - closeness: harmonic closeness with 1 / passes as the length of an edge, scaled by the team size
+
+    Args:
+        networks (List[PassNetwork]): Networks to score
+        damping (float): PageRank damping factor
+        iterations (int): Power iterations for eigenvector centrality and PageRank
+
+    Returns:
+        pd.DataFrame: One row per (network, player): network (position in `networks`), team,
+        player_id, player_name and the metrics
+    """
+    columns = ['network', 'team', 'player_id', 'player_name', 'passes_made', 'passes_received', 'involvement',
+               'eigenvector', 'pagerank', 'closeness']
+    if not networks or not any(len(network) for network in networks):
+        return pd.DataFrame(columns=columns)
+    size = max(len(network) for network in networks)
+    batch = len(networks)
+    weights = np.zeros((batch, size, size))
+    present = np.zeros((batch, size), dtype=bool)
+    for b, network in enumerate(networks):
+        n = len(network)
+        weights[b, :n, :n] = network.matrix
+        present[b, :n] = True
+    n_players = present.sum(axis=1).astype(np.float64)
+
+    passes_made = weights.sum(axis=2)
+    passes_received = weights.sum(axis=1)
+    total = weights.sum(axis=(1, 2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        involvement = np.where(total[:, None] > 0, (passes_made + passes_received) / (2 * total[:, None]), 0.0)
+
+    # eigenvector centrality by power iteration on A + A^T, normalised to a maximum of 1
+    symmetric = weights + weights.transpose(0, 2, 1)
+    eigenvector = present.astype(np.float64)
+    for _ in range(iterations):
+        updated = np.einsum('bij,bj->bi', symmetric, eigenvector) + eigenvector  # + v keeps bipartite graphs from oscillating
+        peak = updated.max(axis=1, keepdims=True)
+        updated = np.divide(updated, peak, out=np.zeros_like(updated), where=peak > 0)
+        converged = np.abs(updated - eigenvector).max() < 1e-9
+        eigenvector = updated
+        if converged:
+            break
+
+    # PageRank: players without passes hand the ball to everyone of their team
+    with np.errstate(divide='ignore', invalid='ignore'):
+        transition = np.where(passes_made[:, :, None] > 0, weights / passes_made[:, :, None],
+                              present[:, None, :] / n_players[:, None, None])
+    pagerank = present / n_players[:, None]
+    for _ in range(iterations):
+        updated = (1 - damping) * present / n_players[:, None] + damping * np.einsum('bij,bi->bj', transition, pagerank)
+        converged = np.abs(updated - pagerank).max() < 1e-12
+        pagerank = updated
+        if converged:
+            break
+
+    # all-pairs shortest paths (Floyd-Warshall over the whole stack at once)
+    with np.errstate(divide='ignore'):
+        distance = np.where(weights > 0, 1.0 / weights, np.inf)
+    diagonal = np.arange(size)
+    distance[:, diagonal, diagonal] = 0.0
+    for k in range(size):
+        np.minimum(distance, distance[:, :, k:k + 1] + distance[:, k:k + 1, :], out=distance)
+    with np.errstate(divide='ignore'):
+        inverse = np.where(np.isfinite(distance) & (distance > 0), 1.0 / distance, 0.0)
+    closeness = inverse.sum(axis=2) / np.maximum(n_players[:, None] - 1, 1)
+
+    network_index, player_index = np.nonzero(present)
+    return pd.DataFrame({
+        'network': network_index,
+        'team': [networks[b].team for b in network_index],
+        'player_id': np.concatenate([network.player_ids for network in networks]),
+        'player_name': [name for network in networks for name in network.player_names],
+        'passes_made': passes_made[network_index, player_index].astype(np.int64),
+        'passes_received': passes_received[network_index, player_index].astype(np.int64),
+        'involvement': involvement[network_index, player_index],
+        'eigenvector': eigenvector[network_index, player_index],
+        'pagerank': pagerank[network_index, player_index],
+        'closeness': closeness[network_index, player_index],
+    }, columns=columns)
+
+
+class PassNetworkStore:
+    """
+    Pass network tables of many matches: `<directory>/edges.parquet` and `<directory>/positions.parquet`.
+
+    Both tables are small (a few hundred edges per match), so they are read whole and any
+    team's network over any set of matches is a filter and a sum (see `PassNetwork.from_tables`).
+    """
+
+    def __init__(self, directory: str = "data/pass_networks"):
+        """
+        Args:
+            directory (str): Directory of the two Parquet files
+        """
+        self.directory = directory
+        self._tables = None
+
+    @property
+    def edges_path(self) -> str:
+        return os.path.join(self.directory, 'edges.parquet')
+
+    @property
+    def positions_path(self) -> str:
+        return os.path.join(self.directory, 'positions.parquet')
+
+    def tables(self):
+        """(edges, positions) tables, read once."""
+        if self._tables is None:
+            if os.path.exists(self.edges_path) and os.path.exists(self.positions_path):
+                self._tables = (pd.read_parquet(self.edges_path), pd.read_parquet(self.positions_path))
+            else:
+                self._tables = (pd.DataFrame(columns=EDGE_COLUMNS), pd.DataFrame(columns=POSITION_COLUMNS))
+        return self._tables
+
+    def matches(self) -> List[int]:
+        """Sorted match ids in the store."""
+        return sorted(self.tables()[1]['match_id'].unique().tolist())
+
+    def teams(self) -> List[str]:
+        return sorted(self.tables()[1]['team'].unique().tolist())
+
+    def write(self, edges: pd.DataFrame, positions: pd.DataFrame) -> None:
+        """Replace the tables (atomically)."""
+        edges = edges.sort_values(['match_id', 'team', 'passer_id', 'recipient_id'], ignore_index=True)
+        positions = positions.sort_values(['match_id', 'team', 'player_id'], ignore_index=True)
+        write_atomic(self.edges_path, lambda tmp_path: edges.to_parquet(tmp_path, index=False))
+        write_atomic(self.positions_path, lambda tmp_path: positions.to_parquet(tmp_path, index=False))
+        self._tables = (edges, positions)
+
+    def update(self, edges: pd.DataFrame, positions: pd.DataFrame) -> int:
+        """
+        Add the tables of new matches; matches already stored are skipped.
+
+        Returns:
+            int: Number of matches added
+        """
+        old_edges, old_positions = self.tables()
+        new = ~positions['match_id'].isin(old_positions['match_id'])
+        if not new.any():
+            return 0
+        new_matches = positions.loc[new, 'match_id'].unique()
+        edges = edges[edges['match_id'].isin(new_matches)]
+        self.write(pd.concat([df for df in (old_edges, edges) if len(df)], ignore_index=True),
+                   pd.concat([df for df in (old_positions, positions[new]) if len(df)], ignore_index=True))
+        return len(new_matches)
+
+    def network(self, team: str, match_ids: Optional[Iterable[int]] = None) -> PassNetwork:
+        """
+        A team's network summed over some matches.
+
+        Args:
+            team (str): Team name
+            match_ids (Optional[Iterable[int]]): Matches to include (all of the team's if None)
+
+        Returns:
+            PassNetwork: The network
+        """
+        edges, positions = self.tables()
+        if match_ids is not None:
+            match_ids = list(match_ids)
+            edges = edges[edges['match_id'].isin(match_ids)]
+            positions = positions[positions['match_id'].isin(match_ids)]
+        return PassNetwork.from_tables(edges, positions, team)
+
+    def match_networks(self, match_ids: Optional[Iterable[int]] = None) -> List[PassNetwork]:
+        """One network per (match, team), e.g. to score a whole tournament with `network_centrality`."""
+        edges, positions = self.tables()
+        if match_ids is not None:
+            match_ids = list(match_ids)
+            edges = edges[edges['match_id'].isin(match_ids)]
+            positions = positions[positions['match_id'].isin(match_ids)]
+        edge_groups = dict(list(edges.groupby(['match_id', 'team'])))
+        empty = edges.iloc[:0]
+        return [
+            PassNetwork.from_tables(edge_groups.get(key, empty), match_positions, key[1])
+            for key, match_positions in positions.groupby(['match_id', 'team'])
+        ]
+
+
+def build_pass_networks(event_store, output_dir: str = "data/pass_networks", filters: Optional[List[Any]] = None,
+                        incremental: bool = True, extractor=None) -> PassNetworkStore:
+    """
+    Build the pass network tables from the Pass events of an EventStore.
+
+    Args:
+        event_store (EventStore): Store written by the extractor (`--event-store`)
+        output_dir (str): Directory of the PassNetworkStore
+        filters (Optional[List[Any]]): Extra EventStore filters, e.g. [('competition_id', '==', 43)]
+        incremental (bool): Only add matches that are not in the store yet
+        extractor (Optional[RefactoredWorldCupExtractor]): See `match_pass_tables`
+
+    Returns:
+        PassNetworkStore: The updated store
+    """
+    store = PassNetworkStore(output_dir)
+    filters = [('type', '==', 'Pass')] + list(filters or [])
+    if incremental and store.matches():
+        filters.append(('match_id', 'not in', store.matches()))
+    available = set(event_store.columns())
+    events = event_store.read(columns=[c for c in EVENT_COLUMNS if c in available], filters=filters, categorical=False)
+    tables = [match_pass_tables(match_events.reset_index(drop=True), extractor, match_id)
+              for match_id, match_events in events.groupby('match_id', sort=True)]
+    if not tables:
+        print(f"No new matches for {output_dir}")
+        return store
+    edges = pd.concat([table[0] for table in tables], ignore_index=True)
+    positions = pd.concat([table[1] for table in tables], ignore_index=True)
+    if incremental:
+        added = store.update(edges, positions)
+    else:
+        store.write(edges, positions)
+        added = len(tables)
+    print(f"Added {added} matches ({len(store.matches())} in total) to {output_dir}")
+    return store
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Build pass networks from an event store')
+    parser.add_argument('--event-store', type=str, default='data/events', help='EventStore root with the cleaned events')
+    parser.add_argument('--save', type=str, default='data/pass_networks', help='Pass network directory')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild instead of adding new matches')
+    args = parser.parse_args()
+
+    from analysis.event_store import EventStore
+    build_pass_networks(EventStore(args.event_store), args.save, incremental=not args.rebuild)
@@ -0,0 +1,521 @@
+# analysis/player_stats.py
+
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from analysis.atomic import write_atomic
+from analysis.match_clock import match_end_minute
+
+# per-match player metrics, all additive so season totals are plain sums
+PLAYER_METRICS = [
+    'minutes',
+    'passes', 'completed_passes', 'progressive_passes', 'key_passes', 'assists', 'crosses',
+    'shots', 'shots_on_target', 'goals', 'xg', 'xa',
+    'pressures', 'tackles', 'interceptions', 'ball_recoveries', 'blocks', 'clearances', 'fouls_committed',
+]
+# event types counted as they are, with the same definitions as the team metrics
+COUNTED_TYPES = {
+    'pressures': 'Pressure',
+    'tackles': 'Tackle',
+    'interceptions': 'Interception',
+    'ball_recoveries': 'Ball Recovery',
+    'blocks': 'Block',
+    'clearances': 'Clearance',
+    'fouls_committed': 'Foul Committed',
+}
+
+
+def _flag(events: pd.DataFrame, column: str) -> np.ndarray:
+    if column not in events.columns:
+        return np.zeros(len(events), dtype=bool)
+    return np.array(events[column] == True, dtype=bool)
+
+
+def player_event_stats(events: pd.DataFrame, extractor=None) -> pd.DataFrame:
+    """
+    Count the passing, shooting, xG and defensive actions of every player of one match.
+
+    All per-event masks are built once for the whole match and summed in a single groupby on
+    the player. Definitions follow the team metrics of `RefactoredWorldCupExtractor`
+    (kept shots, completed progressive passes, ...), so the players of a team add up to its row.
+
+    Args:
+        events (pd.DataFrame): Cleaned events of one match (see `clean_events`)
+        extractor (Optional[RefactoredWorldCupExtractor]): Supplies the pitch size and the team
+            direction / kept shot rules (a default extractor if None)
+
+    Returns:
+        pd.DataFrame: One row per player_id with player_name, team and PLAYER_METRICS except minutes
+    """
+    if extractor is None:
+        from analysis.worldcup_to_csv import RefactoredWorldCupExtractor
+        extractor = RefactoredWorldCupExtractor(verbose=False)
+    events = extractor.ensure_coordinates(events)
+    n = len(events)
+    etype = events['type'].to_numpy()
+    team = events['team']
+    is_pass = etype == 'Pass'
+    is_shot = etype == 'Shot'
+
+    completed = is_pass & events['pass_outcome'].isna().to_numpy() if 'pass_outcome' in events.columns else is_pass
+    context = extractor.match_context(events)
+    dir_sign = team.map(context.directions).fillna(1).to_numpy(dtype=float)
+    with np.errstate(invalid='ignore'):
+        advance = (events['pass_end_location_x'].to_numpy(dtype=float)
+                   - events['location_x'].to_numpy(dtype=float)) * dir_sign
+        progressive = completed & (advance >= 10)
+        if 'pass_cross' in events.columns:
+            cross = is_pass & _flag(events, 'pass_cross')
+        else:
+            start_y = events['location_y'].to_numpy(dtype=float)
+            cross = is_pass & ((start_y < 20) | (start_y > extractor.pitch_width - 20))
+
+    if 'pass_shot_assist' in events.columns:
+        key_pass = is_pass & _flag(events, 'pass_shot_assist')
+    else:
+        # same fallback as the team metric: a pass followed by a shot of the team (in the same possession, when known)
+        key_pass = np.zeros(n, dtype=bool)
+        same_team = team.to_numpy()[:-1] == team.to_numpy()[1:]
+        key_pass[:-1] = is_pass[:-1] & is_shot[1:] & same_team
+        if 'possession' in events.columns:
+            possession = events['possession'].to_numpy()
+            key_pass[:-1] &= possession[:-1] == possession[1:]
+
+    kept = context.kept_shots
+    outcome = events['shot_outcome'].to_numpy() if 'shot_outcome' in events.columns else np.full(n, None)
+    xg = events['shot_statsbomb_xg'].fillna(0).astype(float).to_numpy() * kept \
+        if 'shot_statsbomb_xg' in events.columns else np.zeros(n)
+    # xA: the xG of the shot a key pass set up
+    xa = np.zeros(n)
+    if 'pass_assisted_shot_id' in events.columns and 'id' in events.columns:
+        shot_xg = pd.Series(xg[kept], index=events['id'].to_numpy()[kept])
+        xa = events['pass_assisted_shot_id'].map(shot_xg).fillna(0).to_numpy(dtype=float) * is_pass
+
+    columns = {
+        'passes': is_pass,
+        'completed_passes': completed,
+        'progressive_passes': progressive,
+        'key_passes': key_pass,
+        'assists': is_pass & _flag(events, 'pass_goal_assist'),
+        'crosses': cross,
+        'shots': kept,
+        'shots_on_target': kept & np.isin(outcome, ['Saved', 'Goal']),
+        'goals': kept & (outcome == 'Goal'),
+        'xg': xg,
+        'xa': xa,
+    }
+    for metric, event_type in COUNTED_TYPES.items():
+        columns[metric] = etype == event_type
+    frame = pd.DataFrame({metric: np.asarray(values, dtype=float) for metric, values in columns.items()})
+    has_player = events['player_id'].notna().to_numpy()
+    player_id = events['player_id'].to_numpy()[has_player].astype(np.int64)
+    stats = frame[has_player].groupby(player_id).sum()
+    names = pd.DataFrame({
+        'player_name': events['player'].to_numpy()[has_player],
+        'team': team.to_numpy()[has_player],
+    }, index=player_id)
+    names = names[~names.index.duplicated(keep='first')]
+    stats = names.join(stats)
+    stats.index.name = 'player_id'
+    return stats
+
+
+def _clock_minutes(clock: Optional[str], default: float) -> float:
+    # lineup times are "mm:ss" strings of the match clock
+    if not isinstance(clock, str) or ':' not in clock:
+        return default
+    minutes, seconds = clock.split(':', 1)
+    return int(minutes) + int(seconds) / 60
+
+
+def minutes_played(lineups: Dict[str, pd.DataFrame], match_end: float) -> pd.DataFrame:
+    """
+    Minutes played by every player of a match, from the position spells of `sb.lineups`.
+
+    Args:
+        lineups (Dict[str, pd.DataFrame]): team name -> lineup (player_id, player_name, positions)
+        match_end (float): Match clock at the final whistle, used for spells still open (`to` is None)
+
+    Returns:
+        pd.DataFrame: player_name, team and minutes indexed by player_id (unused substitutes excluded)
+    """
+    # a few dozen players per match, so plain loops beat building frames
+    records = []
+    for team, lineup in lineups.items():
+        for player_id, player_name, spells in zip(lineup['player_id'], lineup['player_name'], lineup['positions']):
+            if not isinstance(spells, list) or not spells:
+                continue
+            minutes = sum(max(_clock_minutes(spell.get('to'), match_end) - _clock_minutes(spell.get('from'), 0.0), 0.0)
+                          for spell in spells)
+            records.append((int(player_id), player_name, team, round(minutes, 1)))
+    minutes = pd.DataFrame(records, columns=['player_id', 'player_name', 'team', 'minutes'])
+    return minutes.drop_duplicates('player_id').set_index('player_id')
+
+
+def minutes_from_events(events: pd.DataFrame, match_end: float) -> pd.DataFrame:
+    """
+    Minutes played from the Starting XI, Substitution and sending-off events, for lineups
+    without position spells (older StatsBomb data).
+
+    Args:
+        events (pd.DataFrame): Events of the match (`tactics` as dicts or JSON strings)
+        match_end (float): Match clock at the final whistle
+
+    Returns:
+        pd.DataFrame: player_name, team and minutes indexed by player_id
+    """
+    if 'tactics' not in events.columns or 'type' not in events.columns:
+        return pd.DataFrame(columns=['player_name', 'team', 'minutes'], index=pd.Index([], name='player_id'))
+    clock = events['minute'].astype(float) + events['second'].astype(float).fillna(0) / 60
+    players = []
+    for row in events[events['type'] == 'Starting XI'].itertuples():
+        tactics = json.loads(row.tactics) if isinstance(row.tactics, str) else row.tactics
+        for entry in (tactics or {}).get('lineup', []):
+            players.append((entry['player']['id'], entry['player']['name'], row.team, 0.0))
+    if 'substitution_replacement_id' in events.columns:
+        subs = events[(events['type'] == 'Substitution') & events['substitution_replacement_id'].notna()]
+        players.extend(zip(subs['substitution_replacement_id'], subs['substitution_replacement'], subs['team'],
+                           clock[subs.index]))
+    if not players:
+        return pd.DataFrame(columns=['player_name', 'team', 'minutes'], index=pd.Index([], name='player_id'))
+    spells = pd.DataFrame(players, columns=['player_id', 'player_name', 'team', 'on'])
+    spells['player_id'] = spells['player_id'].astype(np.int64)
+    spells = spells.drop_duplicates('player_id').set_index('player_id')
+    # substituted or sent off players leave at the first such event
+    sent_off = np.zeros(len(events), dtype=bool)
+    for column in ('bad_behaviour_card', 'foul_committed_card'):
+        if column in events.columns:
+            sent_off |= events[column].isin(['Red Card', 'Second Yellow']).to_numpy()
+    left = (events['type'] == 'Substitution').to_numpy() | sent_off
+    off = clock[left & events['player_id'].notna().to_numpy()]
+    off = off.groupby(events.loc[off.index, 'player_id'].astype(np.int64).to_numpy()).min()
+    spells['minutes'] = (off.reindex(spells.index).fillna(match_end) - spells['on']).clip(lower=0).round(1)
+    return spells[['player_name', 'team', 'minutes']]
+
+
+def player_match_stats(events: pd.DataFrame, lineups: Optional[Dict[str, pd.DataFrame]] = None,
+                       match_id: Optional[int] = None, extractor=None) -> pd.DataFrame:
+    """
+    Per-player rows of one match: the event counts of `player_event_stats` plus minutes played.
+
+    Minutes come from the position spells of the lineups; lineups without them (older data)
+    or no lineups at all fall back to the Starting XI and Substitution events.
+
+    Args:
+        events (pd.DataFrame): Cleaned events of the match
+        lineups (Optional[Dict[str, pd.DataFrame]]): `sb.lineups` of the match
+        match_id (Optional[int]): Match ID (taken from the events if None)
+        extractor (Optional[RefactoredWorldCupExtractor]): See `player_event_stats`
+
+    Returns:
+        pd.DataFrame: match_id, player_id, player_name, team and PLAYER_METRICS; players who came on
+        without touching the ball have zero counts, minutes are NaN when neither source has them
+    """
+    stats = player_event_stats(events, extractor)
+    match_end = match_end_minute(events)
+    if lineups and all('positions' in lineup.columns for lineup in lineups.values()):
+        minutes = minutes_played(lineups, match_end)
+    else:
+        minutes = minutes_from_events(events, match_end)
+    stats = stats.join(minutes['minutes'], how='outer')
+    # names of the players without events come from the lineup
+    stats[['player_name', 'team']] = stats[['player_name', 'team']].fillna(
+        minutes[['player_name', 'team']].reindex(stats.index))
+    metrics = [metric for metric in PLAYER_METRICS if metric != 'minutes']
+    stats[metrics] = stats[metrics].fillna(0)
+    if match_id is None and 'match_id' in events.columns and len(events):
+        match_id = events['match_id'].iloc[0]
+    stats = stats.reset_index()
+    stats.insert(0, 'match_id', match_id)
+    return stats[['match_id', 'player_id', 'player_name', 'team'] + PLAYER_METRICS].sort_values(
+        ['team', 'player_name'], ignore_index=True)
+
+
+class PlayerSeasonTable:
+    """
+    Running per-player season totals of `player_match_stats` rows, with a player name index.
+
+    The table has one row per (season, player_id) holding the latest name and team, the number
+    of matches and the sum of every metric, so totals, per-match averages and per-90 rates are
+    a row lookup and a division. Adding a match adds its rows to the sums; the manifest of
+    aggregated matches makes updates incremental.
+    """
+
+    KEY_COLUMNS = ['season', 'player_id']
+    NAME_COLUMNS = ['player_name', 'team']
+    STAT_COLUMNS = ['matches'] + PLAYER_METRICS
+
+    def __init__(self, stats: Optional[pd.DataFrame] = None, matches: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            stats (Optional[pd.DataFrame]): Table indexed by (season, player_id) with NAME_COLUMNS and STAT_COLUMNS
+            matches (Optional[Dict[str, str]]): match_id (as str) -> season of the matches already aggregated
+        """
+        if stats is None:
+            index = pd.MultiIndex.from_arrays([[], []], names=self.KEY_COLUMNS)
+            stats = pd.DataFrame(columns=self.NAME_COLUMNS + self.STAT_COLUMNS, index=index)
+            stats[self.STAT_COLUMNS] = stats[self.STAT_COLUMNS].astype(float)
+        self.stats = stats
+        self.matches = matches or {}
+        # derived tables, rebuilt after an update
+        self._name_indexes = {}
+        self._summaries = {}
+
+    # ----------------- Updates -----------------
+    def update(self, rows: Union[pd.DataFrame, List[Dict[str, Any]]], season: str) -> int:
+        """
+        Add the player rows of new matches to a season; matches already aggregated are skipped.
+
+        Args:
+            rows (Union[pd.DataFrame, List[Dict[str, Any]]]): `player_match_stats` rows
+            season (str): Season label, e.g. 'FIFA World Cup 2022'
+
+        Returns:
+            int: Number of matches added
+        """
+        rows = pd.DataFrame(rows)
+        if rows.empty:
+            return 0
+        rows = rows[~rows['match_id'].astype(str).isin(self.matches)]
+        if rows.empty:
+            return 0
+        grouped = rows.groupby('player_id', sort=False)
+        delta = grouped[PLAYER_METRICS].sum(min_count=1)
+        delta.insert(0, 'matches', grouped.size().astype(float))
+        # the last match decides the name and team shown for the season
+        names = rows.drop_duplicates('player_id', keep='last').set_index('player_id')[self.NAME_COLUMNS]
+        delta = names.join(delta)
+        delta.index = pd.MultiIndex.from_arrays(
+            [np.full(len(delta), season, dtype=object), delta.index.astype(np.int64)], names=self.KEY_COLUMNS)
+        if self.stats.empty:
+            self.stats = delta
+        else:
+            totals = self.stats[self.STAT_COLUMNS].add(delta[self.STAT_COLUMNS], fill_value=0)
+            names = delta[self.NAME_COLUMNS].combine_first(self.stats[self.NAME_COLUMNS])
+            self.stats = names.join(totals)
+        self.stats = self.stats.sort_index()
+        for match_id in rows['match_id'].astype(str).unique():
+            self.matches[match_id] = season
+        self._name_indexes = {}
+        self._summaries = {}
+        return rows['match_id'].nunique()
+
+    # ----------------- Name index -----------------
+    def seasons(self) -> List[str]:
+        """Sorted season labels in the table."""
+        return sorted(self.stats.index.get_level_values('season').unique().tolist())
+
+    def _players(self, season: Optional[str]) -> pd.DataFrame:
+        if season is None:
+            # across seasons a player is listed once, under their latest name and team
+            return self.stats[self.NAME_COLUMNS].reset_index('season', drop=True).groupby(level='player_id').last()
+        if season not in self.stats.index.get_level_values('season'):
+            return self.stats[self.NAME_COLUMNS].iloc[:0].droplevel('season')
+        return self.stats[self.NAME_COLUMNS].xs(season, level='season')
+
+    def name_index(self, season: Optional[str] = None) -> pd.Series:
+        """
+        Display label -> player_id, sorted by label and built once per season.
+
+        Labels are player names; namesakes get their team appended, and their id too if that
+        is still ambiguous.
+
+        Args:
+            season (Optional[str]): Only players of this season (None for every season)
+
+        Returns:
+            pd.Series: player_id indexed by unique label
+        """
+        if season not in self._name_indexes:
+            players = self._players(season)
+            labels = players['player_name'].astype(str)
+            clash = labels.duplicated(keep=False)
+            labels = labels.where(~clash, labels + ' (' + players['team'].astype(str) + ')')
+            clash = labels.duplicated(keep=False)
+            labels = labels.where(~clash, labels + ' #' + players.index.astype(str))
+            index = pd.Series(players.index.to_numpy(), index=labels.to_numpy(), name='player_id')
+            self._name_indexes[season] = index.sort_index()
+        return self._name_indexes[season]
+
+    def players(self, season: Optional[str] = None) -> List[str]:
+        """Sorted player labels for dropdowns (see `name_index`)."""
+        return self.name_index(season).index.tolist()
+
+    def player_id(self, label: str, season: Optional[str] = None) -> int:
+        """Look up the player_id of a label from `players`."""
+        return int(self.name_index(season)[label])
+
+    def search(self, text: str, season: Optional[str] = None) -> List[str]:
+        """Labels containing `text`, ignoring case."""
+        labels = self.name_index(season).index
+        return labels[labels.str.lower().str.contains(text.lower(), regex=False)].tolist()
+
+    # ----------------- Queries -----------------
+    def totals(self, season: Optional[str] = None) -> pd.DataFrame:
+        """STAT_COLUMNS summed per player_id for one season (or across every season if None)."""
+        if season is None:
+            return self.stats[self.STAT_COLUMNS].groupby(level='player_id').sum(min_count=1)
+        return self.stats[self.STAT_COLUMNS].xs(season, level='season')
+
+    def summary(self, season: Optional[str] = None, stat: str = 'total', min_minutes: float = 0.0) -> pd.DataFrame:
+        """
+        One row per player, one column per metric (computed once per arguments).
+
+        Args:
+            season (Optional[str]): Season to summarize (None for every season)
+            stat (str): 'total', 'per_match' or 'per_90'
+            min_minutes (float): Leave out players with fewer minutes (players without minutes
+                data are kept when this is 0)
+
+        Returns:
+            pd.DataFrame: player_id x metric table, plus passing_accuracy and shot_accuracy (%)
+        """
+        key = (season, stat, min_minutes)
+        if key not in self._summaries:
+            self._summaries[key] = self._summary(season, stat, min_minutes)
+        return self._summaries[key]
+
+    def _summary(self, season: Optional[str], stat: str, min_minutes: float) -> pd.DataFrame:
+        totals = self.totals(season)
+        if min_minutes > 0:
+            totals = totals[totals['minutes'] >= min_minutes]
+        metrics = [metric for metric in PLAYER_METRICS if metric != 'minutes']
+        if stat == 'total':
+            values = totals[self.STAT_COLUMNS].copy()
+        elif stat == 'per_match':
+            values = totals[metrics].div(totals['matches'], axis=0)
+            values.insert(0, 'minutes', totals['minutes'] / totals['matches'])
+            values.insert(0, 'matches', totals['matches'])
+        elif stat == 'per_90':
+            minutes = totals['minutes'].where(totals['minutes'] > 0)
+            values = totals[metrics].div(minutes, axis=0) * 90
+            values.insert(0, 'minutes', totals['minutes'])
+            values.insert(0, 'matches', totals['matches'])
+        else:
+            raise ValueError(f"Unknown stat: {stat}")
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values['passing_accuracy'] = (totals['completed_passes'] / totals['passes'] * 100).where(totals['passes'] > 0)
+            values['shot_accuracy'] = (totals['shots_on_target'] / totals['shots'] * 100).where(totals['shots'] > 0)
+        return values
+
+    def compare(self, player_ids: Iterable[int], season: Optional[str] = None, stat: str = 'total') -> pd.DataFrame:
+        """Metric x player table of the given players (columns in the order given)."""
+        summary = self.summary(season, stat)
+        player_ids = [player_id for player_id in player_ids if player_id in summary.index]
+        return summary.loc[player_ids].T
+
+    # ----------------- Storage -----------------
+    @staticmethod
+    def _manifest_path(path: str) -> str:
+        return os.path.splitext(path)[0] + '.manifest.json'
+
+    def save(self, path: str = "data/player_season_stats.parquet") -> None:
+        """
+        Write the table as Parquet and the manifest of aggregated matches next to it
+        (`<path stem>.manifest.json`).
+
+        Args:
+            path (str): Parquet path
+        """
+        table = self.stats.reset_index()
+        write_atomic(path, lambda tmp_path: table.to_parquet(tmp_path, index=False))
+
+        def write_manifest(tmp_path):
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'matches': self.matches}, f, indent=2, sort_keys=True)
+
+        write_atomic(self._manifest_path(path), write_manifest)
+
+    @classmethod
+    def load(cls, path: str = "data/player_season_stats.parquet") -> "PlayerSeasonTable":
+        """
+        Read a saved table; a missing file gives an empty table.
+
+        Args:
+            path (str): Parquet path written by `save`
+
+        Returns:
+            PlayerSeasonTable: The loaded table
+        """
+        if not os.path.exists(path):
+            return cls()
+        stats = pd.read_parquet(path).set_index(cls.KEY_COLUMNS)
+        matches = {}
+        if os.path.exists(cls._manifest_path(path)):
+            with open(cls._manifest_path(path), encoding='utf-8') as f:
+                matches = json.load(f).get('matches', {})
+        return cls(stats, matches)
+
+
+def season_labels(matches_index_path: str = "data/matches_index.csv") -> Dict[int, str]:
+    """
+    Get the season label ('<competition> <season>') of every match in the matches index.
+
+    Args:
+        matches_index_path (str): Path of `matches_index.csv`
+
+    Returns:
+        Dict[int, str]: match_id -> season label
+    """
+    from analysis.matches_index import read_matches_index
+    index = read_matches_index(matches_index_path)
+    labels = index['competition'].astype(str) + ' ' + index['season'].astype(str)
+    return dict(zip(index['match_id'].astype(int), labels))
+
+
+def update_player_table(event_store, client, output_path: str = "data/player_season_stats.parquet",
+                        matches_index_path: Optional[str] = "data/matches_index.csv",
+                        rebuild: bool = False, extractor=None) -> PlayerSeasonTable:
+    """
+    Add the matches of an EventStore that are not in the player table yet and save it.
+
+    Args:
+        event_store (EventStore): Store with the cleaned events (written by the extractor's `--event-store`)
+        client: `sb` or a CachedStatsBombClient, used for the lineups
+        output_path (str): Player table to update
+        matches_index_path (Optional[str]): matches_index.csv giving the season labels; matches
+            missing from it are labelled '<competition_id>/<season_id>'
+        rebuild (bool): Start from an empty table instead of the saved one
+        extractor (Optional[RefactoredWorldCupExtractor]): See `player_event_stats`
+
+    Returns:
+        PlayerSeasonTable: The updated table
+    """
+    table = PlayerSeasonTable() if rebuild else PlayerSeasonTable.load(output_path)
+    labels = season_labels(matches_index_path) if matches_index_path and os.path.exists(matches_index_path) else {}
+    added = 0
+    for competition_id, season_id, match_id in event_store.matches():
+        if str(match_id) in table.matches:
+            continue
+        events = event_store.read_match(competition_id, season_id, match_id)
+        try:
+            lineups = client.lineups(match_id=match_id)
+        except Exception as e:
+            print(f"Error fetching lineups for match {match_id}: {e}")
+            lineups = None
+        rows = player_match_stats(events, lineups, match_id, extractor)
+        added += table.update(rows, labels.get(match_id, f"{competition_id}/{season_id}"))
+    print(f"Added {added} matches ({len(table.matches)} in total) to {output_path}")
+    table.save(output_path)
+    return table
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Update the per-player season table from an event store')
+    parser.add_argument('--event-store', type=str, default='data/events', help='EventStore root with the cleaned events')
+    parser.add_argument('--save', type=str, default='data/player_season_stats.parquet', help='Player table path')
+    parser.add_argument('--index', type=str, default='data/matches_index.csv', help='matches_index.csv with the season names')
+    parser.add_argument('--cache-dir', type=str, default='data/cache', help='Cache raw StatsBomb responses (lineups) in this directory')
+    parser.add_argument('--offline', action='store_true', help='Only read lineups from the cache')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild the table from scratch')
+    args = parser.parse_args()
+
+    from analysis.cache import CachedStatsBombClient, RawDataCache
+    from analysis.event_store import EventStore
+    client = CachedStatsBombClient(RawDataCache(args.cache_dir), offline=args.offline)
+    update_player_table(EventStore(args.event_store), client, args.save, args.index, rebuild=args.rebuild)
@@ -0,0 +1,174 @@
+# analysis/row_writer.py
+
+import csv
+import glob
+import io
+import os
+from typing import Any, Dict, List, Set
+
+import pandas as pd
+
+from analysis.atomic import write_atomic
+
+
+class CsvRowWriter:
+    """
+    Append-only CSV writer for flattened match rows with a fixed column schema.
+
+    Each match is written with a single `write` and flushed, so after a crash the file holds
+    every finished match plus at most one torn match, which `open()` cuts off before resuming.
+    """
+
+    def __init__(self, path: str, schema: Dict[str, type]):
+        """
+        Args:
+            path (str): CSV file to append to
+            schema (Dict[str, type]): Ordered column -> Python type mapping (see `output_schema`)
+        """
+        self.path = path
+        self.columns = list(schema)
+        self._file = None
+
+    def open(self, resume: bool = True) -> Set[Any]:
+        """
+        Open the file for appending (a new file starts with the header).
+
+        Args:
+            resume (bool): Keep the rows already in the file; otherwise start over
+
+        Returns:
+            Set[Any]: match_ids already written (empty when not resuming)
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        written = set()
+        if resume and os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            self._repair()
+            existing = pd.read_csv(self.path, usecols=['match_id'])
+            if list(pd.read_csv(self.path, nrows=0).columns) != self.columns:
+                raise ValueError(f"{self.path} has different columns than the current metrics; write to a new file")
+            written = set(existing['match_id'].tolist())
+            self._file = open(self.path, 'a', newline='', encoding='utf-8')
+        else:
+            self._file = open(self.path, 'w', newline='', encoding='utf-8')
+            csv.writer(self._file).writerow(self.columns)
+            self._file.flush()
+        return written
+
+    def _repair(self) -> None:
+        # drop a torn last line, then the first row of a match whose second row never made it
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            end = data.rfind(b'\n') + 1
+            lines = data[:end].splitlines(keepends=True)
+            if len(lines) >= 2:
+                last_id = lines[-1].split(b',', 1)[0]
+                if len(lines) == 2 or lines[-2].split(b',', 1)[0] != last_id:
+                    end -= len(lines[-1])
+            f.truncate(end)
+
+    def write_match(self, rows: List[Dict[str, Any]]) -> None:
+        """Append the rows of one match and flush them to disk."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(['' if row.get(c) is None else row.get(c) for c in self.columns])
+        self._file.write(buffer.getvalue())
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ParquetRowWriter:
+    """
+    Streaming Parquet writer for flattened match rows with a fixed column schema.
+
+    A Parquet file cannot be appended to once closed, so `path` is a directory of part files:
+    rows are buffered for `matches_per_part` matches and each part is written atomically.
+    At most one unfinished part is lost on a crash, and resuming simply adds new parts.
+    """
+
+    def __init__(self, path: str, schema: Dict[str, type], matches_per_part: int = 16):
+        """
+        Args:
+            path (str): Output directory (read it back with `pd.read_parquet(path)`)
+            schema (Dict[str, type]): Ordered column -> Python type mapping (see `output_schema`)
+            matches_per_part (int): Matches buffered in memory before a part file is written
+        """
+        import pyarrow as pa
+        types = {int: pa.int64(), float: pa.float64(), str: pa.string(), bool: pa.bool_()}
+        self.path = path
+        self.columns = list(schema)
+        self.schema = pa.schema([(c, types.get(t, pa.string())) for c, t in schema.items()])
+        self.matches_per_part = max(1, matches_per_part)
+        self._buffer = []
+        self._buffered_matches = 0
+
+    def _parts(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.path, 'part-*.parquet')))
+
+    def open(self, resume: bool = True) -> Set[Any]:
+        """
+        Prepare the output directory.
+
+        Args:
+            resume (bool): Keep the parts already written; otherwise remove them
+
+        Returns:
+            Set[Any]: match_ids already written (empty when not resuming)
+        """
+        import pyarrow.parquet as pq
+        os.makedirs(self.path, exist_ok=True)
+        written = set()
+        for part in self._parts():
+            if not resume:
+                os.remove(part)
+                continue
+            if pq.read_schema(part).names != self.columns:
+                raise ValueError(f"{part} has different columns than the current metrics; write to a new directory")
+            written.update(pq.read_table(part, columns=['match_id']).column('match_id').to_pylist())
+        return written
+
+    def write_match(self, rows: List[Dict[str, Any]]) -> None:
+        """Buffer the rows of one match, writing a part file every `matches_per_part` matches."""
+        self._buffer.extend(rows)
+        self._buffered_matches += 1
+        if self._buffered_matches >= self.matches_per_part:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered rows as a new part file."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if not self._buffer:
+            return
+        table = pa.Table.from_pylist(
+            [{c: row.get(c) for c in self.columns} for row in self._buffer],
+            schema=self.schema
+        )
+        parts = self._parts()
+        index = int(os.path.basename(parts[-1])[5:10]) + 1 if parts else 0
+        write_atomic(os.path.join(self.path, f"part-{index:05d}.parquet"), lambda tmp: pq.write_table(table, tmp))
+        self._buffer = []
+        self._buffered_matches = 0
+
+    def close(self) -> None:
+        self.flush()
+
+
+def open_row_writer(path: str, schema: Dict[str, type]):
+    """
+    Pick the writer for an output path: a `.parquet` path gets a ParquetRowWriter, anything else CSV.
+
+    Args:
+        path (str): Output path
+        schema (Dict[str, type]): Ordered column -> Python type mapping
+
+    Returns:
+        CsvRowWriter or ParquetRowWriter
+    """
+    if path.endswith('.parquet'):
+        return ParquetRowWriter(path, schema)
+    return CsvRowWriter(path, schema)
@@ -0,0 +1,325 @@
+# analysis/shot_map.py
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from analysis.atomic import write_atomic
+
+# event column -> shots table column and dtype
+SHOT_COLUMNS = {
+    'match_id': ('match_id', 'int64'),
+    'id': ('event_id', 'string'),
+    'team': ('team', 'category'),
+    'player': ('player', 'category'),
+    'period': ('period', 'int8'),
+    'minute': ('minute', 'int16'),
+    'second': ('second', 'int16'),
+    'location_x': ('x', 'float32'),
+    'location_y': ('y', 'float32'),
+    'shot_end_location_x': ('end_x', 'float32'),
+    'shot_end_location_y': ('end_y', 'float32'),
+    'shot_end_location_z': ('end_z', 'float32'),
+    'shot_statsbomb_xg': ('xg', 'float32'),
+    'shot_outcome': ('outcome', 'category'),
+    'shot_body_part': ('body_part', 'category'),
+    'shot_type': ('shot_type', 'category'),
+    'under_pressure': ('under_pressure', 'bool'),
+}
+# columns the shot map needs from the cleaned events
+EVENT_COLUMNS = list(SHOT_COLUMNS) + ['type', 'play_pattern']
+CATEGORY_COLUMNS = [column for column, dtype in SHOT_COLUMNS.values() if dtype == 'category']
+
+
+def shots_table(events: pd.DataFrame, match_id: Optional[int] = None, extractor=None) -> pd.DataFrame:
+    """
+    Build the flat shots table of one or more matches from cleaned events.
+
+    Only the shots counted by `compute_shot_stats` are kept (see `RefactoredWorldCupExtractor.kept_shots`),
+    each once, with typed columns: x/y/end_x/end_y/end_z and xg as float32, outcome, body part,
+    shot type, team and player as categoricals, plus `from_counter` (play pattern "From Counter").
+
+    Args:
+        events (pd.DataFrame): Cleaned events with unpacked coordinates (e.g. read from the EventStore)
+        match_id (Optional[int]): Match of the events when they have no match_id column
+        extractor: RefactoredWorldCupExtractor deciding which shots are kept (a default one if None)
+
+    Returns:
+        pd.DataFrame: One row per shot
+    """
+    if extractor is None:
+        from analysis.worldcup_to_csv import RefactoredWorldCupExtractor
+        extractor = RefactoredWorldCupExtractor()
+    events = extractor.ensure_coordinates(events)
+    if 'match_id' not in events.columns:
+        events = events.assign(match_id=match_id)
+    if 'match_id' in events.columns and events['match_id'].nunique() > 1:
+        # duplicates are only dropped within a match
+        kept = np.zeros(len(events), dtype=bool)
+        for _, rows in events.groupby('match_id', sort=False).indices.items():
+            kept[rows] = extractor.kept_shots(events.iloc[rows])
+    else:
+        kept = extractor.kept_shots(events)
+    return _typed_shots(events[kept])
+
+
+def _typed_shots(shots: pd.DataFrame) -> pd.DataFrame:
+    # shot events -> shots table columns with the dtypes of SHOT_COLUMNS
+    table = {}
+    for source, (column, dtype) in SHOT_COLUMNS.items():
+        values = shots[source] if source in shots.columns else pd.Series(np.nan, index=shots.index)
+        if dtype == 'bool':
+            values = values.fillna(False).astype(bool)
+        elif dtype.startswith('int'):
+            values = values.fillna(0).astype(dtype)
+        else:
+            values = values.astype(dtype)
+        table[column] = values.reset_index(drop=True)
+    play_pattern = shots['play_pattern'] if 'play_pattern' in shots.columns else pd.Series(np.nan, index=shots.index)
+    table['from_counter'] = (play_pattern == 'From Counter').to_numpy()
+    return pd.DataFrame(table).sort_values(['match_id', 'team', 'period', 'minute', 'second'], kind='stable') \
+        .reset_index(drop=True)
+
+
+class ShotMapStore:
+    """
+    Columnar store of every shot, one Parquet file with one row group per match.
+
+    Rows are sorted by (match_id, team) and the file metadata holds the row group of every
+    match and the row groups of every team, so `read` loads a single match or team without
+    decoding the rest. team, player, outcome, body part and shot type are dictionary encoded.
+    """
+
+    METADATA_KEY = b'shot_map_index'
+
+    def __init__(self, path: str = "data/shots.parquet"):
+        """
+        Args:
+            path (str): Parquet file of the store
+        """
+        self.path = path
+        self._index = None
+        self._version = None
+
+    def _file(self) -> Optional[pq.ParquetFile]:
+        if not os.path.exists(self.path):
+            return None
+        # strings are dictionary encoded per row group in the file and come back as categoricals
+        return pq.ParquetFile(self.path, read_dictionary=CATEGORY_COLUMNS)
+
+    def index(self) -> Dict[str, Dict[str, List[int]]]:
+        """
+        Get the row-group index of the file.
+
+        Returns:
+            Dict[str, Dict[str, List[int]]]: {'matches': {match_id: [row group]}, 'teams': {team: [row groups]}}
+        """
+        if not os.path.exists(self.path):
+            return {'matches': {}, 'teams': {}}
+        version = os.stat(self.path).st_mtime_ns
+        if self._index is None or self._version != version:
+            metadata = pq.read_schema(self.path).metadata or {}
+            self._index = json.loads(metadata.get(self.METADATA_KEY, b'{"matches": {}, "teams": {}}'))
+            self._version = version
+        return self._index
+
+    def write(self, shots: pd.DataFrame) -> str:
+        """
+        Write (replace) the store with the given shots table.
+
+        Args:
+            shots (pd.DataFrame): Output of `shots_table`
+
+        Returns:
+            str: Path of the written file
+        """
+        shots = shots.sort_values(['match_id', 'team'], kind='stable').reset_index(drop=True)
+        matches, teams = {}, {}
+        groups = list(shots.groupby('match_id', sort=True).indices.items())
+        for group, (match_id, rows) in enumerate(groups):
+            matches[str(match_id)] = [group]
+            for team in shots['team'].iloc[rows].dropna().unique():
+                teams.setdefault(str(team), []).append(group)
+        table = pa.Table.from_pandas(shots, preserve_index=False)
+        # plain strings: a whole-table Arrow dictionary would be repeated in every row group
+        for i, field in enumerate(table.schema):
+            if pa.types.is_dictionary(field.type):
+                table = table.set_column(i, field.name, table.column(i).cast(field.type.value_type))
+        table = table.replace_schema_metadata({
+            self.METADATA_KEY: json.dumps({'matches': matches, 'teams': teams}).encode('utf-8')
+        })
+
+        def write(tmp_path):
+            with pq.ParquetWriter(tmp_path, table.schema, compression='zstd') as writer:
+                for _, rows in groups:
+                    writer.write_table(table.slice(rows[0], len(rows)))
+
+        write_atomic(self.path, write)
+        return self.path
+
+    def update(self, shots: pd.DataFrame) -> str:
+        """
+        Add or replace the shots of the matches in `shots`, keeping every other match.
+
+        Args:
+            shots (pd.DataFrame): Output of `shots_table` for new or re-extracted matches
+
+        Returns:
+            str: Path of the written file
+        """
+        existing = self.read()
+        if not existing.empty:
+            existing = existing[~existing['match_id'].isin(shots['match_id'])]
+            # categoricals with different categories concatenate to objects, so re-encode them
+            shots = pd.concat([existing, shots], ignore_index=True)
+            for source, (column, dtype) in SHOT_COLUMNS.items():
+                if dtype == 'category':
+                    shots[column] = shots[column].astype('category')
+        return self.write(shots)
+
+    def matches(self) -> List[int]:
+        """Match ids in the store."""
+        return sorted(int(match_id) for match_id in self.index()['matches'])
+
+    def teams(self) -> List[str]:
+        """Team names in the store."""
+        return sorted(self.index()['teams'])
+
+    def read(self, match_id: Optional[int] = None, team: Optional[str] = None,
+             columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        Read shots, decoding only the row groups of the requested match and/or team.
+
+        Args:
+            match_id (Optional[int]): Only this match
+            team (Optional[str]): Only this team's shots
+            columns (Optional[Sequence[str]]): Columns to read (None reads every column)
+
+        Returns:
+            pd.DataFrame: The shots (empty when nothing matches)
+        """
+        parquet = self._file()
+        if parquet is None:
+            return pd.DataFrame(columns=list(columns) if columns else None)
+        index = self.index()
+        groups = None
+        if match_id is not None:
+            groups = set(index['matches'].get(str(match_id), []))
+        if team is not None:
+            team_groups = set(index['teams'].get(team, []))
+            groups = team_groups if groups is None else groups & team_groups
+        read_columns = list(columns) if columns is not None else None
+        if read_columns is not None and team is not None and 'team' not in read_columns:
+            read_columns.append('team')
+        if groups is None:
+            table = parquet.read(columns=read_columns)
+        else:
+            table = parquet.read_row_groups(sorted(groups), columns=read_columns)
+        shots = table.to_pandas()
+        if team is not None:
+            # a match row group also holds the opponent's shots
+            shots = shots[shots['team'] == team].reset_index(drop=True)
+            if columns is not None and 'team' not in columns:
+                shots = shots.drop(columns='team')
+        return shots
+
+
+def build_shot_map(event_store, output_path: str = "data/shots.parquet", filters: Optional[List[Any]] = None,
+                   incremental: bool = True) -> ShotMapStore:
+    """
+    Build the shot map from the cleaned events of an EventStore, reading only the Shot rows
+    and the shot columns.
+
+    Args:
+        event_store (EventStore): Store written by the extractor (`--event-store`)
+        output_path (str): Parquet file of the ShotMapStore
+        filters (Optional[List[Any]]): Extra EventStore filters, e.g. [('competition_id', '==', 43)]
+        incremental (bool): Only add matches that are not in the shot map yet
+
+    Returns:
+        ShotMapStore: The updated store
+    """
+    store = ShotMapStore(output_path)
+    filters = [('type', '==', 'Shot')] + list(filters or [])
+    if incremental and store.matches():
+        filters.append(('match_id', 'not in', store.matches()))
+    # columns missing from every stored match cannot be projected, so ask for the ones present
+    available = set(event_store.columns())
+    columns = [c for c in EVENT_COLUMNS if c in available]
+    events = event_store.read(columns=columns, filters=filters, categorical=False)
+    if events.empty:
+        print(f"No new shots for {output_path}")
+        return store
+    shots = shots_table(events)
+    if incremental:
+        store.update(shots)
+    else:
+        store.write(shots)
+    print(f"Saved {len(shots)} shots of {shots['match_id'].nunique()} matches to {output_path}")
+    return store
+
+
+def shots_from_legacy_json(path: str = "data/shot_map_data.json") -> pd.DataFrame:
+    """
+    Convert the old nested shot_map_data.json (tournament -> teams -> matches -> shots, every
+    shot listed under both teams) into the flat shots table.
+
+    Args:
+        path (str): Path of the JSON document
+
+    Returns:
+        pd.DataFrame: One row per shot, typed like `shots_table` (period is unknown and set to 0,
+        event_id is the shot's sequence number within its match)
+    """
+    with open(path, encoding='utf-8') as f:
+        document = json.load(f)
+    rows = {}
+    for team in document['teams'].values():
+        for match in team['matches']:
+            match_id = match['match_info']['match_id']
+            for shot in match['shots']:
+                end = shot.get('end_position') or {}
+                rows[(match_id, shot['event_id'])] = {
+                    'match_id': match_id,
+                    'id': str(shot['event_id']),
+                    'team': shot['team'],
+                    'player': shot['player'],
+                    'period': 0,
+                    'minute': shot['minute'],
+                    'second': shot['second'],
+                    'location_x': shot['position']['x'],
+                    'location_y': shot['position']['y'],
+                    'shot_end_location_x': end.get('x'),
+                    'shot_end_location_y': end.get('y'),
+                    'shot_end_location_z': end.get('z'),
+                    'shot_statsbomb_xg': shot['xG'],
+                    'shot_outcome': shot['outcome'],
+                    'shot_body_part': shot['body_part'],
+                    'shot_type': shot['shot_type'],
+                    'under_pressure': shot['under_pressure'],
+                    'play_pattern': 'From Counter' if shot['from_counter'] else None,
+                }
+    # the document only holds kept shots already
+    return _typed_shots(pd.DataFrame(list(rows.values())))
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Build the columnar shot map')
+    parser.add_argument('--event-store', type=str, default='data/events', help='EventStore root to read shots from')
+    parser.add_argument('--from-json', type=str, default=None, help='Convert an old shot_map_data.json instead')
+    parser.add_argument('--save', type=str, default='data/shots.parquet', help='Shot map Parquet file')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild instead of adding new matches')
+    args = parser.parse_args()
+    if args.from_json:
+        shots = shots_from_legacy_json(args.from_json)
+        ShotMapStore(args.save).write(shots)
+        print(f"Saved {len(shots)} shots of {shots['match_id'].nunique()} matches to {args.save}")
+    else:
+        from analysis.event_store import EventStore
+        build_shot_map(EventStore(args.event_store), args.save, incremental=not args.rebuild)
@@ -0,0 +1,308 @@
+# analysis/team_aggregates.py
+
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from analysis.atomic import write_atomic
+
+
+class TeamAggregates:
+    """
+    Running per-team sums of the flattened match rows (see `RefactoredWorldCupExtractor.flatten_match_data`).
+
+    For every (team, stage, metric) the table keeps the number of matches with a value, the
+    sum and the sum of squares, so means, totals, per-90 rates and variances are a lookup and
+    a division. Stage `ALL_STAGES` aggregates every match of the team; the others split it by
+    competition stage (Group Stage, Round of 16, ...). Adding a match adds its two rows to the
+    sums instead of rescanning the match data, and `remove` subtracts rows that are replaced.
+
+    Per-90 rates divide by the `minutes` column of the rows (match length, extra time included),
+    so they are only defined where every aggregated match has it; rows written before the
+    extractor recorded minutes leave them NaN.
+    """
+
+    ALL_STAGES = 'All'
+    KEY_COLUMNS = ['team_name', 'stage', 'metric']
+    STAT_COLUMNS = ['count', 'sum', 'sumsq']
+    # flattened columns that are identifiers, not metrics
+    ID_COLUMNS = ['match_id', 'match_date', 'team_name', 'team_type', 'opponent_name']
+
+    def __init__(self, stats: Optional[pd.DataFrame] = None, matches: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            stats (Optional[pd.DataFrame]): count/sum/sumsq indexed by (team_name, stage, metric)
+            matches (Optional[Dict[str, str]]): match_id (as str) -> stage of the matches already aggregated
+        """
+        if stats is None:
+            index = pd.MultiIndex.from_arrays([[], [], []], names=self.KEY_COLUMNS)
+            stats = pd.DataFrame(columns=self.STAT_COLUMNS, index=index, dtype=float)
+        self.stats = stats
+        self.matches = matches or {}
+
+    # ----------------- Updates -----------------
+    def _deltas(self, rows: pd.DataFrame, stages: pd.Series) -> pd.DataFrame:
+        metrics = [c for c in rows.columns if c not in self.ID_COLUMNS and pd.api.types.is_numeric_dtype(rows[c])]
+        values = rows[metrics].astype(float)
+        long = values.assign(team_name=rows['team_name'].to_numpy()).melt(
+            id_vars='team_name', var_name='metric', value_name='value')
+        long['sumsq'] = long['value'] ** 2
+        long['stage'] = np.tile(stages.to_numpy(), len(values.columns))
+        frames = []
+        for keys in (['team_name', 'metric'], ['team_name', 'stage', 'metric']):
+            grouped = long.dropna(subset=keys).groupby(keys)
+            delta = pd.DataFrame({
+                'count': grouped['value'].count(),
+                'sum': grouped['value'].sum(),
+                'sumsq': grouped['sumsq'].sum()
+            }).reset_index()
+            if 'stage' not in keys:
+                delta['stage'] = self.ALL_STAGES
+            frames.append(delta)
+        return pd.concat(frames, ignore_index=True).set_index(self.KEY_COLUMNS)[self.STAT_COLUMNS]
+
+    def _apply(self, rows: pd.DataFrame, stages: pd.Series, sign: int) -> None:
+        delta = self._deltas(rows, stages)
+        if self.stats.empty:
+            self.stats = delta * sign
+        else:
+            self.stats = self.stats.add(delta * sign, fill_value=0)
+        # drop (team, stage, metric) entries whose last match was removed
+        self.stats = self.stats[self.stats['count'] > 0].sort_index()
+
+    @staticmethod
+    def _stage_of(rows: pd.DataFrame, stages: Union[str, Dict[Any, str], None]) -> pd.Series:
+        if stages is None:
+            return pd.Series(np.nan, index=rows.index, dtype=object)
+        if isinstance(stages, str):
+            return pd.Series(stages, index=rows.index, dtype=object)
+        return rows['match_id'].map(stages).astype(object)
+
+    def update(self, rows: Union[pd.DataFrame, List[Dict[str, Any]]], stages: Union[str, Dict[Any, str], None] = None) -> int:
+        """
+        Add the rows of new matches; matches already aggregated are skipped.
+
+        Args:
+            rows (Union[pd.DataFrame, List[Dict[str, Any]]]): Flattened rows (two per match)
+            stages (Union[str, Dict[Any, str], None]): Competition stage of every row (one name for
+                all of them, or match_id -> stage); rows without a stage only count towards ALL_STAGES
+
+        Returns:
+            int: Number of matches added
+        """
+        rows = pd.DataFrame(rows)
+        if rows.empty:
+            return 0
+        rows = rows[~rows['match_id'].astype(str).isin(self.matches)]
+        if rows.empty:
+            return 0
+        stage = self._stage_of(rows, stages)
+        self._apply(rows, stage, 1)
+        for match_id, match_stage in zip(rows['match_id'].astype(str), stage):
+            self.matches[match_id] = None if pd.isna(match_stage) else match_stage
+        return rows['match_id'].nunique()
+
+    def remove(self, rows: Union[pd.DataFrame, List[Dict[str, Any]]]) -> int:
+        """
+        Subtract the rows of matches that were aggregated before (e.g. before re-extracting them).
+
+        Args:
+            rows (Union[pd.DataFrame, List[Dict[str, Any]]]): The flattened rows that were added
+
+        Returns:
+            int: Number of matches removed
+        """
+        rows = pd.DataFrame(rows)
+        if rows.empty:
+            return 0
+        rows = rows[rows['match_id'].astype(str).isin(self.matches)]
+        if rows.empty:
+            return 0
+        stage = rows['match_id'].astype(str).map(self.matches).astype(object)
+        self._apply(rows, stage, -1)
+        for match_id in rows['match_id'].astype(str).unique():
+            del self.matches[match_id]
+        return rows['match_id'].nunique()
+
+    # ----------------- Queries -----------------
+    def _stat(self, team: str, metric: str, stage: str) -> pd.Series:
+        return self.stats.loc[(team, stage, metric)]
+
+    def teams(self, stage: str = ALL_STAGES) -> List[str]:
+        """Sorted team names with at least one match in `stage`."""
+        if self.stats.empty:
+            return []
+        names = self.stats.xs(stage, level='stage').index.get_level_values('team_name').unique()
+        return sorted(names.tolist())
+
+    def metrics(self) -> List[str]:
+        """Metric names in the table."""
+        return sorted(self.stats.index.get_level_values('metric').unique().tolist())
+
+    def has_minutes(self) -> bool:
+        """Whether any aggregated row has its match minutes, i.e. per-90 rates can be shown."""
+        return 'minutes' in self.stats.index.get_level_values('metric')
+
+    def matches_played(self, team: str, stage: str = ALL_STAGES) -> int:
+        # every row has the metrics of its extractor version, so the best-covered metric counts every match
+        return int(self.stats.xs((team, stage), level=['team_name', 'stage'])['count'].max())
+
+    def total(self, team: str, metric: str, stage: str = ALL_STAGES) -> float:
+        return float(self._stat(team, metric, stage)['sum'])
+
+    def mean(self, team: str, metric: str, stage: str = ALL_STAGES) -> float:
+        stat = self._stat(team, metric, stage)
+        return float(stat['sum'] / stat['count'])
+
+    def variance(self, team: str, metric: str, stage: str = ALL_STAGES) -> float:
+        """Sample variance of the per-match values (NaN with a single match)."""
+        stat = self._stat(team, metric, stage)
+        n = stat['count']
+        if n < 2:
+            return float('nan')
+        return float(max(stat['sumsq'] - stat['sum'] ** 2 / n, 0.0) / (n - 1))
+
+    def per_90(self, team: str, metric: str, stage: str = ALL_STAGES) -> float:
+        """Metric total per 90 minutes played, NaN unless every match with the metric has its minutes."""
+        if (team, stage, 'minutes') not in self.stats.index:
+            return float('nan')
+        minutes = self._stat(team, 'minutes', stage)
+        stat = self._stat(team, metric, stage)
+        if minutes['sum'] <= 0 or minutes['count'] != stat['count']:
+            return float('nan')
+        return float(stat['sum'] / minutes['sum'] * 90)
+
+    def summary(self, stage: str = ALL_STAGES, stat: str = 'mean') -> pd.DataFrame:
+        """
+        One row per team, one column per metric.
+
+        Args:
+            stage (str): Stage to summarize (ALL_STAGES for every match)
+            stat (str): 'mean', 'total', 'per_90', 'variance' or 'count'
+
+        Returns:
+            pd.DataFrame: team_name x metric table
+        """
+        if self.stats.empty:
+            return pd.DataFrame()
+        table = self.stats.xs(stage, level='stage')
+        n = table['count']
+        if stat == 'mean':
+            values = table['sum'] / n
+        elif stat == 'total':
+            values = table['sum']
+        elif stat == 'count':
+            values = n
+        elif stat == 'variance':
+            values = ((table['sumsq'] - table['sum'] ** 2 / n).clip(lower=0) / (n - 1)).where(n > 1)
+        elif stat == 'per_90':
+            teams = table.index.get_level_values('team_name')
+            minutes = table.xs('minutes', level='metric') if 'minutes' in table.index.get_level_values('metric') \
+                else pd.DataFrame(columns=['count', 'sum'], dtype=float)
+            minutes_sum = minutes['sum'].reindex(teams).to_numpy()
+            # a rate is only defined when the minutes cover every match that has the metric
+            covered = (minutes['count'].reindex(teams).to_numpy() == n.to_numpy()) & (minutes_sum > 0)
+            values = (table['sum'] / minutes_sum * 90).where(covered)
+        else:
+            raise ValueError(f"Unknown stat: {stat}")
+        return values.unstack('metric')
+
+    def ranking(self, metric: str, stage: str = ALL_STAGES, stat: str = 'mean', ascending: bool = False) -> pd.Series:
+        """Teams ordered by one metric (best first unless `ascending`)."""
+        return self.summary(stage, stat)[metric].sort_values(ascending=ascending)
+
+    # ----------------- Storage -----------------
+    @staticmethod
+    def _manifest_path(path: str) -> str:
+        return os.path.splitext(path)[0] + '.manifest.json'
+
+    def save(self, path: str = "data/team_aggregates.csv") -> None:
+        """
+        Write the table (long format: team_name, stage, metric, count, sum, sumsq) and the manifest of
+        aggregated matches next to it (`<path stem>.manifest.json`).
+
+        Args:
+            path (str): CSV path
+        """
+        table = self.stats.reset_index()
+        write_atomic(path, lambda tmp_path: table.to_csv(tmp_path, index=False))
+
+        def write_manifest(tmp_path):
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'matches': self.matches}, f, indent=2, sort_keys=True)
+
+        write_atomic(self._manifest_path(path), write_manifest)
+
+    @classmethod
+    def load(cls, path: str = "data/team_aggregates.csv") -> "TeamAggregates":
+        """
+        Read a saved table; a missing file gives an empty table.
+
+        Args:
+            path (str): CSV path written by `save`
+
+        Returns:
+            TeamAggregates: The loaded table
+        """
+        if not os.path.exists(path):
+            return cls()
+        stats = pd.read_csv(path, dtype={'team_name': str, 'stage': str, 'metric': str})
+        stats = stats.set_index(cls.KEY_COLUMNS)[cls.STAT_COLUMNS].astype(float)
+        matches = {}
+        if os.path.exists(cls._manifest_path(path)):
+            with open(cls._manifest_path(path), encoding='utf-8') as f:
+                matches = json.load(f).get('matches', {})
+        return cls(stats, matches)
+
+
+def match_stages(matches_index_path: str = "data/matches_index.csv") -> Dict[Any, str]:
+    """
+    Get the competition stage of every match in the matches index.
+
+    Args:
+        matches_index_path (str): Path of `matches_index.csv`
+
+    Returns:
+        Dict[Any, str]: match_id -> competition_stage
+    """
+    index = pd.read_csv(matches_index_path, usecols=['match_id', 'competition_stage'])
+    return dict(zip(index['match_id'], index['competition_stage']))
+
+
+def update_team_aggregates(match_data_paths: Iterable[str], output_path: str = "data/team_aggregates.csv",
+                           matches_index_path: Optional[str] = "data/matches_index.csv",
+                           rebuild: bool = False) -> TeamAggregates:
+    """
+    Add the matches of the given match-data CSVs that are not aggregated yet and save the table.
+
+    Args:
+        match_data_paths (Iterable[str]): CSVs of flattened rows (e.g. data/worldcup_2022_match_data.csv)
+        output_path (str): Aggregate table to update
+        matches_index_path (Optional[str]): matches_index.csv used for the competition stages
+        rebuild (bool): Start from an empty table instead of the saved one
+
+    Returns:
+        TeamAggregates: The updated table
+    """
+    aggregates = TeamAggregates() if rebuild else TeamAggregates.load(output_path)
+    stages = match_stages(matches_index_path) if matches_index_path and os.path.exists(matches_index_path) else None
+    added = 0
+    for path in match_data_paths:
+        added += aggregates.update(pd.read_csv(path), stages=stages)
+    print(f"Added {added} matches ({len(aggregates.matches)} in total) to {output_path}")
+    aggregates.save(output_path)
+    return aggregates
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Update the per-team aggregate table from match-data CSVs')
+    parser.add_argument('data', nargs='+', help='CSV files of flattened match rows')
+    parser.add_argument('--save', type=str, default='data/team_aggregates.csv', help='Aggregate table path')
+    parser.add_argument('--index', type=str, default='data/matches_index.csv', help='matches_index.csv with the competition stages')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild the table from scratch')
+    args = parser.parse_args()
+    update_team_aggregates(args.data, args.save, args.index, rebuild=args.rebuild)
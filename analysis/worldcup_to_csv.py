@@ -11,6 +11,10 @@ This is an updated, fully patched version that includes:
 - Possession-based counter-attack and press->attack calculations
 - Safe handling of missing columns and conservative fallbacks
 - **Shootout & post-120-minute shot exclusion** and **duplicate-shot deduplication** to prevent inflated shot/xG totals
+- Single grouped (team, type, outcome) event summary shared by every metric group and both teams
+- Coordinate lists unpacked once per match into float32 `*_x`/`*_y`/`*_z` columns (NaN when missing)
+- Optional stage timers and counters (`analysis.instrumentation`) exported as JSON logs or Prometheus text
+- Per-match `MatchContext` caching the slices shared by the metric methods (directions, shots, passes, possessions)
 
 Requirements:
     pip install statsbombpy pandas numpy
@@ -24,29 +28,70 @@ Usage examples:
     extractor = RefactoredWorldCupExtractor()
     df = extractor.process_single_match(match_id=3869685, save_csv='final.csv')
 
-Note: Running this script requires internet access if you use statsbombpy to fetch events.
-If you prefer to provide event JSON/CSV files, modify `get_match_events` to load from disk.
+- Nightly refresh, only re-extracting new or changed matches (from the repository root):
+    python -m analysis.worldcup_to_csv --all --save data/worldcup_2022_match_data.csv --incremental
+
+- Same, quietly, with per-stage timings for the node_exporter textfile collector:
+    python -m analysis.worldcup_to_csv --all --save data/worldcup_2022_match_data.csv --incremental \
+        --quiet --metrics-file /var/lib/node_exporter/football_eda.prom
+
+Note: Running this script requires internet access if you use statsbombpy to fetch events,
+unless the responses are already cached (`--cache-dir`, see `analysis.cache`).
+If you prefer to provide event JSON/CSV files, modify `get_match_events` to load from disk
+(and pass the frame through `unpack_coordinates`).
 """
 
+import hashlib
+import json
+import os
+import sys
+import traceback
 import warnings
 warnings.filterwarnings('ignore')
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import pandas as pd
 import numpy as np
-from statsbombpy import sb
+
+from analysis.atomic import write_atomic
+from analysis.fetching import fetch_with_retry
+from analysis.instrumentation import NULL_INSTRUMENTATION
+from analysis.match_clock import match_end_minute
+from analysis.match_context import MatchContext
+from analysis.row_writer import open_row_writer
 
 
 class RefactoredWorldCupExtractor:
-    def __init__(self, competition_id=43, season_id=106, pitch_length=120.0, pitch_width=80.0):
+    def __init__(self, competition_id=43, season_id=106, pitch_length=120.0, pitch_width=80.0, client=None,
+                 event_store=None, instrumentation=None, fetch_retries=0, verbose=True):
+        """`client` replaces statsbombpy's `sb` for fetching, e.g. `analysis.cache.CachedStatsBombClient()`.
+        `event_store` (an `analysis.event_store.EventStore`) receives the cleaned events of every processed match.
+        `instrumentation` (an `analysis.instrumentation.Instrumentation`) times the fetch, clean and metric stages
+        and counts events processed, matches skipped and fetch retries; tracing is off when it is None.
+        `fetch_retries` retries failed event fetches; `verbose=False` silences the per-match progress prints.
+        """
         self.competition_id = competition_id
         self.season_id = season_id
         self.pitch_length = float(pitch_length)
         self.pitch_width = float(pitch_width)
+        self.client = client
+        self.event_store = event_store
+        self.instrumentation = instrumentation if instrumentation is not None else NULL_INSTRUMENTATION
+        self.fetch_retries = fetch_retries
+        self.verbose = verbose
+
+    def _client(self):
+        # the sb module is imported at call time so the extractor stays picklable for process pools
+        # and runs served from a cache never import statsbombpy
+        if self.client is not None:
+            return self.client
+        from statsbombpy import sb
+        return sb
 
     # ----------------- Data fetching -----------------
     def get_matches(self):
         try:
-            matches = sb.matches(competition_id=self.competition_id, season_id=self.season_id)
+            matches = self._client().matches(competition_id=self.competition_id, season_id=self.season_id)
             print(f"Found {len(matches)} matches in competition={self.competition_id}, season={self.season_id}")
             return matches
         except Exception as e:
@@ -55,14 +100,59 @@ class RefactoredWorldCupExtractor:
 
     def get_match_events(self, match_id):
         try:
-            events = sb.events(match_id=match_id)
-            events = events.reset_index(drop=True)
-            return events
+            with self.instrumentation.stage('fetch'):
+                events = fetch_with_retry(lambda mid: self._client().events(match_id=mid), match_id,
+                                          retries=self.fetch_retries, timeout=None, on_retry=self._count_retry)
+                events = events.reset_index(drop=True)
+                return self.unpack_coordinates(events)
         except Exception as e:
             print(f"Error fetching events for match {match_id}: {e}")
             return None
 
+    def _count_retry(self, match_id, attempt, error):
+        self.instrumentation.increment('fetch_retries')
+
     # ----------------- Helpers -----------------
+    # list-valued coordinate columns -> number of float32 components unpacked from each
+    COORDINATE_COLUMNS = {
+        'location': ('x', 'y'),
+        'pass_end_location': ('x', 'y'),
+        'carry_end_location': ('x', 'y'),
+        'shot_end_location': ('x', 'y', 'z'),
+    }
+
+    def unpack_coordinates(self, events, columns=None):
+        """Unpack the list-valued coordinate columns into float32 `<column>_x/_y(/_z)` columns.
+        Missing or malformed coordinates become NaN, and absent source columns give all-NaN columns,
+        so the metric code can use plain vectorized comparisons instead of per-row lambdas.
+        `columns` restricts the unpacking to some of the COORDINATE_COLUMNS.
+        """
+        n = len(events)
+        unpacked = {}
+        for column, axes in self.COORDINATE_COLUMNS.items():
+            if columns is not None and column not in columns:
+                continue
+            coords = np.full((n, len(axes)), np.nan, dtype=np.float32)
+            if column in events.columns:
+                values = events[column].to_numpy()
+                valid = np.fromiter((isinstance(c, (list, tuple)) and len(c) > 0 for c in values), dtype=bool, count=n)
+                if valid.any():
+                    parsed = pd.DataFrame(values[valid].tolist()).apply(pd.to_numeric, errors='coerce')
+                    width = min(len(axes), parsed.shape[1])
+                    coords[valid, :width] = parsed.iloc[:, :width].to_numpy(dtype=np.float32)
+            for i, axis in enumerate(axes):
+                unpacked[f'{column}_{axis}'] = coords[:, i]
+        events = events.drop(columns=[c for c in unpacked if c in events.columns])
+        return pd.concat([events, pd.DataFrame(unpacked, index=events.index)], axis=1)
+
+    def ensure_coordinates(self, events):
+        """Return `events` with unpacked coordinate columns, unpacking only the missing ones
+        (a column projection of the EventStore may hold some of them already)."""
+        missing = [column for column in self.COORDINATE_COLUMNS if f'{column}_x' not in events.columns]
+        if not missing:
+            return events
+        return self.unpack_coordinates(events, columns=missing)
+
     def safe_coord(self, coord, idx=0):
         if isinstance(coord, (list, tuple)) and len(coord) > idx:
             try:
@@ -72,16 +162,13 @@ class RefactoredWorldCupExtractor:
         return np.nan
 
     def infer_team_direction(self, events, team_name, min_samples=10):
-        passes = events[(events['type'] == 'Pass') & (events['team'] == team_name)].copy()
-        if 'location' not in passes.columns or 'pass_end_location' not in passes.columns:
-            return 1
-        valid = passes[passes['location'].apply(lambda c: isinstance(c, (list,tuple)) and len(c)>=2) &
-                      passes['pass_end_location'].apply(lambda c: isinstance(c, (list,tuple)) and len(c)>=2)]
+        events = self.ensure_coordinates(events)
+        passes = events[(events['type'] == 'Pass') & (events['team'] == team_name)]
+        valid = passes[passes['location_x'].notna() & passes['location_y'].notna() &
+                       passes['pass_end_location_x'].notna() & passes['pass_end_location_y'].notna()]
         if len(valid) < min_samples:
             return 1
-        start_x = valid['location'].apply(lambda c: float(c[0]))
-        end_x = valid['pass_end_location'].apply(lambda c: float(c[0]))
-        mean_diff = (end_x - start_x).mean()
+        mean_diff = (valid['pass_end_location_x'].astype(float) - valid['location_x'].astype(float)).mean()
         return 1 if mean_diff >= 0 else -1
 
     # ----------------- Cleaning (shootout, duplicates) -----------------
@@ -117,14 +204,7 @@ class RefactoredWorldCupExtractor:
             if 'period' in shots.columns:
                 subset_cols.append('period')
 
-            # Check if 'location' is present before attempting to use it (though we are excluding it)
-            # If location is needed for deduplication, it would need to be converted to a hashable type (e.g., tuple or string)
-            # For now, we rely on team, minute, and period being sufficient identifiers for duplicates.
-            if 'location' in shots.columns:
-                 # Convert location lists to tuples for potential future use or debugging, though not used in drop_duplicates subset below
-                 shots['_location_tuple'] = shots['location'].apply(lambda x: tuple(x) if isinstance(x, (list,tuple)) else None)
-
-
+            # We rely on team, minute, and period being sufficient identifiers for duplicates.
             # Apply drop_duplicates excluding the problematic 'location' column from the subset
             # Using a combination of team, minute, and period should catch most identical duplicates
             if len(shots) > 0:
@@ -135,21 +215,42 @@ class RefactoredWorldCupExtractor:
         return ev
 
 
+    # ----------------- Match context -----------------
+    def match_context(self, events):
+        """Per-match cache of the slices shared by the compute_* methods, see `MatchContext`.
+        Build it once from the cleaned events and pass it as `context=` to every method."""
+        return MatchContext(self, events)
+
     # ----------------- Possession -----------------
-    def calculate_possession(self, events, home_team, away_team):
+    def possession_owners(self, events):
+        """Owner (team with most events, ties to the team that appears first) and size (number of
+        events) of every possession, indexed by possession id."""
+        valid = events['possession'].notna().to_numpy()
+        possession = events['possession'].to_numpy()[valid]
+        frame = pd.DataFrame({'possession': possession, 'team': events['team'].to_numpy()[valid],
+                              'row': np.arange(len(possession))})
+        counts = frame.dropna().groupby(['possession', 'team']).agg(n=('row', 'size'), first=('row', 'min')).reset_index()
+        counts = counts.sort_values(['possession', 'n', 'first'], ascending=[True, False, True])
+        owners = pd.DataFrame({'size': pd.Series(possession).groupby(possession).size()})
+        owners.insert(0, 'owner', counts.drop_duplicates('possession').set_index('possession')['team'])
+        return owners
+
+    def calculate_possession(self, events, home_team, away_team, context=None):
         if 'possession' not in events.columns:
-            possession_events = events[events['type'].isin(['Pass','Carry','Dribble'])]
-            h = possession_events[possession_events['team'] == home_team].shape[0]
-            a = possession_events[possession_events['team'] == away_team].shape[0]
+            if context is not None:
+                # Pass/Carry/Dribble counts per team, read from the grouped summary
+                h = int(self._summary_total(context.summary, 'events', home_team, ['Pass', 'Carry', 'Dribble']))
+                a = int(self._summary_total(context.summary, 'events', away_team, ['Pass', 'Carry', 'Dribble']))
+            else:
+                possession_events = events[events['type'].isin(['Pass','Carry','Dribble'])]
+                h = possession_events[possession_events['team'] == home_team].shape[0]
+                a = possession_events[possession_events['team'] == away_team].shape[0]
             total = h + a
             if total == 0:
                 return {'home_team': {'possession_%': 50.0}, 'away_team': {'possession_%': 50.0}}
             return {'home_team': {'possession_%': round(h / total * 100, 1)},
                     'away_team': {'possession_%': round(a / total * 100, 1)}}
-        poss = events.groupby('possession')
-        owner = poss['team'].agg(lambda s: s.value_counts().idxmax())
-        sizes = poss.size()
-        owner_df = pd.DataFrame({'owner': owner, 'size': sizes})
+        owner_df = context.possession_owners if context is not None else self.possession_owners(events)
         home_events = owner_df[owner_df['owner'] == home_team]['size'].sum()
         away_events = owner_df[owner_df['owner'] == away_team]['size'].sum()
         total = home_events + away_events
@@ -160,35 +261,137 @@ class RefactoredWorldCupExtractor:
             'away_team': {'possession_%': round(away_events / total * 100, 1)}
         }
 
-    # ----------------- Passing -----------------
-    def compute_passing_breakdowns(self, events, team_name):
-        team_passes = events[(events['type'] == 'Pass') & (events['team'] == team_name)].copy()
-        total_passes = int(len(team_passes))
-        completed_passes = int(team_passes['pass_outcome'].isna().sum()) if 'pass_outcome' in team_passes.columns else 0
-        dir_sign = self.infer_team_direction(events, team_name)
-        start_x = team_passes['location'].apply(lambda c: self.safe_coord(c, 0) if 'location' in team_passes.columns else np.nan)
-        end_x = team_passes['pass_end_location'].apply(lambda c: self.safe_coord(c, 0) if 'pass_end_location' in team_passes.columns else np.nan)
-        prog_mask = (end_x.notna()) & (start_x.notna()) & (((end_x - start_x) * dir_sign) >= 10)
-        progressive_passes = int((team_passes['pass_outcome'].isna() & prog_mask).sum()) if 'pass_outcome' in team_passes.columns else int(prog_mask.sum())
-        third_boundary = self.pitch_length * 2 / 3
-        if dir_sign == 1:
-            final_third_mask = start_x >= third_boundary
-            penalty_area_mask = start_x >= (self.pitch_length - 18)
+    # ----------------- Grouped event summary -----------------
+    SUMMARY_KEYS = ['team', 'type', 'outcome']
+
+    def kept_shots(self, events):
+        """Mask of the shots counted in the attacking stats (and drawn on shot maps):
+        minute <= 120 and the first shot of each (team, minute, period).
+        """
+        shot_kept = np.array(events['type'] == 'Shot', dtype=bool) if 'type' in events.columns else np.zeros(len(events), dtype=bool)
+        if 'minute' in events.columns:
+            shot_kept &= (events['minute'].astype(float) <= 120).to_numpy()
+            if 'team' in events.columns:
+                subset_cols = ['team', 'minute'] + (['period'] if 'period' in events.columns else [])
+                kept_idx = np.flatnonzero(shot_kept)
+                dup = events.iloc[kept_idx][subset_cols].duplicated(keep='first').to_numpy()
+                shot_kept[kept_idx[dup]] = False
+        return shot_kept
+
+    def summarize_events(self, events, context=None):
+        """Aggregate the events of a match in a single grouped pass keyed by (team, type, outcome).
+        Every per-event mask used by the metric groups (progressive passes, crosses, kept shots,
+        high pressures, ...) is built once for the whole frame and summed inside the groupby, so the
+        compute_* methods read their numbers from this small table instead of re-filtering events.
+        `outcome` is `pass_outcome` for passes, `shot_outcome` for shots and NaN otherwise.
+        With a `context`, the team directions and kept shots are read from it instead of recomputed.
+        """
+        events = self.ensure_coordinates(events)
+        n = len(events)
+        etype = events['type'] if 'type' in events.columns else pd.Series(np.nan, index=events.index, dtype=object)
+        team = events['team'] if 'team' in events.columns else pd.Series(np.nan, index=events.index, dtype=object)
+        is_pass = (etype == 'Pass').to_numpy()
+        is_shot = (etype == 'Shot').to_numpy()
+
+        outcome = pd.Series(np.nan, index=events.index, dtype=object)
+        if 'pass_outcome' in events.columns:
+            outcome = outcome.mask(is_pass, events['pass_outcome'])
+        if 'shot_outcome' in events.columns:
+            outcome = outcome.mask(is_shot, events['shot_outcome'])
+
+        has_loc = (events['location_x'].notna() & events['location_y'].notna()).to_numpy()
+        has_end = (events['pass_end_location_x'].notna() & events['pass_end_location_y'].notna()).to_numpy()
+        start_x = events['location_x'].to_numpy(dtype=float)
+        start_y = events['location_y'].to_numpy(dtype=float)
+        end_x = events['pass_end_location_x'].to_numpy(dtype=float)
+
+        if context is not None:
+            directions = context.directions
         else:
-            final_third_mask = start_x <= (self.pitch_length / 3)
-            penalty_area_mask = start_x <= 18
-        final_third_passes = int(team_passes[final_third_mask].shape[0])
-        penalty_area_passes = int(team_passes[penalty_area_mask].shape[0])
-        crosses_attempted = 0
-        crosses_completed = 0
-        if 'pass_cross' in team_passes.columns:
-            crosses = team_passes[team_passes['pass_cross'] == True]
-            crosses_attempted = int(len(crosses))
-            crosses_completed = int(crosses['pass_outcome'].isna().sum()) if 'pass_outcome' in crosses.columns else int(crosses.shape[0])
+            # team forward direction (same rule as infer_team_direction, for every team at once)
+            valid = is_pass & has_loc & has_end
+            diffs = pd.Series(end_x - start_x)[valid].groupby(team.to_numpy()[valid]).agg(['mean', 'size'])
+            directions = dict(zip(diffs.index, np.where((diffs['size'] >= 10) & (diffs['mean'] < 0), -1, 1)))
+        dir_sign = team.map(directions).fillna(1).to_numpy(dtype=float)
+        forward = dir_sign == 1
+
+        # passing masks
+        progressive = is_pass & ~np.isnan(start_x) & ~np.isnan(end_x) & (((end_x - start_x) * dir_sign) >= 10)
+        with np.errstate(invalid='ignore'):
+            final_third = is_pass & np.where(forward, start_x >= self.pitch_length * 2 / 3, start_x <= self.pitch_length / 3)
+            penalty_area = is_pass & np.where(forward, start_x >= self.pitch_length - 18, start_x <= 18)
+            if 'pass_cross' in events.columns:
+                cross = is_pass & (events['pass_cross'] == True).to_numpy()
+            else:
+                cross = is_pass & has_loc & ((start_y < 20) | (start_y > self.pitch_width - 20))
+            # defensive / goalkeeper masks
+            high_pressure = (etype == 'Pressure').to_numpy() & has_loc & (start_x > self.pitch_length * 2 / 3)
+            sweeper = etype.isin(['Pressure', 'Tackle', 'Interception']).to_numpy() & has_loc & (start_x < self.pitch_length - 18)
+        if 'position' in events.columns:
+            sweeper = sweeper & events['position'].astype(str).str.contains('Goalkeeper', na=False).to_numpy()
         else:
-            wide_mask = team_passes['location'].apply(lambda x: isinstance(x, (list, tuple)) and len(x) >= 2 and (x[1] < 20 or x[1] > (self.pitch_width - 20))) if 'location' in team_passes.columns else pd.Series(False, index=team_passes.index)
-            crosses_attempted = int(wide_mask.sum())
-            crosses_completed = int((wide_mask & team_passes['pass_outcome'].isna()).sum()) if 'pass_outcome' in team_passes.columns else int(wide_mask.sum())
+            sweeper = np.zeros(n, dtype=bool)
+
+        shot_kept = context.kept_shots if context is not None else self.kept_shots(events)
+
+        xg = events['shot_statsbomb_xg'].fillna(0).astype(float).to_numpy() * is_shot if 'shot_statsbomb_xg' in events.columns else np.zeros(n)
+        psxg = events['shot_statsbomb_psxg'].fillna(0).astype(float).to_numpy() * is_shot if 'shot_statsbomb_psxg' in events.columns else np.zeros(n)
+        key_pass = is_pass & (events['pass_shot_assist'] == True).to_numpy() if 'pass_shot_assist' in events.columns else np.zeros(n, dtype=bool)
+        aerial_won = (events['aerial_won'] == True).to_numpy() if 'aerial_won' in events.columns else np.zeros(n, dtype=bool)
+        card_col = 'bad_behaviour_card' if 'bad_behaviour_card' in events.columns else ('card' if 'card' in events.columns else None)
+        yellow = (events[card_col] == 'Yellow Card').to_numpy() if card_col else np.zeros(n, dtype=bool)
+        red = (events[card_col] == 'Red Card').to_numpy() if card_col else np.zeros(n, dtype=bool)
+
+        frame = pd.DataFrame({
+            'team': team.to_numpy(),
+            'type': etype.to_numpy(),
+            'outcome': outcome.to_numpy(),
+            'events': np.ones(n, dtype=np.int64),
+            'xg': xg,
+            'psxg': psxg,
+            'shots_kept': shot_kept.astype(np.int64),
+            'xg_kept': xg * shot_kept,
+            'progressive': progressive.astype(np.int64),
+            'final_third': final_third.astype(np.int64),
+            'penalty_area': penalty_area.astype(np.int64),
+            'crosses': cross.astype(np.int64),
+            'key_passes': key_pass.astype(np.int64),
+            'high_pressures': high_pressure.astype(np.int64),
+            'sweeper_actions': sweeper.astype(np.int64),
+            'aerial_won': aerial_won.astype(np.int64),
+            'yellow_cards': yellow.astype(np.int64),
+            'red_cards': red.astype(np.int64),
+        })
+        return frame.groupby(self.SUMMARY_KEYS, dropna=False, sort=False).sum().reset_index()
+
+    def _summary_total(self, summary, column, team=None, types=None, outcomes=None, exclude_team=None):
+        """Sum `column` of the grouped summary over the rows matching the given keys."""
+        mask = np.ones(len(summary), dtype=bool)
+        if team is not None:
+            mask &= (summary['team'] == team).to_numpy()
+        if exclude_team is not None:
+            mask &= (summary['team'] != exclude_team).to_numpy()
+        if types is not None:
+            mask &= summary['type'].isin([types] if isinstance(types, str) else types).to_numpy()
+        if outcomes is not None:
+            if outcomes == 'missing':
+                mask &= summary['outcome'].isna().to_numpy()
+            else:
+                mask &= summary['outcome'].isin(outcomes).to_numpy()
+        return summary.loc[mask, column].sum()
+
+    # ----------------- Passing -----------------
+    def compute_passing_breakdowns(self, events, team_name, summary=None, context=None):
+        if summary is None:
+            summary = (context or self.match_context(events)).summary
+        has_outcome = 'pass_outcome' in events.columns
+        total_passes = int(self._summary_total(summary, 'events', team_name, 'Pass'))
+        completed_passes = int(self._summary_total(summary, 'events', team_name, 'Pass', 'missing')) if has_outcome else 0
+        progressive_passes = int(self._summary_total(summary, 'progressive', team_name, 'Pass', 'missing' if has_outcome else None))
+        final_third_passes = int(self._summary_total(summary, 'final_third', team_name, 'Pass'))
+        penalty_area_passes = int(self._summary_total(summary, 'penalty_area', team_name, 'Pass'))
+        crosses_attempted = int(self._summary_total(summary, 'crosses', team_name, 'Pass'))
+        crosses_completed = int(self._summary_total(summary, 'crosses', team_name, 'Pass', 'missing' if has_outcome else None))
         cross_success_rate = round((crosses_completed / crosses_attempted * 100) if crosses_attempted > 0 else 0.0, 1)
         accuracy = round((completed_passes / total_passes * 100) if total_passes > 0 else 0.0, 1)
         return {
@@ -204,43 +407,23 @@ class RefactoredWorldCupExtractor:
         }
 
     # ----------------- Attacking / Shots (safe xG and dedup) -----------------
-    def compute_shot_stats(self, events, team_name):
-        ev = events.copy()
-        # consider only main match periods
-        # exclude shootout artifacts (clean_events will usually handle it if called earlier)
-        team_shots = ev[(ev['type'] == 'Shot') & (ev['team'] == team_name)].copy()
-        # exclude minute>120 if present
-        if 'minute' in team_shots.columns:
-            team_shots = team_shots[team_shots['minute'].astype(float) <= 120]
-        # deduplicate obvious duplicates - exclude 'location' from subset as it contains lists
-        if 'minute' in team_shots.columns and 'team' in team_shots.columns:
-            subset_cols = ['team', 'minute']
-            if 'period' in team_shots.columns:
-                subset_cols.append('period')
-            # Only deduplicate if there are shots and necessary columns are present
-            if len(team_shots) > 0 and all(col in team_shots.columns for col in subset_cols):
-                team_shots = team_shots.drop_duplicates(subset=subset_cols, keep='first')
-
-        total_shots = int(team_shots.shape[0])
-        shots_on_target = int(team_shots[team_shots['shot_outcome'].isin(['Saved','Goal'])].shape[0]) if 'shot_outcome' in team_shots.columns else 0
-        shots_blocked = int(team_shots[team_shots['shot_outcome'] == 'Blocked'].shape[0]) if 'shot_outcome' in team_shots.columns else 0
-        shots_off_target = int(team_shots[team_shots['shot_outcome'].isin(['Off T','Off Target','Wide'])].shape[0]) if 'shot_outcome' in team_shots.columns else 0
-        xg_values = team_shots['shot_statsbomb_xg'] if 'shot_statsbomb_xg' in team_shots.columns else pd.Series(dtype=float)
-        total_xg = float(xg_values.fillna(0).sum()) if len(xg_values) > 0 else 0.0
+    def compute_shot_stats(self, events, team_name, summary=None, context=None):
+        # shots after minute 120 and obvious (team, minute, period) duplicates are
+        # excluded through the `shots_kept` mask of the summary
+        if summary is None:
+            summary = (context or self.match_context(events)).summary
+        has_outcome = 'shot_outcome' in events.columns
+        total_shots = int(self._summary_total(summary, 'shots_kept', team_name, 'Shot'))
+        shots_on_target = int(self._summary_total(summary, 'shots_kept', team_name, 'Shot', ['Saved', 'Goal'])) if has_outcome else 0
+        shots_blocked = int(self._summary_total(summary, 'shots_kept', team_name, 'Shot', ['Blocked'])) if has_outcome else 0
+        shots_off_target = int(self._summary_total(summary, 'shots_kept', team_name, 'Shot', ['Off T', 'Off Target', 'Wide'])) if has_outcome else 0
+        total_xg = float(self._summary_total(summary, 'xg_kept', team_name, 'Shot'))
         avg_xg_per_shot = round((total_xg / total_shots) if total_shots > 0 else 0.0, 3)
         key_passes = 0
-        if 'pass_shot_assist' in ev.columns:
-            key_passes = int(ev[(ev['team'] == team_name) & (ev['type'] == 'Pass') & (ev['pass_shot_assist'] == True)].shape[0])
+        if 'pass_shot_assist' in events.columns:
+            key_passes = int(self._summary_total(summary, 'key_passes', team_name, 'Pass'))
         else:
-            if 'possession' in ev.columns:
-                evi = ev.reset_index(drop=True)
-                for i in range(len(evi)-1):
-                    row = evi.loc[i]
-                    nxt = evi.loc[i+1]
-                    if row['team'] == team_name and row['type'] == 'Pass' and nxt['type'] == 'Shot' and nxt['team'] == team_name and row.get('possession') == nxt.get('possession'):
-                        key_passes += 1
-            else:
-                key_passes = int(total_shots * 0.05)
+            key_passes = self._key_passes_from_sequence(events, team_name)
         return {
             'total_shots': total_shots,
             'shots_on_target': shots_on_target,
@@ -251,44 +434,39 @@ class RefactoredWorldCupExtractor:
             'key_passes': key_passes
         }
 
+    def _key_passes_from_sequence(self, events, team_name):
+        """Fallback when `pass_shot_assist` is missing: a pass immediately followed by a shot of the same team (in the same possession, when known)."""
+        is_team = (events['team'] == team_name).to_numpy()
+        types = events['type'].to_numpy()
+        # compare every event with the next one through shifted arrays
+        followed_by_shot = is_team[:-1] & (types[:-1] == 'Pass') & is_team[1:] & (types[1:] == 'Shot')
+        if 'possession' in events.columns:
+            possession = events['possession'].to_numpy()
+            followed_by_shot &= possession[:-1] == possession[1:]
+        return int(followed_by_shot.sum())
+
     # ----------------- Defensive -----------------
-    def compute_defensive(self, events, team_name):
-        team_events = events[events['team'] == team_name].copy()
-        pressures = int(team_events[team_events['type'] == 'Pressure'].shape[0])
-        high_pressures = int(team_events[(team_events['type'] == 'Pressure') & (team_events['location'].apply(lambda x: isinstance(x, (list, tuple)) and len(x) >= 2 and x[0] > (self.pitch_length * 2 / 3) if 'location' in team_events.columns else False))].shape[0]) if 'type' in team_events.columns else 0
-        tackles = int(team_events[team_events['type'] == 'Tackle'].shape[0])
-        interceptions = int(team_events[team_events['type'] == 'Interception'].shape[0])
-        ball_recoveries = int(team_events[team_events['type'] == 'Ball Recovery'].shape[0])
-        blocks = int(team_events[team_events['type'] == 'Block'].shape[0])
-        clearances = int(team_events[team_events['type'] == 'Clearance'].shape[0])
-        opponent_shots = events[(events['type'] == 'Shot') & (events['team'] != team_name)]
-        xga = float(opponent_shots['shot_statsbomb_xg'].fillna(0).sum()) if 'shot_statsbomb_xg' in opponent_shots.columns else 0.0
+    def compute_defensive(self, events, team_name, summary=None, context=None):
+        if summary is None:
+            summary = (context or self.match_context(events)).summary
+        pressures = int(self._summary_total(summary, 'events', team_name, 'Pressure'))
+        high_pressures = int(self._summary_total(summary, 'high_pressures', team_name, 'Pressure'))
+        tackles = int(self._summary_total(summary, 'events', team_name, 'Tackle'))
+        interceptions = int(self._summary_total(summary, 'events', team_name, 'Interception'))
+        ball_recoveries = int(self._summary_total(summary, 'events', team_name, 'Ball Recovery'))
+        blocks = int(self._summary_total(summary, 'events', team_name, 'Block'))
+        clearances = int(self._summary_total(summary, 'events', team_name, 'Clearance'))
+        xga = float(self._summary_total(summary, 'xg', types='Shot', exclude_team=team_name))
         pressing_success = 0.0
-        if pressures > 0 and 'possession' in team_events.columns:
-            poss = team_events.groupby('possession')
-            successful = 0
-            total = 0
-            for pid, grp in poss:
-                p_count = grp[grp['type'] == 'Pressure'].shape[0]
-                if p_count > 0:
-                    total += p_count
-                    successful += grp[grp['type'] == 'Ball Recovery'].shape[0]
-            if total > 0:
-                pressing_success = min(successful / total * 100, 100.0)
-        aerial_duels_won = 0
-        if 'aerial_won' in team_events.columns:
-            aerial_duels_won = int(team_events[team_events['aerial_won'] == True].shape[0])
+        if pressures > 0 and 'possession' in events.columns:
+            pressing_success = self._pressing_success(events, team_name, context=context)
+        if 'aerial_won' in events.columns:
+            aerial_duels_won = int(self._summary_total(summary, 'aerial_won', team_name))
         else:
-            aerial_duels_won = int(team_events[team_events['type'] == 'Duel'].shape[0])
-        fouls_committed = int(team_events[team_events['type'] == 'Foul Committed'].shape[0])
-        yellow_cards = 0
-        red_cards = 0
-        if 'bad_behaviour_card' in team_events.columns:
-            yellow_cards = int(team_events[team_events['bad_behaviour_card'] == 'Yellow Card'].shape[0])
-            red_cards = int(team_events[team_events['bad_behaviour_card'] == 'Red Card'].shape[0])
-        elif 'card' in team_events.columns:
-            yellow_cards = int(team_events[team_events['card'] == 'Yellow Card'].shape[0])
-            red_cards = int(team_events[team_events['card'] == 'Red Card'].shape[0])
+            aerial_duels_won = int(self._summary_total(summary, 'events', team_name, 'Duel'))
+        fouls_committed = int(self._summary_total(summary, 'events', team_name, 'Foul Committed'))
+        yellow_cards = int(self._summary_total(summary, 'yellow_cards', team_name))
+        red_cards = int(self._summary_total(summary, 'red_cards', team_name))
         return {
             'pressures': pressures,
             'high_pressures': high_pressures,
@@ -305,26 +483,36 @@ class RefactoredWorldCupExtractor:
             'red_cards': red_cards
         }
 
+    def _pressing_success(self, events, team_name, context=None):
+        """Ball recoveries per pressure, over the team's possessions that contain at least one pressure."""
+        team_actions = (context or self.match_context(events)).possession_team_actions
+        counts = team_actions[team_actions.index.get_level_values('team') == team_name]
+        counts = counts[counts['pressures'] > 0]
+        total = int(counts['pressures'].sum())
+        successful = int(counts['recoveries'].sum())
+        if total > 0:
+            return min(successful / total * 100, 100.0)
+        return 0.0
+
     # ----------------- Goalkeeper -----------------
-    def compute_goalkeeper(self, events, team_name):
-        opponent_shots = events[(events['type'] == 'Shot') & (events['team'] != team_name)].copy()
-        shots_on_target = opponent_shots[opponent_shots['shot_outcome'].isin(['Saved', 'Goal'])] if 'shot_outcome' in opponent_shots.columns else opponent_shots
-        shots_faced = int(shots_on_target.shape[0])
-        saves = int(opponent_shots[opponent_shots.get('shot_outcome', '') == 'Saved'].shape[0]) if 'shot_outcome' in opponent_shots.columns else 0
-        goals_conceded = int(opponent_shots[opponent_shots.get('shot_outcome', '') == 'Goal'].shape[0]) if 'shot_outcome' in opponent_shots.columns else 0
+    def compute_goalkeeper(self, events, team_name, summary=None, context=None):
+        if summary is None:
+            summary = (context or self.match_context(events)).summary
+        if 'shot_outcome' in events.columns:
+            on_target = ['Saved', 'Goal']
+            saves = int(self._summary_total(summary, 'events', types='Shot', outcomes=['Saved'], exclude_team=team_name))
+            goals_conceded = int(self._summary_total(summary, 'events', types='Shot', outcomes=['Goal'], exclude_team=team_name))
+        else:
+            on_target = None
+            saves = 0
+            goals_conceded = 0
+        shots_faced = int(self._summary_total(summary, 'events', types='Shot', outcomes=on_target, exclude_team=team_name))
         clean_sheets = 1 if goals_conceded == 0 else 0
-        xg_faced = float(shots_on_target['shot_statsbomb_xg'].fillna(0).sum()) if 'shot_statsbomb_xg' in shots_on_target.columns else 0.0
+        xg_faced = float(self._summary_total(summary, 'xg', types='Shot', outcomes=on_target, exclude_team=team_name))
         goals_prevented = round(xg_faced - goals_conceded, 2)
-        post_shot_xg = float(shots_on_target['shot_statsbomb_psxg'].fillna(0).sum()) if 'shot_statsbomb_psxg' in shots_on_target.columns else xg_faced
+        post_shot_xg = float(self._summary_total(summary, 'psxg', types='Shot', outcomes=on_target, exclude_team=team_name)) if 'shot_statsbomb_psxg' in events.columns else xg_faced
         psxg_plus_minus = round(goals_prevented, 2)
-
-        sweeper_actions = 0
-        try:
-            if 'position' in events.columns:
-                gk_events = events[(events['team'] == team_name) & events['position'].astype(str).str.contains('Goalkeeper', na=False)]
-                sweeper_actions = int(gk_events[(gk_events['type'].isin(['Pressure', 'Tackle', 'Interception'])) & (gk_events['location'].apply(lambda x: isinstance(x, (list, tuple)) and len(x) >= 2 and x[0] < (self.pitch_length - 18) if 'location' in gk_events.columns else False))].shape[0])
-        except Exception:
-            sweeper_actions = 0
+        sweeper_actions = int(self._summary_total(summary, 'sweeper_actions', team_name))
         return {
             'saves': saves,
             'shots_faced': shots_faced,
@@ -337,46 +525,84 @@ class RefactoredWorldCupExtractor:
         }
 
     # ----------------- Transition & Efficiency -----------------
-    def compute_transition(self, events, team_name):
+    def possession_segments(self, events):
+        """One row per possession (indexed by possession id), computed with vectorized groupbys:
+        owner (most frequent team, ties to the alphabetically first), start_index/end_index (positions
+        in `events`), start_x/end_x (x of the first/last event), n_events, ended_in_shot and has_pressure.
+        """
+        columns = ['owner', 'start_index', 'end_index', 'start_x', 'end_x', 'n_events', 'ended_in_shot', 'has_pressure']
+        if 'possession' not in events.columns:
+            return pd.DataFrame(columns=columns)
+        events = self.ensure_coordinates(events)
+        valid = events['possession'].notna().to_numpy()
+        rows = np.flatnonzero(valid)
+        possession = events['possession'].to_numpy()[valid]
+        etype = events['type'].to_numpy()[valid]
+        grouped = pd.Series(rows).groupby(possession)
+        segments = pd.DataFrame({
+            'start_index': grouped.min(),
+            'end_index': grouped.max(),
+            'n_events': grouped.size()
+        })
+        location_x = events['location_x'].to_numpy(dtype=float)
+        types = events['type'].to_numpy()
+        segments['start_x'] = location_x[segments['start_index'].to_numpy()]
+        segments['end_x'] = location_x[segments['end_index'].to_numpy()]
+        segments['ended_in_shot'] = types[segments['end_index'].to_numpy()] == 'Shot'
+        segments['has_pressure'] = pd.Series(etype == 'Pressure').groupby(possession).any()
+        # owner: the team with most events in the possession (ties -> alphabetically first, like Series.mode)
+        team = events['team'].to_numpy()[valid]
+        counts = pd.DataFrame({'possession': possession, 'team': team}).dropna()
+        counts = counts.groupby(['possession', 'team']).size().rename('n').reset_index()
+        counts = counts.sort_values(['possession', 'n', 'team'], ascending=[True, False, True])
+        segments['owner'] = counts.drop_duplicates('possession').set_index('possession')['team']
+        return segments[columns]
+
+    def possession_team_actions(self, events):
+        """Pressures, shots and ball recoveries of every team in every possession, indexed by (possession, team)."""
+        if 'possession' not in events.columns:
+            return pd.DataFrame(columns=['pressures', 'shots', 'recoveries'])
+        frame = pd.DataFrame({
+            'possession': events['possession'].to_numpy(),
+            'team': events['team'].to_numpy(),
+            'pressures': (events['type'] == 'Pressure').to_numpy(),
+            'shots': (events['type'] == 'Shot').to_numpy(),
+            'recoveries': (events['type'] == 'Ball Recovery').to_numpy()
+        })
+        return frame.groupby(['possession', 'team']).sum()
+
+    def compute_transition(self, events, team_name, segments=None, team_actions=None, context=None):
         counter_attacks = 0
         counter_attack_shots = 0
         press_to_attack = 0.0
         if 'possession' in events.columns:
-            poss_groups = events.groupby('possession')
-            dir_sign = self.infer_team_direction(events, team_name)
-            for pid, grp in poss_groups:
-                owner = grp['team'].mode().iat[0]
-                if owner != team_name:
-                    continue
-                n_events = len(grp)
-                start_x_val = grp.iloc[0].get('location', [np.nan, np.nan])
-                start_x = start_x_val[0] if isinstance(start_x_val, list) and len(start_x_val) >= 1 else np.nan
-                end_x_val = grp.iloc[-1].get('location', [np.nan, np.nan])
-                end_x = end_x_val[0] if isinstance(end_x_val, list) and len(end_x_val) >= 1 else np.nan
-                if pd.notna(start_x):
-                    if dir_sign == 1:
-                        defensive_third = start_x <= (self.pitch_length / 3)
-                        opponent_final_third = pd.notna(end_x) and end_x >= (self.pitch_length * 2 / 3)
-                    else:
-                        defensive_third = start_x >= (self.pitch_length * 2 / 3)
-                        opponent_final_third = pd.notna(end_x) and end_x <= (self.pitch_length / 3)
+            context = context or self.match_context(events)
+            if segments is None:
+                segments = context.possession_segments
+            if team_actions is None:
+                team_actions = context.possession_team_actions
+            dir_sign = context.direction(team_name)
+            own = segments[segments['owner'] == team_name]
+            start_x = own['start_x'].to_numpy(dtype=float)
+            end_x = own['end_x'].to_numpy(dtype=float)
+            with np.errstate(invalid='ignore'):
+                if dir_sign == 1:
+                    defensive_third = start_x <= (self.pitch_length / 3)
+                    opponent_final_third = end_x >= (self.pitch_length * 2 / 3)
                 else:
-                    defensive_third = False
-                    opponent_final_third = False
-                if defensive_third and n_events <= 6:
-                    if grp.iloc[-1]['type'] == 'Shot':
-                        counter_attacks += 1
-                        counter_attack_shots += 1
-                    elif opponent_final_third:
-                        counter_attacks += 1
-            team_events = events[events['team'] == team_name]
-            press_pos = team_events[team_events['type'] == 'Pressure']['possession'].dropna().unique()
-            successful = 0
-            for pid in press_pos:
-                g = events[events['possession'] == pid]
-                if any((g['team'] == team_name) & (g['type'] == 'Shot')):
-                    successful += 1
-            press_to_attack = round(min((successful / len(press_pos) * 100) if len(press_pos) > 0 else 0.0, 100.0), 1)
+                    defensive_third = start_x >= (self.pitch_length * 2 / 3)
+                    opponent_final_third = end_x <= (self.pitch_length / 3)
+            fast = defensive_third & (own['n_events'].to_numpy() <= 6)
+            ended_in_shot = own['ended_in_shot'].to_numpy(dtype=bool)
+            counter_attack_shots = int((fast & ended_in_shot).sum())
+            counter_attacks = counter_attack_shots + int((fast & ~ended_in_shot & opponent_final_third).sum())
+            # press -> attack: possessions where the team pressed, and how many of them it also shot in
+            if len(team_actions) > 0:
+                team_rows = team_actions[team_actions.index.get_level_values('team') == team_name]
+                pressed = team_rows['pressures'].to_numpy() > 0
+                n_pressed = int(pressed.sum())
+                successful = int((pressed & (team_rows['shots'].to_numpy() > 0)).sum())
+                press_to_attack = round(min((successful / n_pressed * 100) if n_pressed > 0 else 0.0, 100.0), 1)
         return {
             'counter_attacks': int(counter_attacks),
             'counter_attack_shots': int(counter_attack_shots),
@@ -385,15 +611,16 @@ class RefactoredWorldCupExtractor:
             'press_to_attack_conversion': press_to_attack
         }
 
-    def compute_efficiency(self, events, team_name, opponent_name):
-        team_shots = events[(events['type'] == 'Shot') & (events['team'] == team_name)]
-        opponent_shots = events[(events['type'] == 'Shot') & (events['team'] == opponent_name)]
-        goals_scored = int(team_shots[team_shots.get('shot_outcome', '') == 'Goal'].shape[0]) if 'shot_outcome' in team_shots.columns else 0
-        goals_conceded = int(opponent_shots[opponent_shots.get('shot_outcome', '') == 'Goal'].shape[0]) if 'shot_outcome' in opponent_shots.columns else 0
-        total_shots = int(team_shots.shape[0])
+    def compute_efficiency(self, events, team_name, opponent_name, summary=None, context=None):
+        if summary is None:
+            summary = (context or self.match_context(events)).summary
+        has_outcome = 'shot_outcome' in events.columns
+        goals_scored = int(self._summary_total(summary, 'events', team_name, 'Shot', ['Goal'])) if has_outcome else 0
+        goals_conceded = int(self._summary_total(summary, 'events', opponent_name, 'Shot', ['Goal'])) if has_outcome else 0
+        total_shots = int(self._summary_total(summary, 'events', team_name, 'Shot'))
         conversion_rate = round((goals_scored / total_shots * 100) if total_shots > 0 else 0.0, 1)
-        team_xg = float(team_shots['shot_statsbomb_xg'].fillna(0).sum()) if 'shot_statsbomb_xg' in team_shots.columns else 0.0
-        opponent_xg = float(opponent_shots['shot_statsbomb_xg'].fillna(0).sum()) if 'shot_statsbomb_xg' in opponent_shots.columns else 0.0
+        team_xg = float(self._summary_total(summary, 'xg', team_name, 'Shot'))
+        opponent_xg = float(self._summary_total(summary, 'xg', opponent_name, 'Shot'))
         xg_vs_goals_diff = round(goals_scored - team_xg, 2)
         xga_vs_conceded_diff = round(goals_conceded - opponent_xg, 2)
         return {
@@ -404,66 +631,95 @@ class RefactoredWorldCupExtractor:
             'xga_vs_conceded_diff': xga_vs_conceded_diff
         }
 
+    def compute_match_metrics(self, events, home_team, away_team, context=None):
+        """Compute every metric category for both teams from one grouped summary of the events.
+        Every method reads its shared slices (summary, directions, possessions) from one `MatchContext`,
+        built here unless the caller passes the one of these events.
+        Returns {category: {'home_team': {...}, 'away_team': {...}}} for the categories of `flatten_match_data`.
+        """
+        stage = self.instrumentation.stage
+        if context is None:
+            context = self.match_context(events)
+        events = context.events
+        # build the shared slices under their own timers; the methods below read them from the context
+        with stage('metrics.summary'):
+            context.summary
+        with stage('metrics.possession_segments'):
+            context.possession_segments
+            context.possession_team_actions
+        teams = {'home_team': (home_team, away_team), 'away_team': (away_team, home_team)}
+        with stage('metrics.possession'):
+            metrics = {
+                'possession': self.calculate_possession(events, home_team, away_team, context=context),
+                'passing': {},
+                'attacking': {},
+                'defensive': {},
+                'goalkeeper': {},
+                'transition': {},
+                'efficiency': {}
+            }
+        groups = {
+            'passing': lambda team, opponent: self.compute_passing_breakdowns(events, team, context=context),
+            'attacking': lambda team, opponent: self.compute_shot_stats(events, team, context=context),
+            'defensive': lambda team, opponent: self.compute_defensive(events, team, context=context),
+            'goalkeeper': lambda team, opponent: self.compute_goalkeeper(events, team, context=context),
+            'transition': lambda team, opponent: self.compute_transition(events, team, context=context),
+            'efficiency': lambda team, opponent: self.compute_efficiency(events, team, opponent, context=context)
+        }
+        for team_type, (team, opponent) in teams.items():
+            for group, compute in groups.items():
+                with stage(f'metrics.{group}', team=team):
+                    metrics[group][team_type] = compute(team, opponent)
+        return metrics
+
     # ----------------- Extraction & flattening -----------------
-    def extract_match_data(self, match_row, events):
+    def extract_match_data(self, match_row, events, context=None):
         """Compute all metric groups for a single match.
         `match_row` can be a pandas Series or dict having keys: match_id, match_date, home_team, away_team.
-        `events` must be the events DataFrame for that match.
+        `events` must be the events DataFrame for that match (and `context`, if given, its `match_context`).
         """
         match_id = match_row.get('match_id') if isinstance(match_row, dict) else match_row['match_id']
         match_date = match_row.get('match_date') if isinstance(match_row, dict) else match_row['match_date']
         home_team = match_row.get('home_team') if isinstance(match_row, dict) else match_row['home_team']
         away_team = match_row.get('away_team') if isinstance(match_row, dict) else match_row['away_team']
 
-        print(f"Processing: {home_team} vs {away_team} (Match ID: {match_id})")
+        if self.verbose:
+            print(f"Processing: {home_team} vs {away_team} (Match ID: {match_id})")
 
         # quick debug print of columns
-        if not hasattr(self, '_columns_printed'):
+        if self.verbose and not hasattr(self, '_columns_printed'):
             print("Event columns sample:", list(events.columns)[:40])
             print(f"Total events: {len(events)}")
             self._columns_printed = True
 
-        possession = self.calculate_possession(events, home_team, away_team)
-        passing = {
-            'home_team': self.compute_passing_breakdowns(events, home_team),
-            'away_team': self.compute_passing_breakdowns(events, away_team)
-        }
-        attacking = {
-            'home_team': self.compute_shot_stats(events, home_team),
-            'away_team': self.compute_shot_stats(events, away_team)
-        }
-        defensive = {
-            'home_team': self.compute_defensive(events, home_team),
-            'away_team': self.compute_defensive(events, away_team)
-        }
-        goalkeeper = {
-            'home_team': self.compute_goalkeeper(events, home_team),
-            'away_team': self.compute_goalkeeper(events, away_team)
-        }
-        transition = {
-            'home_team': self.compute_transition(events, home_team),
-            'away_team': self.compute_transition(events, away_team)
-        }
-        efficiency = {
-            'home_team': self.compute_efficiency(events, home_team, away_team),
-            'away_team': self.compute_efficiency(events, away_team, home_team)
-        }
+        metrics = self.compute_match_metrics(events, home_team, away_team, context=context)
 
         match_data = {
             'match_id': match_id,
             'match_date': match_date,
             'home_team_name': home_team,
             'away_team_name': away_team,
-            'possession': possession,
-            'passing': passing,
-            'attacking': attacking,
-            'defensive': defensive,
-            'goalkeeper': goalkeeper,
-            'transition': transition,
-            'efficiency': efficiency
+            # match clock at the final whistle (stoppage and extra time included), for per-90 rates
+            'minutes': round(match_end_minute(events), 1),
+            **metrics
         }
         return match_data
 
+    def output_schema(self):
+        """Ordered {column: Python type} of the rows produced by `flatten_match_data`,
+        derived by running the metric code on an empty match."""
+        empty = self.unpack_coordinates(pd.DataFrame({'type': pd.Series(dtype=object), 'team': pd.Series(dtype=object)}))
+        metrics = self.compute_match_metrics(empty, 'home', 'away')
+        row = self.flatten_match_data({
+            'match_id': 0,
+            'match_date': '',
+            'home_team_name': 'home',
+            'away_team_name': 'away',
+            'minutes': 0.0,
+            **metrics
+        })[0]
+        return {column: type(value) for column, value in row.items()}
+
     def flatten_match_data(self, match_data):
         rows = []
         for team_type in ['home_team', 'away_team']:
@@ -472,7 +728,8 @@ class RefactoredWorldCupExtractor:
                 'match_date': match_data['match_date'],
                 'team_name': match_data[f'{team_type}_name'],
                 'team_type': team_type,
-                'opponent_name': match_data['away_team_name' if team_type == 'home_team' else 'home_team_name']
+                'opponent_name': match_data['away_team_name' if team_type == 'home_team' else 'home_team_name'],
+                'minutes': match_data['minutes']
             }
             # possession is a top-level category with team keys
             row.update({f"possession_{k}": v for k, v in match_data['possession'][team_type].items()})
@@ -485,38 +742,205 @@ class RefactoredWorldCupExtractor:
         return rows
 
     # ----------------- Batch processing -----------------
-    def process_all_matches(self, save_csv=None, only_group_stage=False, max_matches=None):
+    # Bump whenever a metric changes: incremental runs then recompute every match.
+    METRICS_VERSION = 4
+
+    @staticmethod
+    def _match_stamp(match_row):
+        """`last_updated` of a match as listed by `sb.matches`, or None if StatsBomb does not provide it."""
+        stamp = match_row.get('last_updated')
+        return None if stamp is None or pd.isna(stamp) else str(stamp)
+
+    def events_hash(self, events):
+        """Fingerprint of a match's source events, used by incremental runs to detect changed data."""
+        return hashlib.sha1(events.to_json(orient='split', default_handler=str).encode('utf-8')).hexdigest()
+
+    def extract_match_rows(self, match_row, known_hash=None, track_changes=False):
+        """Fetch, clean and extract a single match. Returns (rows, events_hash):
+        - rows: the two flattened rows, or None if the match has no events (or, with `track_changes`,
+          if its events still hash to `known_hash`, i.e. the previous rows are up to date)
+        - events_hash: hash of the fetched events when `track_changes` is set, else None
+        """
+        instrumentation = self.instrumentation
+        with instrumentation.stage('match', match_id=match_row['match_id']):
+            events = self.get_match_events(match_row['match_id'])
+            if events is None:
+                instrumentation.increment('matches_skipped')
+                return None, None
+            events_hash = self.events_hash(events) if track_changes else None
+            if track_changes and known_hash is not None and events_hash == known_hash:
+                instrumentation.increment('matches_skipped')
+                return None, events_hash
+            # Clean events first (remove shootout/post-120, dedupe)
+            with instrumentation.stage('clean'):
+                cleaned = self.clean_events(events)
+            context = self.match_context(cleaned)
+            if self.event_store is not None:
+                with instrumentation.stage('event_store'):
+                    self.event_store.write_match(cleaned, self.competition_id, self.season_id, match_row['match_id'])
+            match_data = self.extract_match_data(match_row, cleaned, context=context)
+            rows = self.flatten_match_data(match_data)
+            instrumentation.increment('events_processed', len(events))
+            instrumentation.increment('matches_extracted')
+            return rows, events_hash
+
+    def iter_match_rows(self, match_rows, workers=None, ordered=True, known_hashes=None):
+        """Yield (match_row, rows, events_hash) for every match in `match_rows`.
+        - workers: None or 1 processes the matches one at a time in this process; N > 1 fans them out
+          to a pool of N processes (0 uses every CPU)
+        - ordered: with a pool, yield in input order (True) or as soon as each match finishes (False)
+        - known_hashes: {match_id: events_hash} of up-to-date matches; when given, events are hashed
+          and unchanged matches are yielded with rows=None instead of being extracted again
+        A failing match is reported with its traceback and skipped; matches without events are skipped.
+        """
+        track_changes = known_hashes is not None
+        known_hashes = known_hashes or {}
+        if workers is None or workers == 1:
+            for match_row in match_rows:
+                try:
+                    rows, events_hash = self.extract_match_rows(
+                        match_row, known_hashes.get(match_row['match_id']), track_changes)
+                except Exception as e:
+                    self.instrumentation.increment('matches_failed')
+                    print(f"Error processing match {match_row.get('match_id')}: {e}")
+                    traceback.print_exc()
+                    continue
+                if rows is not None or events_hash is not None:
+                    yield match_row, rows, events_hash
+            return
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            futures = self.submit_match_rows(executor, match_rows, known_hashes if track_changes else None)
+            yield from self.collect_match_rows(futures, ordered=ordered)
+
+    def submit_match_rows(self, executor, match_rows, known_hashes=None):
+        """Queue the extraction of every match in `match_rows` on a process pool and return
+        {future: match_row} for `collect_match_rows` (`known_hashes` as in `iter_match_rows`).
+        Extractors of several competition-seasons can share one pool this way.
+        """
+        track_changes = known_hashes is not None
+        known_hashes = known_hashes or {}
+        return {
+            executor.submit(_extract_match_rows_worker, self, match_row,
+                            known_hashes.get(match_row['match_id']), track_changes): match_row
+            for match_row in match_rows
+        }
+
+    def collect_match_rows(self, futures, ordered=True):
+        """Yield (match_row, rows, events_hash) for the futures of `submit_match_rows`, in submission
+        order or (`ordered=False`) as they finish, reporting failures like `iter_match_rows`."""
+        for future in (futures if ordered else as_completed(futures)):
+            match_row = futures[future]
+            try:
+                result, error, worker_metrics = future.result()
+            except Exception as e:
+                # the worker process itself died (e.g. BrokenProcessPool)
+                result, error, worker_metrics = None, (str(e), traceback.format_exc()), None
+            self.instrumentation.merge(worker_metrics)
+            if error is not None:
+                self.instrumentation.increment('matches_failed')
+                print(f"Error processing match {match_row.get('match_id')}: {error[0]}")
+                print(error[1], end='', file=sys.stderr)
+                continue
+            rows, events_hash = result
+            if rows is not None or events_hash is not None:
+                yield match_row, rows, events_hash
+
+    def process_all_matches(self, save_csv=None, only_group_stage=False, max_matches=None, workers=None, ordered=True,
+                            incremental=False, manifest_path=None, stream_to=None, resume=True):
         """Process all matches in the configured competition/season and optionally save to CSV.
         - save_csv: path to CSV file to write (if None, will not save)
         - only_group_stage: if True, filter matches to group stage only (useful to limit scope)
         - max_matches: if set, process only the first N matches (useful for testing)
-        Returns a DataFrame of flattened rows.
+        - workers: if > 1, extract matches in a pool of that many processes (0 = one per CPU)
+        - ordered: keep the serial row order when running in parallel (False = completion order)
+        - incremental: only extract matches that are new, whose events changed or whose rows were
+          produced by another METRICS_VERSION, and splice them into the existing `save_csv`; matches
+          whose `last_updated` stamp is unchanged are not even fetched, the others are fetched and
+          compared by events hash. Matches that fail keep their previous rows and are retried next run
+        - manifest_path: per-match manifest for incremental runs (default `<save_csv>.manifest.json`)
+        - stream_to: write each match's rows as soon as it is done to this CSV file (or, for a
+          `.parquet` path, directory of Parquet parts) instead of collecting them in memory
+        - resume: with stream_to, skip the matches already written there
+        Returns a DataFrame of flattened rows, or the `stream_to` path when streaming.
         """
+        if stream_to and (save_csv or incremental):
+            raise ValueError("stream_to cannot be combined with save_csv or incremental")
+        if incremental and not save_csv:
+            raise ValueError("incremental mode needs save_csv")
         matches = self.get_matches()
         if matches is None:
             return None
         # optional filtering
         if only_group_stage and 'stage_name' in matches.columns:
             matches = matches[matches['stage_name'].str.contains('Group', na=False)]
-        all_rows = []
+        match_rows = []
         for idx, match_row in matches.iterrows():
             if max_matches is not None and idx >= max_matches:
                 break
-            try:
-                match_id = match_row['match_id']
-                events = self.get_match_events(match_id)
-                if events is None:
+            match_rows.append(match_row)
+
+        if stream_to:
+            return self._stream_rows(match_rows, stream_to, resume, workers=workers, ordered=ordered)
+
+        known_hashes = None
+        existing = None
+        pending = match_rows
+        if incremental:
+            manifest_path = manifest_path or os.path.splitext(save_csv)[0] + '.manifest.json'
+            manifest = {}
+            if os.path.exists(save_csv) and os.path.exists(manifest_path):
+                existing = pd.read_csv(save_csv)
+                with open(manifest_path, encoding='utf-8') as f:
+                    manifest = json.load(f).get('matches', {})
+            extracted_ids = set(existing['match_id'].astype(str)) if existing is not None else set()
+            known_hashes = {}
+            pending = []
+            for match_row in match_rows:
+                entry = manifest.get(str(match_row['match_id']))
+                if (entry is None or str(match_row['match_id']) not in extracted_ids
+                        or entry.get('metrics_version') != self.METRICS_VERSION):
+                    pending.append(match_row)
                     continue
-                # Clean events first (remove shootout/post-120, dedupe)
-                cleaned = self.clean_events(events)
-                match_data = self.extract_match_data(match_row, cleaned)
-                rows = self.flatten_match_data(match_data)
-                all_rows.extend(rows)
-            except Exception as e:
-                print(f"Error processing match {match_row.get('match_id')}: {e}")
-                import traceback
-                traceback.print_exc()
+                stamp = self._match_stamp(match_row)
+                if stamp is not None and entry.get('last_updated') == stamp:
+                    continue
+                # no stamp, or a new one: fetch the events and only extract them if their hash changed
+                known_hashes[match_row['match_id']] = entry['events_hash']
+                pending.append(match_row)
+            self.instrumentation.increment('matches_skipped', len(match_rows) - len(pending))
+
+        all_rows = []
+        updated = {}
+        unchanged = {}
+        for match_row, rows, events_hash in self.iter_match_rows(pending, workers=workers, ordered=ordered,
+                                                                 known_hashes=known_hashes):
+            if incremental:
+                entry = {'events_hash': events_hash, 'metrics_version': self.METRICS_VERSION,
+                         'last_updated': self._match_stamp(match_row)}
+                (unchanged if rows is None else updated)[str(match_row['match_id'])] = entry
+            if rows is None:
                 continue
+            all_rows.extend(rows)
+
+        if incremental:
+            failed = len(pending) - len(updated) - len(unchanged)
+            print(f"{len(updated)} of {len(match_rows)} matches extracted, "
+                  f"{len(match_rows) - len(pending) + len(unchanged)} up to date, {failed} failed")
+            if failed:
+                print(f"The {failed} failed matches keep their previous rows (if any) and are retried on the next run")
+            df = self._splice_rows(existing, pd.DataFrame(all_rows), [m['match_id'] for m in match_rows])
+            if df.empty:
+                print("No rows extracted.")
+                return None
+            if updated or unchanged or existing is None:
+                write_atomic(save_csv, lambda path: df.to_csv(path, index=False))
+                # unchanged matches record their new last_updated stamp, so the next run skips them
+                manifest.update(unchanged)
+                manifest.update(updated)
+                write_atomic(manifest_path, lambda path: self._dump_manifest(manifest, path))
+                print(f"Saved {len(df)} rows to {save_csv}")
+            return df
+
         if not all_rows:
             print("No rows extracted.")
             return None
@@ -526,6 +950,45 @@ class RefactoredWorldCupExtractor:
             print(f"Saved {len(df)} rows to {save_csv}")
         return df
 
+    def _stream_rows(self, match_rows, path, resume, workers=None, ordered=True):
+        """Append each match's rows to `path` as soon as it is extracted (see `analysis.row_writer`)."""
+        writer = open_row_writer(path, self.output_schema())
+        written = writer.open(resume=resume)
+        pending = [match_row for match_row in match_rows if match_row['match_id'] not in written]
+        if written:
+            print(f"Resuming: {len(match_rows) - len(pending)} matches already in {path}")
+        n_rows = 0
+        try:
+            for match_row, rows, _ in self.iter_match_rows(pending, workers=workers, ordered=ordered):
+                writer.write_match(rows)
+                n_rows += len(rows)
+        finally:
+            writer.close()
+        print(f"Saved {n_rows} rows to {path}")
+        return path
+
+    @staticmethod
+    def _dump_manifest(manifest, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'matches': manifest}, f, indent=2, sort_keys=True)
+
+    @staticmethod
+    def _splice_rows(existing, new_rows, match_order):
+        """Replace the rows of re-extracted matches in `existing` and sort matches like a full run
+        (the order of `match_order`, unknown match_ids last), keeping home before away within a match."""
+        if existing is None or existing.empty:
+            df = new_rows
+        elif new_rows.empty:
+            df = existing
+        else:
+            stale = existing['match_id'].isin(new_rows['match_id'])
+            df = pd.concat([existing[~stale], new_rows], ignore_index=True)
+        if df.empty:
+            return df
+        position = {match_id: i for i, match_id in enumerate(match_order)}
+        order = df['match_id'].map(position).fillna(len(position))
+        return df.iloc[np.argsort(order.to_numpy(), kind='stable')].reset_index(drop=True)
+
     def process_single_match(self, match_id=None, match_row=None, save_csv=None):
         """Process a single match by match_id (or supply match_row dict/Series) and return DataFrame for two teams.
         If match_id provided, this will fetch events via statsbombpy.
@@ -533,13 +996,14 @@ class RefactoredWorldCupExtractor:
         if match_row is None:
             if match_id is None:
                 raise ValueError("Provide match_id or match_row")
-            matches = sb.matches(competition_id=self.competition_id, season_id=self.season_id)
+            matches = self._client().matches(competition_id=self.competition_id, season_id=self.season_id)
             match_row = matches[matches['match_id'] == match_id].iloc[0].to_dict()
         events = self.get_match_events(match_row['match_id'])
         if events is None:
             return None
         # Clean events first (remove shootout/post-120, dedupe)
-        cleaned = self.clean_events(events)
+        with self.instrumentation.stage('clean'):
+            cleaned = self.clean_events(events)
         match_data = self.extract_match_data(match_row, cleaned)
         rows = self.flatten_match_data(match_data)
         df = pd.DataFrame(rows)
@@ -549,6 +1013,16 @@ class RefactoredWorldCupExtractor:
         return df
 
 
+def _extract_match_rows_worker(extractor, match_row, known_hash=None, track_changes=False):
+    """Process-pool entry point: returns ((rows, events_hash), None, metrics) or (None, (message, traceback), metrics)
+    instead of raising; `metrics` is what the worker's instrumentation recorded for this match (None when off)."""
+    try:
+        result = extractor.extract_match_rows(match_row, known_hash, track_changes), None
+    except Exception as e:
+        result = None, (str(e), traceback.format_exc())
+    return (*result, extractor.instrumentation.drain())
+
+
 if __name__ == '__main__':
     import argparse
     parser = argparse.ArgumentParser(description='Refactored StatsBomb World Cup extractor')
@@ -556,32 +1030,57 @@ if __name__ == '__main__':
     parser.add_argument('--save', type=str, help='CSV path to save results (optional)')
     parser.add_argument('--all', action='store_true', help='Process all matches in the configured competition/season')
     parser.add_argument('--max', type=int, default=None, help='Max matches to process (for testing)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for --all (0 = one per CPU, default serial)')
+    parser.add_argument('--unordered', action='store_true', help='With --workers, collect rows in completion order')
+    parser.add_argument('--incremental', action='store_true', help='With --all and --save, only extract new or changed matches')
+    parser.add_argument('--stream', type=str, default=None, help='With --all, append rows to this CSV (or .parquet directory) match by match')
+    parser.add_argument('--no-resume', action='store_true', help='With --stream, start over instead of skipping written matches')
+    parser.add_argument('--cache-dir', type=str, default=None, help='Cache raw StatsBomb responses in this directory')
+    parser.add_argument('--offline', action='store_true', help='With --cache-dir, only read from the cache')
+    parser.add_argument('--event-store', type=str, default=None, help='Also write cleaned events to a Parquet event store at this root')
+    parser.add_argument('--quiet', action='store_true', help='Do not print per-match progress')
+    parser.add_argument('--log-stages', action='store_true', help='Log one JSON record per timed stage to stderr')
+    parser.add_argument('--metrics-file', type=str, default=None, help='Write stage timings and counters to this Prometheus text file')
+    parser.add_argument('--fetch-retries', type=int, default=0, help='Retry failed event fetches this many times')
     # Check if running in Colab to handle potential system arguments
     if 'google.colab' in sys.modules:
         args = parser.parse_args([]) # Pass empty list to avoid parsing Colab args
     else:
         args = parser.parse_args()
-    extractor = RefactoredWorldCupExtractor()
+    client = None
+    if args.cache_dir:
+        from analysis.cache import CachedStatsBombClient, RawDataCache
+        client = CachedStatsBombClient(RawDataCache(args.cache_dir), offline=args.offline)
+    event_store = None
+    if args.event_store:
+        from analysis.event_store import EventStore
+        event_store = EventStore(args.event_store)
+    instrumentation = None
+    if args.log_stages or args.metrics_file:
+        import logging
+        from analysis.instrumentation import Instrumentation
+        logger = None
+        if args.log_stages:
+            logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stderr)
+            logger = logging.getLogger('analysis.worldcup_to_csv')
+        instrumentation = Instrumentation(logger=logger)
+    extractor = RefactoredWorldCupExtractor(client=client, event_store=event_store, instrumentation=instrumentation,
+                                            fetch_retries=args.fetch_retries, verbose=not args.quiet)
     if args.match_id:
         df = extractor.process_single_match(match_id=args.match_id, save_csv=args.save)
         if df is not None:
             print(df.head())
     elif args.all:
-        df = extractor.process_all_matches(save_csv=args.save, max_matches=args.max)
-        if df is not None:
+        df = extractor.process_all_matches(save_csv=args.save, max_matches=args.max,
+                                           workers=args.workers, ordered=not args.unordered,
+                                           incremental=args.incremental, stream_to=args.stream,
+                                           resume=not args.no_resume)
+        if df is not None and not args.stream:
             print(df.head())
     else:
         print('No action specified. Use --match-id MATCHID or --all to process.')
-
-    # Instantiate the extractor
-    extractor = RefactoredWorldCupExtractor()
-
-    # Process all matches and save to CSV
-    # The save_csv argument specifies the filename for the output CSV
-    df_all_matches = extractor.process_all_matches(save_csv='worldcup_2022_match_data.csv')
-
-    # Display the first few rows of the resulting DataFrame
-    if df_all_matches is not None:
-        print("\nDataFrame containing all match stats:")
-        display(df_all_matches.head())
-        print(f"\nData saved to worldcup_2022_match_data.csv")
\ No newline at end of file
+    if instrumentation is not None:
+        if args.log_stages:
+            instrumentation.log_summary()
+        if args.metrics_file:
+            instrumentation.write_prometheus(args.metrics_file)
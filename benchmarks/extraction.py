@@ -0,0 +1,185 @@
+"""
+Stage benchmark for the match extraction pipeline.
+
+Runs `RefactoredWorldCupExtractor` over recorded events served offline from a RawDataCache
+(fill one with `python -m analysis.worldcup_to_csv --all --cache-dir data/cache`), so no
+network is used. Every stage is timed per match:
+- fetch: `get_match_events` (cache read + coordinate unpacking)
+- clean_events, summarize_events, possession_segments, possession_team_actions, calculate_possession
+- every compute_* metric group (home and away calls added up)
+- flatten_match_data
+and reported as p50/p95 per match plus the tournament total, with events/sec and the peak
+traced memory of one match. `--compare` prints the change against an earlier JSON result.
+
+Usage (from the repository root):
+    python benchmarks/extraction.py --cache-dir data/cache --runs 3 --json extraction.json
+    python benchmarks/extraction.py --cache-dir data/cache --match-ids 3869685 3869684
+    python benchmarks/extraction.py --cache-dir data/cache --compare extraction.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from analysis.cache import CachedStatsBombClient, RawDataCache  # noqa: E402
+from analysis.worldcup_to_csv import RefactoredWorldCupExtractor  # noqa: E402
+
+# stage name -> extractor method timed under that name
+STAGES = {
+    'fetch': 'get_match_events',
+    'clean_events': 'clean_events',
+    'summarize_events': 'summarize_events',
+    'possession_segments': 'possession_segments',
+    'possession_team_actions': 'possession_team_actions',
+    'calculate_possession': 'calculate_possession',
+    'compute_passing_breakdowns': 'compute_passing_breakdowns',
+    'compute_shot_stats': 'compute_shot_stats',
+    'compute_defensive': 'compute_defensive',
+    'compute_goalkeeper': 'compute_goalkeeper',
+    'compute_transition': 'compute_transition',
+    'compute_efficiency': 'compute_efficiency',
+    'flatten_match_data': 'flatten_match_data',
+}
+
+
+class StageTimer:
+    """Wraps the extractor methods of STAGES on one instance and adds up their wall time."""
+
+    def __init__(self, extractor):
+        self.totals = dict.fromkeys(STAGES, 0.0)
+        for stage, method in STAGES.items():
+            setattr(extractor, method, self._wrap(stage, getattr(extractor, method)))
+
+    def _wrap(self, stage, func):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.totals[stage] += time.perf_counter() - start
+        return timed
+
+    def reset(self):
+        self.totals = dict.fromkeys(STAGES, 0.0)
+
+
+def load_match_rows(extractor, match_ids=None):
+    """Match rows (match_id, match_date, home_team, away_team) of the benchmark, from the cache only."""
+    if not match_ids:
+        matches = extractor._client().matches(competition_id=extractor.competition_id, season_id=extractor.season_id)
+        matches = matches.sort_values(['match_date', 'match_id'])
+        return matches[['match_id', 'match_date', 'home_team', 'away_team']].to_dict('records')
+    rows = []
+    for match_id in match_ids:
+        # without a cached matches list the teams are taken in order of appearance
+        teams = extractor._client().events(match_id=match_id)['team'].dropna().unique().tolist()
+        rows.append({'match_id': match_id, 'match_date': None, 'home_team': teams[0], 'away_team': teams[1]})
+    return rows
+
+
+def run_match(extractor, match_row):
+    """Run the whole pipeline on one match the way `extract_match_rows` does; returns the number of events."""
+    events = extractor.get_match_events(match_row['match_id'])
+    events = extractor.clean_events(events)
+    with contextlib.redirect_stdout(io.StringIO()):
+        extractor.flatten_match_data(extractor.extract_match_data(match_row, events))
+    return len(events)
+
+
+def peak_memory(extractor, match_row):
+    """Peak Python memory (bytes) allocated while extracting one match, traced in a separate pass."""
+    tracemalloc.start()
+    try:
+        run_match(extractor, match_row)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def percentiles(values):
+    values = np.asarray(values, dtype=float)
+    return {
+        'p50_ms': float(np.percentile(values, 50) * 1000),
+        'p95_ms': float(np.percentile(values, 95) * 1000),
+        'total_s': float(values.sum())
+    }
+
+
+def benchmark(extractor, match_rows, runs=3):
+    """Time every stage of every match `runs` times (after one warm-up match) and summarize."""
+    timer = StageTimer(extractor)
+    run_match(extractor, match_rows[0])
+    samples = {stage: [] for stage in list(STAGES) + ['match']}
+    events_total = 0
+    elapsed = 0.0
+    for _ in range(runs):
+        for match_row in match_rows:
+            timer.reset()
+            start = time.perf_counter()
+            n_events = run_match(extractor, match_row)
+            duration = time.perf_counter() - start
+            for stage, seconds in timer.totals.items():
+                samples[stage].append(seconds)
+            samples['match'].append(duration)
+            events_total += n_events
+            elapsed += duration
+    return {
+        'matches': len(match_rows),
+        'runs': runs,
+        'events_per_sec': events_total / elapsed if elapsed > 0 else 0.0,
+        'tournament_s': elapsed / runs,
+        'peak_memory_mb': max(peak_memory(extractor, row) for row in match_rows) / 1024 ** 2,
+        'stages': {stage: percentiles(values) for stage, values in samples.items()}
+    }
+
+
+def print_result(result, baseline=None):
+    print(f"{result['matches']} matches x {result['runs']} runs: {result['tournament_s']:.2f} s per tournament, "
+          f"{result['events_per_sec']:,.0f} events/s, peak {result['peak_memory_mb']:.1f} MB")
+    for stage, stats in result['stages'].items():
+        line = f"{stage:>28}: p50 {stats['p50_ms']:8.2f} ms   p95 {stats['p95_ms']:8.2f} ms"
+        previous = (baseline or {}).get('stages', {}).get(stage)
+        if previous and previous['p50_ms'] > 0:
+            line += f"   p50 {stats['p50_ms'] / previous['p50_ms']:5.2f}x baseline"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time every stage of the match extraction on cached events')
+    parser.add_argument('--cache-dir', type=str, default='data/cache', help='RawDataCache directory with the recorded events')
+    parser.add_argument('--competition-id', type=int, default=43, help='Competition whose cached matches are used')
+    parser.add_argument('--season-id', type=int, default=106, help='Season whose cached matches are used')
+    parser.add_argument('--match-ids', type=int, nargs='+', default=None, help='Only these matches (no cached matches list needed)')
+    parser.add_argument('--max', type=int, default=None, help='Only the first N matches')
+    parser.add_argument('--runs', type=int, default=3, help='Passes over the matches')
+    parser.add_argument('--json', type=str, default=None, help='Write the result to this JSON file')
+    parser.add_argument('--compare', type=str, default=None, help='Earlier JSON result to compare against')
+    args = parser.parse_args()
+
+    client = CachedStatsBombClient(RawDataCache(args.cache_dir, max_bytes=None), offline=True)
+    extractor = RefactoredWorldCupExtractor(competition_id=args.competition_id, season_id=args.season_id, client=client)
+    match_rows = load_match_rows(extractor, args.match_ids)[:args.max]
+
+    result = benchmark(extractor, match_rows, runs=max(1, args.runs))
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_result(result, baseline)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Startup benchmark for the data loader.
+
+Every sample runs in a fresh interpreter and measures:
+- import_s: `import analysis.FootballDataLoader`
+- construct_s: `FootballDataLoader()`
+- statsbombpy_imported: whether constructing the loader imported statsbombpy
+- competitions_s: first access of `loader.competitions` (only with --cache-dir, served offline)
+
+Usage (from the repository root):
+    python benchmarks/startup.py --runs 10
+    python benchmarks/startup.py --cache-dir data/cache --json startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE = '''
+import json, sys, time
+t0 = time.perf_counter()
+import analysis.FootballDataLoader as module
+t1 = time.perf_counter()
+client = None
+if {cache_dir!r}:
+    from analysis.cache import CachedStatsBombClient, RawDataCache
+    client = CachedStatsBombClient(RawDataCache({cache_dir!r}), offline=True)
+loader = module.FootballDataLoader(client=client)
+t2 = time.perf_counter()
+result = {{'import_s': t1 - t0, 'construct_s': t2 - t1, 'statsbombpy_imported': 'statsbombpy.sb' in sys.modules}}
+if {cache_dir!r}:
+    loader.competitions
+    result['competitions_s'] = time.perf_counter() - t2
+print(json.dumps(result))
+'''
+
+
+def run_sample(cache_dir=None):
+    """Run one measurement in a fresh interpreter and return its timings."""
+    output = subprocess.run(
+        [sys.executable, '-c', SAMPLE.format(cache_dir=cache_dir or '')],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(samples):
+    """Median / min / max of every timing over the samples."""
+    summary = {}
+    for key in samples[0]:
+        values = [s[key] for s in samples]
+        if isinstance(values[0], bool):
+            summary[key] = any(values)
+            continue
+        summary[key] = {
+            'median': statistics.median(values),
+            'min': min(values),
+            'max': max(values)
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure FootballDataLoader import and construction time')
+    parser.add_argument('--runs', type=int, default=5, help='Number of fresh-interpreter samples')
+    parser.add_argument('--cache-dir', type=str, default=None, help='Also time the first competitions access from this cache')
+    parser.add_argument('--json', type=str, default=None, help='Write the summary to this JSON file')
+    args = parser.parse_args()
+
+    samples = [run_sample(args.cache_dir) for _ in range(args.runs)]
+    summary = {'runs': args.runs, **summarize(samples)}
+    for key, value in summary.items():
+        if isinstance(value, dict):
+            print(f"{key:>20}: median {value['median'] * 1000:8.1f} ms   min {value['min'] * 1000:8.1f} ms   max {value['max'] * 1000:8.1f} ms")
+        else:
+            print(f"{key:>20}: {value}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Shared data access for the Streamlit pages.
+
+Streamlit reruns a page script on every widget interaction, so pages must not parse files
+themselves. The loaders here keep one parsed copy per file for the whole server process and
+only read a file again when its modification time or size changes (i.e. after the data was
+regenerated), together with everything derived from it (categoricals, sorted option lists).
+"""
+
+import os
+import sys
+import threading
+
+from helpers.facets import FacetIndex
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "data"))
+MATCHES_INDEX_PATH = os.path.join(DATA_DIR, "matches_index.csv")
+TEAM_AGGREGATES_PATH = os.path.join(DATA_DIR, "team_aggregates.csv")
+PLAYER_STATS_PATH = os.path.join(DATA_DIR, "player_season_stats.parquet")
+
+# the analysis package lives at the repository root, next to frontend/
+sys.path.append(os.path.dirname(DATA_DIR))
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _file_version(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def cached(path, load):
+    """
+    Return `load(path)`, computed once per version of the file and shared by every session.
+
+    Parameters:
+    - path: File the result is derived from
+    - load: Function building the result from the path
+    """
+    version = _file_version(path)
+    key = (path, load.__qualname__)
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+    value = load(path)
+    with _lock:
+        _cache[key] = (version, value)
+    return value
+
+
+class MatchesIndex:
+    """matches_index.csv with categorical string columns and the dropdown options precomputed."""
+
+    CATEGORY_COLUMNS = ["competition", "season", "team1", "team2", "competition_stage"]
+
+    def __init__(self, frame):
+        for column in self.CATEGORY_COLUMNS:
+            frame[column] = frame[column].astype("category")
+        self.frame = frame
+        self.competitions = self._sorted(frame["competition"])
+        self.seasons = self._sorted(frame["season"])
+        self.stages = self._sorted(frame["competition_stage"])
+        self.teams = sorted(set(self._sorted(frame["team1"])) | set(self._sorted(frame["team2"])))
+        self._facets = {}
+
+    def facets(self, columns):
+        """Faceted filter index over `columns` (see helpers/facets.py), built once per file version."""
+        key = tuple(columns)
+        if key not in self._facets:
+            self._facets[key] = FacetIndex(self.frame, columns)
+        return self._facets[key]
+
+    @staticmethod
+    def _sorted(column):
+        # categories present in the column, without NaN
+        return sorted(column.dropna().unique().tolist())
+
+
+def _load_matches_index(path):
+    # typed columns, read from the Parquet sidecar when it is up to date (see analysis.matches_index)
+    from analysis.matches_index import read_matches_index
+    return MatchesIndex(read_matches_index(path))
+
+
+def load_matches_index(path=MATCHES_INDEX_PATH):
+    """The matches index, re-read only when the file changes."""
+    return cached(path, _load_matches_index)
+
+
+def _load_team_aggregates(path):
+    from analysis.team_aggregates import TeamAggregates
+    return TeamAggregates.load(path)
+
+
+def load_team_aggregates(path=TEAM_AGGREGATES_PATH):
+    """The per-team aggregate table (see `analysis.team_aggregates`), re-read only when the file changes."""
+    return cached(path, _load_team_aggregates)
+
+
+def _load_player_stats(path):
+    from analysis.player_stats import PlayerSeasonTable
+    table = PlayerSeasonTable.load(path)
+    # build the dropdown labels with the table so every session gets them ready-made
+    table.name_index()
+    return table
+
+
+def load_player_stats(path=PLAYER_STATS_PATH):
+    """The per-player season table (see `analysis.player_stats`), re-read only when the file changes."""
+    return cached(path, _load_player_stats)
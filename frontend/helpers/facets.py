@@ -0,0 +1,105 @@
+"""
+Faceted filter index for the cascading dropdowns of the home page.
+
+For every filter column the index stores the sorted list of its values (as the strings shown
+in the dropdowns) and, per value, the sorted row ids having it. Filtering is an intersection
+of row-id arrays and the options left for a column are the values present in those rows,
+so a rerun no longer copies or re-scans the matches table.
+"""
+
+import numpy as np
+
+
+class FacetIndex:
+    """Value -> sorted row ids for each filter column of a dataframe."""
+
+    def __init__(self, frame, columns):
+        """
+        Parameters:
+        - frame: Table to index (rows are addressed by position)
+        - columns: Columns users can filter by
+        """
+        self.frame = frame
+        self.columns = list(columns)
+        self.n_rows = len(frame)
+        self.values = {}
+        self.codes = {}
+        self.postings = {}
+        for column in self.columns:
+            self._index_column(column)
+
+    def _index_column(self, column):
+        series = self.frame[column]
+        present = series.notna().to_numpy()
+        strings = series[present].astype(str).to_numpy()
+        # codes follow the sorted order of the values, so sorted codes give sorted options
+        values, codes = np.unique(strings, return_inverse=True)
+        all_codes = np.full(self.n_rows, -1, dtype=np.int32)
+        all_codes[present] = codes
+        rows = np.flatnonzero(present)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(values)))])
+        sorted_rows = rows[order]
+        self.values[column] = values.tolist()
+        self.codes[column] = all_codes
+        self.postings[column] = {
+            value: sorted_rows[bounds[i]:bounds[i + 1]] for i, value in enumerate(self.values[column])
+        }
+
+    def rows(self, selections):
+        """
+        Row ids matching every selection.
+
+        Parameters:
+        - selections: {column: selected value as a string}
+
+        Returns:
+        - Sorted array of row positions (all rows when nothing is selected)
+        """
+        if not selections:
+            return np.arange(self.n_rows)
+        postings = [
+            self.postings[column].get(str(value), np.empty(0, dtype=np.int64))
+            for column, value in selections.items()
+        ]
+        postings.sort(key=len)
+        rows = postings[0]
+        for other in postings[1:]:
+            if len(rows) == 0:
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
+
+    def options(self, rows=None):
+        """
+        Sorted values of every column present in the given rows.
+
+        Parameters:
+        - rows: Row ids (None for the whole table)
+
+        Returns:
+        - {column: sorted list of values}
+        """
+        if rows is None or len(rows) == self.n_rows:
+            return {column: list(values) for column, values in self.values.items()}
+        options = {}
+        for column in self.columns:
+            codes = self.codes[column][rows]
+            present = np.flatnonzero(np.bincount(codes[codes >= 0], minlength=len(self.values[column])))
+            values = self.values[column]
+            options[column] = [values[code] for code in present]
+        return options
+
+    def select(self, selections):
+        """
+        Filter and compute the options left in one go.
+
+        Parameters:
+        - selections: {column: selected value as a string}
+
+        Returns:
+        - rows: Matching row ids
+        - options: {column: sorted values present in those rows}
+        """
+        rows = self.rows(selections)
+        return rows, self.options(rows)
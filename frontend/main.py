@@ -1,11 +1,12 @@
 from helpers import page_cfg
+from helpers import data
 import streamlit as st
-import pandas as pd
 
 page_cfg.load_page_config()
 
-# Read data
-df = pd.read_csv("../data/matches_index.csv")
+# Read data (parsed once per server process, see helpers/data.py)
+matches_index = data.load_matches_index()
+df = matches_index.frame
 
 st.title("⚽ Football Analytics Platform")
 st.write("Choose a section to explore:")
@@ -19,7 +20,7 @@ with col1:
         st.subheader("Tournament Analsysis")
         
         # Get unique competitions
-        competitions = df['competition'].unique().tolist()
+        competitions = matches_index.competitions
         
         # Competition selection
         selected_competition = st.selectbox(
@@ -72,15 +73,15 @@ with col2:
         if column not in st.session_state:
             st.session_state[column] = EMPTY_SELECTION
 
-    def get_filtered_data_and_options(original_data):
+    # Value -> row ids index of the filter columns, built once per version of the index file
+    facet_index = matches_index.facets(filter_columns)
+
+    def get_filtered_data_and_options():
         """
         Filter the data based on current selections and compute available options
         
-        Parameters:
-        - original_data: The complete unfiltered dataset
-        
         Returns:
-        - filtered_data: Data filtered based on current selections
+        - filtered_rows: Row positions matching the current selections
         - available_options: Dictionary of available options for each filter
         """
         
@@ -91,29 +92,19 @@ with col2:
             if st.session_state[column] != EMPTY_SELECTION
         }
         
-        # Start with a copy of the original data
-        filtered_data = original_data.copy()
-        
-        # Apply each active filter to narrow down the data
-        for column, selected_value in active_filters.items():
-            filtered_data = filtered_data[
-                filtered_data[column].astype(str) == str(selected_value)
-            ]
+        # Intersect the row ids of every selection and read the values left in those rows
+        filtered_rows, options = facet_index.select(active_filters)
         
-        # Calculate available options for each filter based on current filtered data
-        available_options = {}
-        for column in filter_columns:
-            # Get unique values from the filtered data
-            unique_values = filtered_data[column].dropna().unique().tolist()
-            # Convert all values to strings for consistency
-            unique_values = [str(value) for value in unique_values]
-            # Add "Choose" as first option and sort the rest
-            available_options[column] = [EMPTY_SELECTION] + sorted(unique_values)
+        # Add "Choose" as first option (values are already sorted)
+        available_options = {
+            column: [EMPTY_SELECTION] + options[column]
+            for column in filter_columns
+        }
         
-        return filtered_data, available_options
+        return filtered_rows, available_options
 
     # Get initial filtered data and options
-    filtered_data, available_options = get_filtered_data_and_options(df)
+    filtered_rows, available_options = get_filtered_data_and_options()
 
     # Check if any current selections are no longer valid
     # This can happen when changing a filter removes options from other filters
@@ -125,7 +116,7 @@ with col2:
 
     # If any selections were reset, recalculate the filtered data
     if invalid_selection_detected:
-        filtered_data, available_options = get_filtered_data_and_options(df)
+        filtered_rows, available_options = get_filtered_data_and_options()
 
     def calculate_default_index(column_name):
         """
@@ -212,19 +203,8 @@ with col2:
 
     # === Apply final filtering to get results ===
     
-    # Collect all active filters (non-empty selections)
-    active_filters = {
-        column: st.session_state[column] 
-        for column in filter_columns 
-        if st.session_state[column] != EMPTY_SELECTION
-    }
-    
-    # Apply filters to get final results
-    final_results = df.copy()
-    for column, selected_value in active_filters.items():
-        final_results = final_results[
-            final_results[column].astype(str) == str(selected_value)
-        ]
+    # The selections are those the rows were filtered with above
+    final_results = df.iloc[filtered_rows]
 
     # Display the filtered matches table if checkbox is selected
     if show_matches_table:
@@ -248,8 +228,7 @@ with col3:
         st.write("Compare performance between any two teams")
         
         # Get all unique team names
-        all_teams = pd.concat([df['team1'], df['team2']]).dropna().unique()
-        all_teams = sorted(all_teams.tolist())
+        all_teams = matches_index.teams
         
         team_cols = st.columns(2)
         with team_cols[0]:
@@ -275,6 +254,7 @@ with col3:
         
         # Button to go to comparison page
         if st.button("Go to Team Comparison", key="compare_team_btn", use_container_width=True):
+            st.session_state['comparison_teams'] = (team_1, team_2)
             st.switch_page("pages/Team Comparison.py")
 
 # ===== Player COMPARISON SECTION =====
@@ -283,9 +263,8 @@ with col4:
         st.subheader("Player Comparison")
         st.write("Compare performance between any two Players")
         
-        # Get all unique playes names
-        all_players = pd.concat([df['team1'], df['team2']]).dropna().unique()
-        all_players = sorted(all_players.tolist())
+        # Player names from the per-player season table (labels are unique, see analysis/player_stats.py)
+        all_players = data.load_player_stats().players()
         
         player_cols = st.columns(2)
         with player_cols[0]:
@@ -310,5 +289,7 @@ with col4:
             )
         
         # Button to go to comparison page
-        if st.button("Go to player Comparison", key="compare_player_btn", use_container_width=True):
+        if st.button("Go to player Comparison", key="compare_player_btn", use_container_width=True,
+                     disabled=len(all_players) < 2):
+            st.session_state['comparison_players'] = (player_1, player_2)
             st.switch_page("pages/player Comparison.py")
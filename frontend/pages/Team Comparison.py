@@ -0,0 +1,65 @@
+import streamlit as st
+from helpers import page_cfg
+from helpers import data
+from analysis.team_aggregates import TeamAggregates
+
+page_cfg.load_page_config()
+
+# small precomputed table, see `python -m analysis.team_aggregates`
+aggregates = data.load_team_aggregates()
+all_teams = aggregates.teams()
+
+st.title("Team Comparison")
+
+if not all_teams:
+    st.warning("No team aggregates found. Build them with `python -m analysis.team_aggregates data/worldcup_2022_match_data.csv`.")
+    st.stop()
+
+# Teams picked on the home page, if any
+selected_teams = st.session_state.get("comparison_teams", (all_teams[0], all_teams[-1]))
+
+stages = [TeamAggregates.ALL_STAGES] + sorted(
+    set(aggregates.stats.index.get_level_values("stage")) - {TeamAggregates.ALL_STAGES}
+)
+STATS = {"Average per match": "mean", "Total": "total"}
+# per-90 rates need the match minutes, which rows extracted before they were recorded lack
+if aggregates.has_minutes():
+    STATS["Per 90 minutes"] = "per_90"
+
+option_cols = st.columns(4)
+with option_cols[0]:
+    team_1 = st.selectbox(
+        "First team",
+        options=all_teams,
+        index=all_teams.index(selected_teams[0]) if selected_teams[0] in all_teams else 0
+    )
+with option_cols[1]:
+    remaining_teams = [team for team in all_teams if team != team_1]
+    team_2 = st.selectbox(
+        "Second team",
+        options=remaining_teams,
+        index=remaining_teams.index(selected_teams[1]) if selected_teams[1] in remaining_teams else 0
+    )
+with option_cols[2]:
+    stage = st.selectbox("Stage", options=stages)
+with option_cols[3]:
+    stat = STATS[st.selectbox("Statistic", options=list(STATS))]
+
+summary = aggregates.summary(stage, stat)
+teams = [team for team in (team_1, team_2) if team in summary.index]
+if len(teams) < 2:
+    st.info(f"Both teams need at least one match in: {stage}")
+    st.stop()
+if stat == "per_90" and summary.loc[teams].isna().all(axis=None):
+    st.info("Per-90 rates need the match minutes: re-extract the matches with `python -m analysis.worldcup_to_csv` "
+            "and rebuild the table with `--rebuild`.")
+    st.stop()
+
+# Both teams side by side, with their league-wide rank (1 = highest) for every metric
+table = summary.loc[teams].T.round(2)
+ranks = summary.rank(ascending=False, method="min")
+for team in teams:
+    table[f"{team} rank"] = ranks.loc[team].astype("Int64")
+st.caption(f"Matches played: {team_1} {aggregates.matches_played(team_1, stage)}, "
+           f"{team_2} {aggregates.matches_played(team_2, stage)}")
+st.dataframe(table, use_container_width=True)
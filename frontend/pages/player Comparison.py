@@ -1,73 +1,57 @@
 import streamlit as st
 from helpers import page_cfg
+from helpers import data
 
-MAX_COLUMNS = page_cfg.load_page_config()
+page_cfg.load_page_config()
 
-# Initialize blocks and next id counter
-if "blocks" not in st.session_state:
-    st.session_state["blocks"] = [1]
-if "next_block_id" not in st.session_state:
-    st.session_state["next_block_id"] = max(st.session_state["blocks"]) + 1
+# precomputed season table with its name index, see `python -m analysis.player_stats`
+players = data.load_player_stats()
 
-# Title and Add button
-col_title, col_add = st.columns([10, 1])
-with col_title:
-    st.title("Football Tournament Analysis")
-with col_add:
-    add_disabled = len(st.session_state["blocks"]) >= MAX_COLUMNS
-    if st.button("➕", help="Add new column to compare", disabled=add_disabled):
-        new_id = st.session_state["next_block_id"]
-        st.session_state["blocks"].append(new_id)
-        st.session_state["next_block_id"] += 1
-        st.rerun()
+st.title("Player Comparison")
 
-# Function to render a single block
-def render_block(block_id, block_number):
-    # Header with delete button
-    col_title, col_delete = st.columns([7, 1])
+if len(players.players()) < 2:
+    st.warning("No player statistics found. Build them with `python -m analysis.player_stats --event-store data/events`.")
+    st.stop()
 
-    with col_title:
-        st.subheader(f"Title {block_id}")
-        st.caption(f"Subtitle {block_id}")
+ALL_SEASONS = "All seasons"
+STATS = {"Total": "total", "Per 90 minutes": "per_90", "Per match": "per_match"}
 
-    with col_delete:
-        # Delete button (disabled if only one block)
-        disabled = (len(st.session_state["blocks"]) == 1)
-        if st.button("❌", key=f"delete_{block_id}", disabled=disabled):
-            # remove the block safely
-            if block_id in st.session_state["blocks"]:
-                st.session_state["blocks"].remove(block_id)
-            st.rerun()
+option_cols = st.columns(4)
+with option_cols[0]:
+    season_label = st.selectbox("Season", options=[ALL_SEASONS] + players.seasons())
+season = None if season_label == ALL_SEASONS else season_label
+all_players = players.players(season)
 
-    # Content sections
-    st.write("**Statistics**")
-    st.write("**Advanced Statistics**")
+# Players picked on the home page, if any
+selected_players = st.session_state.get("comparison_players", (all_players[0], all_players[-1]))
 
-    # Tabs
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(
-        ["Tab 1", "Tab 2", "Tab 3", "Tab 4", "Tab 5"]
+with option_cols[1]:
+    player_1 = st.selectbox(
+        "First player",
+        options=all_players,
+        index=all_players.index(selected_players[0]) if selected_players[0] in all_players else 0
     )
-
-    with tab1:
-        st.write("Content Tab 1")
-    with tab2:
-        st.write("Content Tab 2")
-    with tab3:
-        st.write("Content Tab 3")
-    with tab4:
-        st.write("Content Tab 4")
-    with tab5:
-        st.write("Content Tab 5")
-
-# Display blocks in rows with a maximum of MAX_COLUMNS per row
-blocks = st.session_state["blocks"]
-
-if len(blocks) == 1:
-    render_block(blocks[0], 1)
-else:
-    for row_start in range(0, len(blocks), MAX_COLUMNS):
-        row_blocks = blocks[row_start: row_start + MAX_COLUMNS]
-        cols = st.columns(len(row_blocks))
-        for i, block_id in enumerate(row_blocks):
-            with cols[i]:
-                render_block(block_id, row_start + i + 1)
+with option_cols[2]:
+    remaining_players = [player for player in all_players if player != player_1]
+    player_2 = st.selectbox(
+        "Second player",
+        options=remaining_players,
+        index=remaining_players.index(selected_players[1]) if selected_players[1] in remaining_players else 0
+    )
+with option_cols[3]:
+    stat = STATS[st.selectbox("Statistic", options=list(STATS))]
+
+min_minutes = st.slider("Minimum minutes for the ranks", min_value=0, max_value=900, value=90, step=45)
+
+labels = [player_1, player_2]
+player_ids = [players.player_id(label, season) for label in labels]
+
+# Both players side by side, with their rank (1 = highest) among players with enough minutes
+table = players.compare(player_ids, season, stat).round(2)
+table.columns = labels
+ranked = players.summary(season, stat, min_minutes=min_minutes)
+ranks = ranked.rank(ascending=False, method="min")
+for label, player_id in zip(labels, player_ids):
+    table[f"{label} rank"] = ranks.loc[player_id].astype("Int64") if player_id in ranks.index else None
+st.caption(f"Ranks among {len(ranked)} players with at least {min_minutes} minutes")
+st.dataframe(table, use_container_width=True)
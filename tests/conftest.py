@@ -0,0 +1,89 @@
+# tests/conftest.py
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# make `analysis` importable when pytest is run as `pytest` rather than `python -m pytest`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEAMS = ('Argentina', 'France')
+SHOT_OUTCOMES = ['Goal', 'Saved', 'Off T', 'Blocked', 'Wide']
+
+
+def synthetic_events(seed: int = 0, possessions: int = 160, match_id: int = 3869685) -> pd.DataFrame:
+    """
+    Raw StatsBomb-like events of a World Cup match between TEAMS, with the columns the extractor
+    reads (coordinates as lists, as `sb.events` returns them). Argentina attacks towards x = 120
+    and France towards x = 0; every possession is a run of passes and carries by its owner,
+    with pressures and ball recoveries of the other team, sometimes ending in a shot.
+    """
+    rng = np.random.default_rng(seed)
+    players = {team: [(t * 100 + i, f'{team} Player {i}') for i in range(1, 15)] for t, team in enumerate(TEAMS)}
+    rows = []
+
+    def add(team, event_type, possession, **columns):
+        player_id, player = players[team][rng.integers(len(players[team]))]
+        x = float(rng.uniform(0, 120))
+        location = None if rng.random() < 0.02 else [x, float(rng.uniform(0, 80))]
+        rows.append(dict(team=team, type=event_type, possession=possession, player_id=player_id, player=player,
+                         position='Goalkeeper' if player_id % 100 == 1 else 'Center Forward',
+                         location=location, **columns))
+        return rows[-1]
+
+    for possession in range(1, possessions + 1):
+        owner = TEAMS[rng.integers(2)]
+        other = TEAMS[1] if owner == TEAMS[0] else TEAMS[0]
+        direction = 1 if owner == TEAMS[0] else -1
+        for _ in range(rng.integers(1, 10)):
+            r = rng.random()
+            if r < 0.15:
+                add(other, 'Pressure', possession)
+            elif r < 0.22:
+                add(owner if rng.random() < 0.5 else other, 'Ball Recovery', possession)
+            elif r < 0.32:
+                add(owner, 'Carry', possession)
+            else:
+                row = add(owner, 'Pass', possession,
+                          pass_outcome='Incomplete' if rng.random() < 0.2 else None,
+                          pass_cross=True if rng.random() < 0.05 else None)
+                if row['location'] is not None:
+                    row['pass_end_location'] = [row['location'][0] + direction * float(rng.normal(8, 15)),
+                                                float(rng.uniform(0, 80))]
+                if row['pass_outcome'] is None:
+                    row['pass_recipient_id'], row['pass_recipient'] = players[owner][rng.integers(len(players[owner]))]
+        if rng.random() < 0.2:
+            shot = add(owner, 'Shot', possession, shot_outcome=SHOT_OUTCOMES[rng.integers(len(SHOT_OUTCOMES))],
+                       shot_statsbomb_xg=float(rng.uniform(0.02, 0.5)))
+            shot['location'] = [108.0 if direction == 1 else 12.0, float(rng.uniform(25, 55))]
+            previous = rows[-2]
+            if previous['type'] == 'Pass' and previous['team'] == owner and previous['possession'] == possession:
+                previous['pass_shot_assist'] = True
+                previous['pass_assisted_shot_id'] = f'shot-{len(rows)}'
+                previous['pass_goal_assist'] = True if shot['shot_outcome'] == 'Goal' else None
+            shot['id'] = f'shot-{len(rows)}'
+
+    events = pd.DataFrame(rows)
+    events['id'] = events['id'].fillna(pd.Series([f'event-{i}' for i in range(len(events))]))
+    clock = np.sort(rng.uniform(0, 95 * 60, len(events)))
+    events.insert(0, 'index', np.arange(1, len(events) + 1))
+    events.insert(1, 'period', np.where(clock < 47 * 60, 1, 2))
+    events.insert(2, 'minute', (clock // 60).astype(int))
+    events.insert(3, 'second', (clock % 60).astype(int))
+    events['match_id'] = match_id
+    return events
+
+
+@pytest.fixture
+def make_events():
+    """Factory of `synthetic_events`."""
+    return synthetic_events
+
+
+@pytest.fixture(scope='session')
+def extractor():
+    from analysis.worldcup_to_csv import RefactoredWorldCupExtractor
+    return RefactoredWorldCupExtractor(verbose=False)
@@ -0,0 +1,59 @@
+# tests/test_batch.py
+
+import pandas as pd
+import pytest
+
+from analysis import batch
+from analysis.batch import MatchSelection, run_batch
+from analysis.matches_index import write_matches_index
+from conftest import TEAMS, synthetic_events
+
+# three small competition-seasons of two matches each
+SEASONS = {(43, 106): ('FIFA World Cup', '2022'), (55, 43): ('UEFA Euro', '2020'), (72, 107): ("Women's World Cup", '2023')}
+
+
+class StubClient:
+    """Stands in for statsbombpy's `sb` (module level, so it pickles into the worker processes)."""
+
+    def competitions(self):
+        return pd.DataFrame([{'competition_id': cid, 'season_id': sid, 'competition_name': name, 'season_name': season}
+                             for (cid, sid), (name, season) in SEASONS.items()])
+
+    def events(self, match_id):
+        return synthetic_events(seed=match_id, possessions=30, match_id=match_id)
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    rows = [{'match_id': cid * 10 + i, 'competition': name, 'season': season, 'team1': TEAMS[0], 'team2': TEAMS[1],
+             'match_date': f'2022-12-{i + 1:02d}', 'home_score': 1, 'away_score': 0,
+             'competition_stage': 'Group Stage', 'match_week': 1}
+            for (cid, sid), (name, season) in SEASONS.items() for i in range(2)]
+    path = str(tmp_path / 'matches_index.csv')
+    write_matches_index(pd.DataFrame(rows), path)
+    return path
+
+
+def test_pool_is_shared_across_seasons(tmp_path, index_path, monkeypatch, capsys):
+    pools = []
+
+    class CountingExecutor(batch.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(self)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(batch, 'ProcessPoolExecutor', CountingExecutor)
+    parallel = run_batch(MatchSelection(), str(tmp_path / 'parallel'), index_path, client=StubClient(), workers=2)
+    assert len(pools) == 1
+    serial = run_batch(MatchSelection(), str(tmp_path / 'serial'), index_path, client=StubClient())
+    assert len(pools) == 1
+    assert parallel == serial == {key: 4 for key in SEASONS}
+
+    def read(name):
+        df = pd.read_parquet(tmp_path / name)
+        return df.sort_values(['match_id', 'team_type']).reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(read('parallel'), read('serial'))
+    # resuming finds every match written
+    assert run_batch(MatchSelection(), str(tmp_path / 'parallel'), index_path, client=StubClient(), workers=2) == \
+        {key: 0 for key in SEASONS}
@@ -0,0 +1,68 @@
+# tests/test_event_store.py
+
+import pyarrow.parquet as pq
+import pytest
+
+from analysis import event_store as event_store_module
+from analysis.event_store import EventStore
+
+
+@pytest.fixture
+def schema_reads(monkeypatch):
+    """Paths passed to `pq.read_schema` by the store."""
+    paths = []
+    read_schema = pq.read_schema
+
+    def counting(path, *args, **kwargs):
+        paths.append(path)
+        return read_schema(path, *args, **kwargs)
+
+    monkeypatch.setattr(event_store_module.pq, 'read_schema', counting)
+    return paths
+
+
+@pytest.fixture
+def store(tmp_path, extractor, make_events):
+    store = EventStore(str(tmp_path / 'events'))
+    for seed, match_id in enumerate((1, 2)):
+        events = extractor.clean_events(extractor.unpack_coordinates(make_events(seed, match_id=match_id)))
+        if match_id == 2:
+            # older data without the shot assist flag
+            events = events.drop(columns=['pass_shot_assist'])
+        store.write_match(events, 43, 106, match_id)
+    return store
+
+
+def test_schema_is_read_once_per_file(store, schema_reads, extractor, make_events):
+    fresh = EventStore(store.root)
+    assert 'pass_shot_assist' in fresh.columns()
+    assert len(schema_reads) == 2
+    for _ in range(3):
+        fresh.read(columns=['type', 'match_id'], filters=[('type', '==', 'Shot')])
+    assert len(schema_reads) == 2
+
+    # a new match only reads its own schema
+    events = extractor.clean_events(extractor.unpack_coordinates(make_events(2, match_id=3)))
+    path = fresh.write_match(events, 43, 106, 3)
+    shots = fresh.read(columns=['match_id'], filters=[('type', '==', 'Shot')])
+    assert sorted(shots['match_id'].unique()) == [1, 2, 3]
+    assert schema_reads[2:] == [path]
+
+    # a file written by another store is picked up through the file list
+    store.write_match(events, 43, 106, 4)
+    del schema_reads[:]
+    assert sorted(fresh.read(columns=['match_id'])['match_id'].unique()) == [1, 2, 3, 4]
+    assert schema_reads == [store.match_path(43, 106, 4)]
+
+
+def test_read_match_opens_only_its_file(store, schema_reads):
+    columns = store.columns()
+    del schema_reads[:]
+    events = store.read_match(43, 106, 2, columns=columns)
+    assert schema_reads == [store.match_path(43, 106, 2)]
+    # the union columns this match lacks are left out instead of failing the read
+    assert 'pass_shot_assist' not in events.columns
+    assert (events['match_id'] == 2).all()
+    assert store.read_match(43, 106, 1, columns=['type', 'pass_shot_assist']).columns.tolist() == \
+        ['type', 'pass_shot_assist', 'match_id']
+    assert store.read_match(43, 106, 9) is None
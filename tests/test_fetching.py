@@ -0,0 +1,93 @@
+# tests/test_fetching.py
+
+import threading
+import time
+
+import pytest
+
+from analysis import fetching
+from analysis.fetching import fetch_concurrently, fetch_with_retry
+
+
+class Flaky:
+    """Fetch function failing its first `failures` calls."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self, key):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError(f"attempt {self.calls} failed")
+        return f"data {key}"
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(fetching.time, 'sleep', delays.append)
+    return delays
+
+
+def test_retry_until_success_with_backoff(sleeps):
+    fetch = Flaky(failures=2)
+    retried = []
+    result = fetch_with_retry(fetch, 7, retries=2, backoff=0.5, timeout=None,
+                              on_retry=lambda key, attempt, error: retried.append((key, attempt)))
+    assert result == 'data 7'
+    assert fetch.calls == 3
+    assert retried == [(7, 0), (7, 1)]
+    # exponential backoff with at most 10% jitter
+    assert len(sleeps) == 2
+    assert 0.5 <= sleeps[0] <= 0.55 and 1.0 <= sleeps[1] <= 1.1
+
+
+def test_retry_gives_up_with_last_error(sleeps):
+    fetch = Flaky(failures=5)
+    with pytest.raises(ConnectionError, match='attempt 2'):
+        fetch_with_retry(fetch, 7, retries=1, backoff=0.5, timeout=1.0)
+    assert fetch.calls == 2
+    assert len(sleeps) == 1
+
+
+def test_timeout_counts_as_failed_attempt(sleeps):
+    release = threading.Event()
+    with pytest.raises(TimeoutError):
+        fetch_with_retry(lambda key: release.wait(), 7, retries=1, backoff=0.0, timeout=0.01)
+    release.set()
+    assert len(sleeps) == 1
+
+
+def test_fetch_concurrently_streams_results_and_errors():
+    def fetch(key):
+        time.sleep(key * 0.05)
+        if key == 2:
+            raise ValueError('no data')
+        return key * 10
+
+    results = list(fetch_concurrently(fetch, [3, 1, 2], max_concurrency=3, retries=0, timeout=None))
+    # completion order, with the failed key reported instead of raised
+    assert [key for key, _, _ in results] == [1, 2, 3]
+    assert [(key, data) for key, data, error in results if error is None] == [(1, 10), (3, 30)]
+    [(key, data, error)] = [result for result in results if result[2] is not None]
+    assert (key, data, str(error)) == (2, None, 'no data')
+
+
+def test_fetch_concurrently_bounds_timed_out_requests():
+    lock = threading.Lock()
+    in_flight = [0, 0]
+
+    def slow(key):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        time.sleep(0.2)
+        with lock:
+            in_flight[0] -= 1
+        return key
+
+    results = list(fetch_concurrently(slow, range(6), max_concurrency=2, retries=1, backoff=0.0, timeout=0.01))
+    assert all(isinstance(error, TimeoutError) for _, _, error in results)
+    # the abandoned calls still hold their slot
+    assert in_flight[1] <= 2
@@ -0,0 +1,113 @@
+# tests/test_incremental_extraction.py
+
+import json
+
+import pandas as pd
+
+from analysis.cache import CachedStatsBombClient, RawDataCache
+from analysis.worldcup_to_csv import RefactoredWorldCupExtractor
+from conftest import TEAMS, synthetic_events
+
+
+class StubClient:
+    """Stands in for statsbombpy's `sb`: a competition-season of synthetic matches."""
+
+    def __init__(self, match_ids=(1, 2)):
+        self.matches_frame = pd.DataFrame({
+            'match_id': list(match_ids),
+            'match_date': [f'2022-12-{i:02d}' for i in match_ids],
+            'home_team': TEAMS[0], 'away_team': TEAMS[1],
+            'last_updated': '2023-01-01T00:00:00'
+        })
+        self.fetched = []
+        self.failing = set()
+        # match_id -> seed of its corrected events
+        self.corrected = {}
+
+    def competitions(self):
+        return pd.DataFrame({'competition_id': [43], 'season_id': [106],
+                             'match_updated': [self.matches_frame['last_updated'].max()]})
+
+    def matches(self, competition_id, season_id):
+        return self.matches_frame.copy()
+
+    def events(self, match_id):
+        self.fetched.append(match_id)
+        if match_id in self.failing:
+            raise ConnectionError(f'events of {match_id} unavailable')
+        return synthetic_events(seed=self.corrected.get(match_id, match_id), possessions=40, match_id=match_id)
+
+
+def run(client, path, capsys):
+    extractor = RefactoredWorldCupExtractor(client=client, verbose=False)
+    client.fetched = []
+    df = extractor.process_all_matches(save_csv=str(path), incremental=True)
+    return df, capsys.readouterr().out
+
+
+def test_unchanged_stamps_skip_the_fetch(tmp_path, capsys):
+    client = StubClient()
+    path = tmp_path / 'match_data.csv'
+    df, out = run(client, path, capsys)
+    assert client.fetched == [1, 2] and len(df) == 4
+    assert '2 of 2 matches extracted, 0 up to date, 0 failed' in out
+
+    df, out = run(client, path, capsys)
+    assert client.fetched == []
+    assert '0 of 2 matches extracted, 2 up to date, 0 failed' in out
+
+    # a new stamp with the same events: fetched and hashed, not re-extracted, then skipped again
+    client.matches_frame.loc[0, 'last_updated'] = '2023-02-01T00:00:00'
+    df, out = run(client, path, capsys)
+    assert client.fetched == [1]
+    assert '0 of 2 matches extracted, 2 up to date, 0 failed' in out
+    with open(tmp_path / 'match_data.manifest.json') as f:
+        assert json.load(f)['matches']['1']['last_updated'] == '2023-02-01T00:00:00'
+    df, out = run(client, path, capsys)
+    assert client.fetched == []
+
+
+def test_failed_matches_are_reported_and_retried(tmp_path, capsys):
+    client = StubClient()
+    client.failing = {1, 2}
+    path = tmp_path / 'match_data.csv'
+    df, out = run(client, path, capsys)
+    assert df is None
+    assert '0 of 2 matches extracted, 0 up to date, 2 failed' in out
+
+    client.failing = {2}
+    df, out = run(client, path, capsys)
+    assert sorted(df['match_id'].unique()) == [1]
+    assert '1 of 2 matches extracted, 0 up to date, 1 failed' in out
+
+    client.failing = set()
+    df, out = run(client, path, capsys)
+    assert client.fetched == [2]
+    assert sorted(df['match_id'].unique()) == [1, 2]
+    assert '1 of 2 matches extracted, 1 up to date, 0 failed' in out
+
+
+def test_corrected_match_is_refetched_through_the_cache(tmp_path, capsys):
+    source = StubClient()
+    # competitions_ttl=0: the competitions list is as fresh as after its daily refresh
+    client = CachedStatsBombClient(RawDataCache(str(tmp_path / 'cache')), client=source, competitions_ttl=0)
+    path = tmp_path / 'match_data.csv'
+    df, out = run(client, path, capsys)
+    assert source.fetched == [1, 2]
+    before = df[df['match_id'] == 1].reset_index(drop=True)
+
+    # StatsBomb corrects match 1: new events under a new stamp
+    source.corrected = {1: 7}
+    source.matches_frame.loc[0, 'last_updated'] = '2023-02-01T00:00:00'
+    source.fetched = []
+    df, out = run(client, path, capsys)
+    assert source.fetched == [1]
+    assert '1 of 2 matches extracted, 1 up to date, 0 failed' in out
+    assert not df[df['match_id'] == 1].reset_index(drop=True).equals(before)
+
+    # the corrected events are cached under the new stamp
+    source.fetched = []
+    client.matches(competition_id=43, season_id=106)
+    events = client.events(match_id=1)
+    assert source.fetched == []
+    assert events.equals(synthetic_events(seed=7, possessions=40, match_id=1))
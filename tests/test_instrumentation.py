@@ -0,0 +1,51 @@
+# tests/test_instrumentation.py
+
+import pickle
+
+import pandas as pd
+
+from analysis.instrumentation import Instrumentation
+from analysis.worldcup_to_csv import RefactoredWorldCupExtractor
+from conftest import TEAMS, synthetic_events
+
+
+class StubClient:
+    """Stands in for statsbombpy's `sb` (module level, so it pickles into the worker processes)."""
+
+    def matches(self, competition_id, season_id):
+        return pd.DataFrame({'match_id': [1, 2, 3, 4], 'match_date': '2022-12-18',
+                             'home_team': TEAMS[0], 'away_team': TEAMS[1]})
+
+    def events(self, match_id):
+        return synthetic_events(seed=match_id, possessions=30, match_id=match_id)
+
+
+def totals(workers):
+    instrumentation = Instrumentation()
+    # totals recorded before the run must not be shipped to the workers and merged back
+    instrumentation.increment('matches_skipped', 5)
+    with instrumentation.stage('setup'):
+        pass
+    extractor = RefactoredWorldCupExtractor(client=StubClient(), verbose=False, instrumentation=instrumentation)
+    extractor.process_all_matches(workers=workers)
+    snapshot = instrumentation.snapshot()
+    return snapshot['counters'], {name: stats['count'] for name, stats in snapshot['stages'].items()}
+
+
+def test_pool_and_serial_runs_count_the_same(capsys):
+    counters, stages = totals(workers=None)
+    assert counters['matches_skipped'] == 5
+    assert counters['matches_extracted'] == 4
+    assert stages['setup'] == 1 and stages['match'] == 4
+    assert totals(workers=2) == (counters, stages)
+
+
+def test_pickled_copy_starts_empty():
+    instrumentation = Instrumentation(namespace='test')
+    instrumentation.increment('events_processed', 10)
+    copy = pickle.loads(pickle.dumps(instrumentation))
+    assert copy.snapshot() == {'stages': {}, 'counters': {}}
+    assert copy.namespace == 'test'
+    copy.increment('events_processed')
+    instrumentation.merge(copy.drain())
+    assert instrumentation.counters['events_processed'] == 11
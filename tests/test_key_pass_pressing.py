@@ -0,0 +1,57 @@
+# tests/test_key_pass_pressing.py
+
+import pytest
+
+from conftest import TEAMS
+
+# column sets of older or partial StatsBomb exports
+DROPPED = [[], ['pass_shot_assist'], ['pass_cross'], ['possession'], ['pass_shot_assist', 'pass_cross'],
+           ['pass_shot_assist', 'possession'], ['pass_shot_assist', 'pass_cross', 'possession']]
+
+
+def loop_key_passes(events, team_name):
+    """Row-by-row implementation that `_key_passes_from_sequence` replaced."""
+    key_passes = 0
+    evi = events.reset_index(drop=True)
+    for i in range(len(evi)-1):
+        row = evi.loc[i]
+        nxt = evi.loc[i+1]
+        if row['team'] == team_name and row['type'] == 'Pass' and nxt['type'] == 'Shot' and nxt['team'] == team_name and row.get('possession') == nxt.get('possession'):
+            key_passes += 1
+    return key_passes
+
+
+def loop_pressing_success(events, team_name):
+    """Per-possession loop that `_pressing_success` replaced."""
+    team_events = events[events['team'] == team_name]
+    successful = 0
+    total = 0
+    for pid, grp in team_events.groupby('possession'):
+        p_count = grp[grp['type'] == 'Pressure'].shape[0]
+        if p_count > 0:
+            total += p_count
+            successful += grp[grp['type'] == 'Ball Recovery'].shape[0]
+    if total > 0:
+        return min(successful / total * 100, 100.0)
+    return 0.0
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+@pytest.mark.parametrize('dropped', DROPPED)
+def test_vectorized_counts_match_loops(extractor, make_events, seed, dropped):
+    events = extractor.clean_events(extractor.unpack_coordinates(make_events(seed))).drop(columns=dropped)
+    for team in TEAMS:
+        expected_key_passes = loop_key_passes(events, team)
+        assert extractor._key_passes_from_sequence(events, team) == expected_key_passes
+        if 'possession' in events.columns:
+            assert extractor._pressing_success(events, team) == pytest.approx(loop_pressing_success(events, team))
+
+        # the fallbacks as reached through the metric groups
+        shots = extractor.compute_shot_stats(events, team)
+        if 'pass_shot_assist' not in events.columns:
+            assert shots['key_passes'] == expected_key_passes
+        defensive = extractor.compute_defensive(events, team)
+        if 'possession' in events.columns:
+            assert defensive['pressing_success'] == round(loop_pressing_success(events, team), 1)
+        else:
+            assert defensive['pressing_success'] == 0.0
@@ -0,0 +1,65 @@
+# tests/test_match_context.py
+
+import pandas as pd
+import pytest
+
+from conftest import TEAMS
+
+DROPPED = [[], ['pass_shot_assist', 'pass_cross'], ['possession'], ['pass_outcome', 'shot_outcome']]
+
+
+def cleaned_events(extractor, make_events, seed, dropped):
+    return extractor.clean_events(extractor.unpack_coordinates(make_events(seed))).drop(columns=dropped)
+
+
+def loop_possession_owner(events):
+    """Per-possession owner as `calculate_possession` computed it before `possession_owners`."""
+    poss = events.groupby('possession')
+    return pd.DataFrame({'owner': poss['team'].agg(lambda s: s.value_counts().idxmax()), 'size': poss.size()})
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('dropped', DROPPED)
+def test_metric_rows_with_and_without_context(extractor, make_events, seed, dropped):
+    events = cleaned_events(extractor, make_events, seed, dropped)
+    match_row = {'match_id': 3869685, 'match_date': '2022-12-18', 'home_team': TEAMS[0], 'away_team': TEAMS[1]}
+    context = extractor.match_context(events)
+    with_context = extractor.flatten_match_data(extractor.extract_match_data(match_row, events, context=context))
+    without_context = extractor.flatten_match_data(extractor.extract_match_data(match_row, events))
+    assert with_context == without_context
+
+    # the methods fed their slices the way they were before the context, one at a time
+    summary = extractor.summarize_events(events)
+    pd.testing.assert_frame_equal(context.summary, summary)
+    segments = extractor.possession_segments(events)
+    team_actions = extractor.possession_team_actions(events)
+    for team, opponent in (TEAMS, TEAMS[::-1]):
+        assert extractor.compute_passing_breakdowns(events, team, summary=summary) == \
+            extractor.compute_passing_breakdowns(events, team, context=context)
+        assert extractor.compute_shot_stats(events, team, summary=summary) == \
+            extractor.compute_shot_stats(events, team, context=context)
+        assert extractor.compute_defensive(events, team, summary=summary) == \
+            extractor.compute_defensive(events, team, context=context)
+        assert extractor.compute_goalkeeper(events, team, summary=summary) == \
+            extractor.compute_goalkeeper(events, team, context=context)
+        assert extractor.compute_efficiency(events, team, opponent, summary=summary) == \
+            extractor.compute_efficiency(events, team, opponent, context=context)
+        assert extractor.compute_transition(events, team, segments=segments, team_actions=team_actions) == \
+            extractor.compute_transition(events, team, context=context)
+        assert context.direction(team) == extractor.infer_team_direction(events, team)
+    assert extractor.calculate_possession(events, *TEAMS) == extractor.calculate_possession(events, *TEAMS, context=context)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_possession_owners_match_value_counts(extractor, make_events, seed):
+    events = cleaned_events(extractor, make_events, seed, [])
+    # merge possessions pairwise so both teams have events in them, with ties broken by first appearance
+    events['possession'] = (events['possession'] + 1) // 2
+    pd.testing.assert_frame_equal(extractor.possession_owners(events), loop_possession_owner(events),
+                                  check_names=False, check_index_type=False)
+
+
+def test_empty_match_context(extractor):
+    # output_schema runs the metric code on an empty match through the context
+    schema = extractor.output_schema()
+    assert 'possession_possession_%' in schema and 'transition_counter_attacks' in schema
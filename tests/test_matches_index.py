@@ -0,0 +1,64 @@
+# tests/test_matches_index.py
+
+import pandas as pd
+
+from analysis.FootballDataLoader import FootballDataLoader
+from analysis.cache import CachedStatsBombClient, RawDataCache
+from analysis.matches_index import read_matches_index
+
+
+class StubClient:
+    """Stands in for statsbombpy's `sb`: one competition-season whose matches can be updated."""
+
+    def __init__(self):
+        self.match_updated = '2024-01-01T00:00:00'
+        self.match_ids = [1, 2]
+        self.matches_calls = 0
+
+    def competitions(self):
+        return pd.DataFrame({
+            'competition_id': [43], 'season_id': [106],
+            'competition_name': ['FIFA World Cup'], 'season_name': ['2022'],
+            'match_updated': [self.match_updated]
+        })
+
+    def matches(self, competition_id, season_id):
+        self.matches_calls += 1
+        return pd.DataFrame({
+            'match_id': self.match_ids,
+            'home_team': [f'Home {i}' for i in self.match_ids],
+            'away_team': [f'Away {i}' for i in self.match_ids],
+            'match_date': [f'2022-12-{i:02d}' for i in self.match_ids],
+            'home_score': 1, 'away_score': 0,
+            'competition_stage': 'Group Stage', 'match_week': 1
+        })
+
+
+def make_loader(stub, cache_dir):
+    # competitions_ttl=0: every run sees the current competitions list, like a run a day later
+    return FootballDataLoader(client=CachedStatsBombClient(RawDataCache(str(cache_dir)), client=stub, competitions_ttl=0))
+
+
+def test_incremental_index_picks_up_updated_season(tmp_path):
+    stub = StubClient()
+    output = str(tmp_path / 'matches_index.csv')
+    assert make_loader(stub, tmp_path / 'cache').generate_matches_index_csv(output)
+    assert sorted(read_matches_index(output)['match_id']) == [1, 2]
+
+    # StatsBomb adds a match and bumps the season's stamp: the cached matches must not be served
+    stub.match_ids = [1, 2, 3]
+    stub.match_updated = '2024-02-01T00:00:00'
+    assert make_loader(stub, tmp_path / 'cache').generate_matches_index_csv(output, incremental=True)
+    assert sorted(read_matches_index(output)['match_id']) == [1, 2, 3]
+    assert stub.matches_calls == 2
+
+
+def test_unchanged_season_is_served_from_cache(tmp_path):
+    stub = StubClient()
+    client = CachedStatsBombClient(RawDataCache(str(tmp_path / 'cache')), client=stub, competitions_ttl=0)
+    client.matches(competition_id=43, season_id=106)
+    client.matches(competition_id=43, season_id=106)
+    assert stub.matches_calls == 1
+    stub.match_updated = '2024-02-01T00:00:00'
+    client.matches(competition_id=43, season_id=106)
+    assert stub.matches_calls == 2
@@ -0,0 +1,49 @@
+# tests/test_pass_network.py
+
+import numpy as np
+
+from analysis.pass_network import PassNetwork, match_pass_tables
+from conftest import TEAMS
+
+
+def completed_passes(events, team):
+    passes = events[(events['type'] == 'Pass') & (events['team'] == team) & events['pass_outcome'].isna()
+                    & events['pass_recipient_id'].notna()]
+    return passes
+
+
+def test_network_counts_every_completed_pass(extractor, make_events):
+    events = extractor.clean_events(extractor.unpack_coordinates(make_events(0)))
+    # a player none of whose passes or receptions has coordinates
+    player = completed_passes(events, TEAMS[0])['pass_recipient_id'].iloc[0]
+    involved = (events['player_id'] == player) | (events['pass_recipient_id'] == player)
+    events.loc[involved, ['location_x', 'location_y', 'pass_end_location_x', 'pass_end_location_y']] = np.nan
+    edges, positions = match_pass_tables(events, extractor)
+    for team in TEAMS:
+        passes = completed_passes(events, team)
+        network = PassNetwork.from_tables(edges, positions, team)
+        players = np.union1d(passes['player_id'].astype(np.int64), passes['pass_recipient_id'].astype(np.int64))
+        assert network.player_ids.tolist() == players.tolist()
+        expected = np.zeros((len(players), len(players)))
+        for passer, recipient in zip(passes['player_id'], passes['pass_recipient_id']):
+            expected[np.searchsorted(players, passer), np.searchsorted(players, recipient)] += 1
+        assert np.array_equal(network.matrix, expected)
+        # touches only count passes and receptions with coordinates
+        located = passes['location_x'].notna() & passes['location_y'].notna()
+        assert network.touches.sum() == 2 * located.sum()
+    network = PassNetwork.from_tables(edges, positions, TEAMS[0])
+    row = network.player_ids.tolist().index(player)
+    assert network.touches[row] == 0 and np.isnan(network.x[row])
+
+
+def test_network_from_tables_missing_position_rows(extractor, make_events):
+    events = extractor.clean_events(extractor.unpack_coordinates(make_events(1)))
+    edges, positions = match_pass_tables(events, extractor)
+    network = PassNetwork.from_tables(edges, positions, TEAMS[0])
+    # positions written by an older version without the players whose passes had no coordinates
+    missing = positions[positions['team'] == TEAMS[0]]['player_id'].iloc[0]
+    partial = PassNetwork.from_tables(edges, positions[positions['player_id'] != missing], TEAMS[0])
+    assert partial.player_ids.tolist() == network.player_ids.tolist()
+    assert np.array_equal(partial.matrix, network.matrix)
+    row = partial.player_ids.tolist().index(missing)
+    assert partial.touches[row] == 0 and np.isnan(partial.x[row])
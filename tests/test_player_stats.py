@@ -0,0 +1,176 @@
+# tests/test_player_stats.py
+
+import pandas as pd
+import pytest
+
+from analysis.player_stats import (PLAYER_METRICS, PlayerSeasonTable, match_end_minute, minutes_from_events,
+                                   minutes_played, player_event_stats, player_match_stats)
+from conftest import TEAMS
+
+DROPPED = [[], ['pass_shot_assist'], ['pass_shot_assist', 'possession'], ['pass_cross']]
+
+
+def team_metrics(extractor, events, team):
+    """Team-level values of the player metrics that have one, from the extractor's metric groups."""
+    opponent = [other for other in TEAMS if other != team][0]
+    passing = extractor.compute_passing_breakdowns(events, team)
+    shots = extractor.compute_shot_stats(events, team)
+    defensive = extractor.compute_defensive(events, team)
+    return {
+        'passes': passing['total_passes'],
+        'completed_passes': passing['completed_passes'],
+        'progressive_passes': passing['progressive_passes'],
+        'crosses': passing['crosses_attempted'],
+        'shots': shots['total_shots'],
+        'shots_on_target': shots['shots_on_target'],
+        'key_passes': shots['key_passes'],
+        'xg': shots['xg'],
+        'goals': extractor.compute_efficiency(events, team, opponent)['goals_scored'],
+        'pressures': defensive['pressures'],
+        'tackles': defensive['tackles'],
+        'interceptions': defensive['interceptions'],
+        'ball_recoveries': defensive['ball_recoveries'],
+        'blocks': defensive['blocks'],
+        'clearances': defensive['clearances'],
+        'fouls_committed': defensive['fouls_committed'],
+    }
+
+
+def lineups_of(events, substitute_minute=60.0):
+    """Lineups with position spells: the first player of each team is substituted, the rest play throughout."""
+    lineups = {}
+    players = events.dropna(subset=['player_id']).drop_duplicates('player_id')
+    for team, group in players.groupby('team'):
+        positions = [[{'from': '00:00', 'to': None}] for _ in range(len(group))]
+        positions[0] = [{'from': '00:00', 'to': f"{int(substitute_minute):02d}:00"}]
+        lineups[team] = pd.DataFrame({'player_id': group['player_id'].astype(int).to_numpy(),
+                                      'player_name': group['player'].to_numpy(), 'positions': positions})
+    return lineups
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+@pytest.mark.parametrize('dropped', DROPPED)
+def test_players_add_up_to_team_metrics(extractor, make_events, seed, dropped):
+    events = extractor.clean_events(extractor.unpack_coordinates(make_events(seed))).drop(columns=dropped)
+    stats = player_event_stats(events, extractor)
+    for team in TEAMS:
+        totals = stats[stats['team'] == team].sum(numeric_only=True)
+        for metric, expected in team_metrics(extractor, events, team).items():
+            assert totals[metric] == pytest.approx(expected, abs=0.006), metric
+
+
+def test_key_passes_without_possession(extractor, make_events):
+    # without pass_shot_assist and possession players and teams count a pass directly followed by a shot of the team
+    events = extractor.clean_events(extractor.unpack_coordinates(make_events(0))).drop(
+        columns=['pass_shot_assist', 'possession'])
+    stats = player_event_stats(events, extractor)
+    types, teams = events['type'].tolist(), events['team'].tolist()
+    for team in TEAMS:
+        expected = sum(types[i] == 'Pass' and types[i + 1] == 'Shot' and teams[i] == teams[i + 1] == team
+                       for i in range(len(events) - 1))
+        assert expected > 0
+        assert stats.loc[stats['team'] == team, 'key_passes'].sum() == expected
+        assert extractor.compute_shot_stats(events, team)['key_passes'] == expected
+
+
+def test_minutes_played_from_position_spells():
+    lineups = {'Argentina': pd.DataFrame({
+        'player_id': [1, 2, 3, 4],
+        'player_name': ['Starter', 'Substitute', 'Unused', 'Moved'],
+        'positions': [[{'from': '00:00', 'to': '64:30'}],
+                      [{'from': '64:30', 'to': None}],
+                      [],
+                      [{'from': '00:00', 'to': '45:00'}, {'from': '45:00', 'to': None}]],
+    })}
+    minutes = minutes_played(lineups, match_end=94.5)
+    assert minutes['minutes'].to_dict() == {1: 64.5, 2: 30.0, 4: 94.5}
+    assert (minutes['team'] == 'Argentina').all()
+
+
+def test_minutes_from_events_without_spells():
+    tactics = {'lineup': [{'player': {'id': 1, 'name': 'Starter'}}, {'player': {'id': 2, 'name': 'Sent off'}}]}
+    events = pd.DataFrame([
+        dict(type='Starting XI', team='Argentina', minute=0, second=0, player_id=None, tactics=tactics),
+        dict(type='Foul Committed', team='Argentina', minute=30, second=0, player_id=2, foul_committed_card='Red Card'),
+        dict(type='Substitution', team='Argentina', minute=70, second=30, player_id=1,
+             substitution_replacement_id=5, substitution_replacement='Substitute'),
+        dict(type='Pass', team='Argentina', minute=92, second=0, player_id=5),
+    ])
+    minutes = minutes_from_events(events, match_end_minute(events))
+    assert minutes['minutes'].to_dict() == {1: 70.5, 2: 30.0, 5: 21.5}
+    assert minutes.loc[5, 'player_name'] == 'Substitute'
+
+
+def test_player_match_stats(extractor, make_events):
+    events = extractor.clean_events(extractor.unpack_coordinates(make_events(0)))
+    lineups = lineups_of(events)
+    # an unused substitute and a player who came on without an event
+    lineups['France'] = pd.concat([lineups['France'], pd.DataFrame({
+        'player_id': [901, 902], 'player_name': ['Unused', 'Late'], 'positions': [[], [{'from': '88:00', 'to': None}]],
+    })], ignore_index=True)
+    rows = player_match_stats(events, lineups, extractor=extractor)
+    assert list(rows.columns) == ['match_id', 'player_id', 'player_name', 'team'] + PLAYER_METRICS
+    assert (rows['match_id'] == 3869685).all()
+    assert 901 not in rows['player_id'].tolist()
+    late = rows.set_index('player_id').loc[902]
+    assert (late['player_name'], late['team']) == ('Late', 'France')
+    assert late['minutes'] == round(match_end_minute(events) - 88, 1)
+    assert late[[metric for metric in PLAYER_METRICS if metric != 'minutes']].sum() == 0
+    event_stats = player_event_stats(events, extractor)
+    assert rows.set_index('player_id').loc[event_stats.index, 'passes'].tolist() == event_stats['passes'].tolist()
+
+
+def test_season_table_update_index_and_storage(extractor, make_events, tmp_path):
+    first = extractor.clean_events(extractor.unpack_coordinates(make_events(0, match_id=1)))
+    second = extractor.clean_events(extractor.unpack_coordinates(make_events(1, match_id=2)))
+    rows_1 = player_match_stats(first, lineups_of(first), extractor=extractor)
+    rows_2 = player_match_stats(second, lineups_of(second), extractor=extractor)
+
+    table = PlayerSeasonTable()
+    assert table.update(rows_1, 'World Cup 2022') == 1
+    assert table.update(rows_1, 'World Cup 2022') == 0
+    assert table.update(rows_2, 'World Cup 2022') == 1
+    assert table.matches == {'1': 'World Cup 2022', '2': 'World Cup 2022'}
+
+    # incremental sums equal one update over both matches
+    together = PlayerSeasonTable()
+    together.update(pd.concat([rows_1, rows_2]), 'World Cup 2022')
+    pd.testing.assert_frame_equal(table.totals('World Cup 2022'), together.totals('World Cup 2022'))
+    both = pd.concat([rows_1, rows_2]).groupby('player_id')
+    totals = table.totals('World Cup 2022')
+    assert totals['passes'].to_dict() == both['passes'].sum().to_dict()
+    assert totals['matches'].to_dict() == both.size().astype(float).to_dict()
+
+    player_id = int(rows_1['player_id'].iloc[0])
+    per_90 = table.summary('World Cup 2022', 'per_90').loc[player_id, 'passes']
+    assert per_90 == pytest.approx(totals.loc[player_id, 'passes'] / totals.loc[player_id, 'minutes'] * 90)
+
+    # the name index and the lookups agree
+    labels = table.players('World Cup 2022')
+    assert labels == sorted(labels) and len(labels) == len(totals)
+    assert all(table.player_id(label, 'World Cup 2022') in totals.index for label in labels)
+    name = rows_1['player_name'].iloc[0]
+    assert table.search(name.upper()) == [label for label in table.players() if name in label]
+
+    path = str(tmp_path / 'players.parquet')
+    table.save(path)
+    loaded = PlayerSeasonTable.load(path)
+    pd.testing.assert_frame_equal(loaded.stats, table.stats)
+    assert loaded.matches == table.matches
+    assert loaded.players() == table.players()
+    assert loaded.update(rows_2, 'World Cup 2022') == 0
+
+
+def test_name_index_labels_namesakes():
+    rows = pd.DataFrame([
+        dict(match_id=1, player_id=10, player_name='Fernández', team='Argentina', minutes=90.0),
+        dict(match_id=1, player_id=11, player_name='Fernández', team='France', minutes=90.0),
+        dict(match_id=2, player_id=12, player_name='Fernández', team='France', minutes=45.0),
+        dict(match_id=2, player_id=13, player_name='Messi', team='Argentina', minutes=90.0),
+    ]).reindex(columns=['match_id', 'player_id', 'player_name', 'team'] + PLAYER_METRICS, fill_value=0.0)
+    table = PlayerSeasonTable()
+    table.update(rows, 'World Cup 2022')
+    assert table.name_index('World Cup 2022').to_dict() == {
+        'Fernández (Argentina)': 10, 'Fernández (France) #11': 11, 'Fernández (France) #12': 12, 'Messi': 13,
+    }
+    assert table.players('Euro 2020') == []
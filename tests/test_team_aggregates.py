@@ -0,0 +1,60 @@
+# tests/test_team_aggregates.py
+
+import math
+
+from analysis.team_aggregates import TeamAggregates
+from conftest import TEAMS
+
+
+def match_rows(match_id, home, away, home_goals, away_goals, minutes=None):
+    rows = [dict(match_id=match_id, match_date='2022-12-18', team_name=home, team_type='home_team',
+                 opponent_name=away, efficiency_goals_scored=home_goals),
+            dict(match_id=match_id, match_date='2022-12-18', team_name=away, team_type='away_team',
+                 opponent_name=home, efficiency_goals_scored=away_goals)]
+    if minutes is not None:
+        for row in rows:
+            row['minutes'] = minutes
+    return rows
+
+
+def test_per_90_uses_match_minutes():
+    aggregates = TeamAggregates()
+    aggregates.update(match_rows(1, 'Argentina', 'France', 3, 3, minutes=124.0), stages='Final')
+    aggregates.update(match_rows(2, 'Argentina', 'Croatia', 3, 0, minutes=96.0), stages='Semi-finals')
+    assert aggregates.per_90('Argentina', 'efficiency_goals_scored') == 6 / 220 * 90
+    assert aggregates.per_90('Argentina', 'efficiency_goals_scored', 'Final') == 3 / 124 * 90
+    assert aggregates.mean('Argentina', 'efficiency_goals_scored') == 3.0
+    per_90 = aggregates.summary(stat='per_90')
+    assert per_90.loc['France', 'efficiency_goals_scored'] == 3 / 124 * 90
+    assert aggregates.matches_played('Argentina') == 2
+
+
+def test_per_90_needs_minutes_of_every_match():
+    aggregates = TeamAggregates()
+    aggregates.update(match_rows(1, 'Argentina', 'France', 3, 3, minutes=124.0))
+    # a row from a match-data file written before the extractor recorded minutes
+    aggregates.update(match_rows(2, 'Argentina', 'Croatia', 3, 0))
+    assert math.isnan(aggregates.per_90('Argentina', 'efficiency_goals_scored'))
+    assert math.isnan(aggregates.summary(stat='per_90').loc['Argentina', 'efficiency_goals_scored'])
+    assert math.isnan(aggregates.per_90('Croatia', 'efficiency_goals_scored'))
+    assert aggregates.has_minutes()
+    assert aggregates.matches_played('Argentina') == 2
+    aggregates.remove(match_rows(2, 'Argentina', 'Croatia', 3, 0))
+    assert aggregates.per_90('Argentina', 'efficiency_goals_scored') == 3 / 124 * 90
+
+
+def test_extracted_rows_carry_match_minutes(extractor, make_events):
+    events = extractor.clean_events(extractor.unpack_coordinates(make_events(0)))
+    match_data = extractor.extract_match_data(
+        {'match_id': 3869685, 'match_date': '2022-12-18', 'home_team': TEAMS[0], 'away_team': TEAMS[1]}, events)
+    rows = extractor.flatten_match_data(match_data)
+    last = events.iloc[-1]
+    assert [row['minutes'] for row in rows] == [round(last['minute'] + last['second'] / 60, 1)] * 2
+    assert list(extractor.output_schema()) == list(rows[0])
+
+
+def test_rows_without_minutes_offer_no_per_90():
+    aggregates = TeamAggregates()
+    aggregates.update(match_rows(1, 'Argentina', 'France', 3, 3))
+    assert not aggregates.has_minutes()
+    assert aggregates.summary(stat='per_90').isna().all(axis=None)